@@ -1,14 +1,26 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy import text
 from typing import Optional, List
 from models.api_usage import ApiUsage
 from schemas.api_usage_schemas import ApiUsageCreate, ApiUsageUpdate
+from redis_store import incr_pending_usage, pop_pending_usage
+from config import settings
+from database import async_session_maker
+import asyncio
+import logging
 import uuid
 
 """
 Data Access Layer for API usage management: create, retrieve, update, delete, and list usage records.
 """
 
+# Usage kind -> api_usage counter column
+USAGE_COLUMNS = {
+    "chat": "chatUsage",
+    "invoice": "invoiceUsage",
+}
+
 class ApiUsageDAL:
     """
     Data Access Layer for API usage management.
@@ -38,120 +50,77 @@ class ApiUsageDAL:
         """
         Increment chat usage counter by 1 for a given user.
         """
-        # Use direct SQL update to avoid ORM type issues
-        from sqlalchemy import text
-        
+        return await self.increment_usage(user_id, "chat", db_session)
+
+    async def increment_invoice_usage(self, user_id: str, db_session: AsyncSession) -> Optional[ApiUsage]:
+        """
+        Increment invoice usage counter by 1 for a given user.
+        """
+        return await self.increment_usage(user_id, "invoice", db_session)
+
+    async def increment_usage(self, user_id: str, kind: str, db_session: AsyncSession, amount: int = 1) -> Optional[ApiUsage]:
+        """
+        Increment the `kind` ("chat" or "invoice") usage counter for a given user.
+        Uses a single atomic UPDATE ... RETURNING. In write-behind mode the increment is
+        recorded in Redis and flushed later by `usage_flush_loop`; None is returned.
+        """
+        if settings.usage_write_behind:
+            try:
+                await incr_pending_usage(kind, user_id, amount)
+                return None
+            except Exception as e:
+                logging.error(f"Write-behind usage increment failed, writing through: {e}")
+
+        column = USAGE_COLUMNS[kind]
         try:
-            # First check if the record exists
             result = await db_session.execute(
-                text("SELECT id, \"chatUsage\" FROM api_usage WHERE \"userId\" = :user_id"),
-                {"user_id": user_id}
+                text(
+                    f"UPDATE api_usage SET \"{column}\" = COALESCE(\"{column}\", 0) + :amount, \"updatedAt\" = NOW() "
+                    "WHERE \"userId\" = :user_id RETURNING *"
+                ),
+                {"amount": amount, "user_id": user_id}
             )
-            row = result.fetchone()
-            
-            if not row:
-                return None
-            
-            usage_id, current_usage = row
-            
-            # Update the chat usage
-            new_usage = (current_usage or 0) + 1
-            
-            await db_session.execute(
-                text("UPDATE api_usage SET \"chatUsage\" = :new_usage, \"updatedAt\" = NOW() WHERE \"userId\" = :user_id"),
-                {"new_usage": new_usage, "user_id": user_id}
-            )
-            
+            row = result.mappings().first()
             await db_session.commit()
-            
-            # Return the updated record
-            result = await db_session.execute(
-                text("SELECT * FROM api_usage WHERE \"userId\" = :user_id"),
-                {"user_id": user_id}
-            )
-            row = result.fetchone()
-            
-            if row:
-                # Create an ApiUsage object from the row
-                db_usage = ApiUsage(
-                    id=row[0],
-                    userId=row[1],
-                    chatUsage=row[2],
-                    invoiceUsage=row[3],
-                    resetDate=row[4],
-                    createdAt=row[5],
-                    updatedAt=row[6]
-                )
-                return db_usage
-            
-            return None
-            
-        except Exception as e:
+        except Exception:
             await db_session.rollback()
             raise
 
-    async def increment_invoice_usage(self, user_id: str, db_session: AsyncSession) -> Optional[ApiUsage]:
+        if row is None:
+            return None
+        return ApiUsage(**dict(row))
+
+    async def flush_pending_usage(self, db_session: AsyncSession) -> int:
         """
-        Increment invoice usage counter by 1 for a given user.
+        Apply all write-behind usage increments from Redis to api_usage in one batch per kind.
+        Increments are put back in Redis if the database write fails.
+        Returns the number of (kind, user) counters flushed.
         """
-        print(f"DEBUG: increment_invoice_usage called with user_id: {user_id} (type: {type(user_id)})")
-        
-        # Use direct SQL update to avoid ORM type issues
-        from sqlalchemy import text
-        
+        pending = await pop_pending_usage()
+        if not pending:
+            return 0
+
+        params_by_kind = {}
+        for (kind, user_id), amount in pending.items():
+            params_by_kind.setdefault(kind, []).append({"amount": amount, "user_id": user_id})
+
         try:
-            # First check if the record exists
-            result = await db_session.execute(
-                text("SELECT id, \"invoiceUsage\" FROM api_usage WHERE \"userId\" = :user_id"),
-                {"user_id": user_id}
-            )
-            row = result.fetchone()
-            
-            if not row:
-                print(f"DEBUG: No usage record found for user_id: {user_id}")
-                return None
-            
-            usage_id, current_usage = row
-            print(f"DEBUG: Found usage record - id: {usage_id}, current invoiceUsage: {current_usage}")
-            
-            # Update the invoice usage
-            new_usage = (current_usage or 0) + 1
-            print(f"DEBUG: Updating invoiceUsage to: {new_usage}")
-            
-            await db_session.execute(
-                text("UPDATE api_usage SET \"invoiceUsage\" = :new_usage, \"updatedAt\" = NOW() WHERE \"userId\" = :user_id"),
-                {"new_usage": new_usage, "user_id": user_id}
-            )
-            
-            await db_session.commit()
-            print(f"DEBUG: Successfully committed update")
-            
-            # Return the updated record
-            result = await db_session.execute(
-                text("SELECT * FROM api_usage WHERE \"userId\" = :user_id"),
-                {"user_id": user_id}
-            )
-            row = result.fetchone()
-            
-            if row:
-                # Create an ApiUsage object from the row
-                db_usage = ApiUsage(
-                    id=row[0],
-                    userId=row[1],
-                    chatUsage=row[2],
-                    invoiceUsage=row[3],
-                    resetDate=row[4],
-                    createdAt=row[5],
-                    updatedAt=row[6]
+            for kind, params in params_by_kind.items():
+                column = USAGE_COLUMNS[kind]
+                await db_session.execute(
+                    text(
+                        f"UPDATE api_usage SET \"{column}\" = COALESCE(\"{column}\", 0) + :amount, \"updatedAt\" = NOW() "
+                        "WHERE \"userId\" = :user_id"
+                    ),
+                    params
                 )
-                return db_usage
-            
-            return None
-            
-        except Exception as e:
-            print(f"DEBUG: Error in increment_invoice_usage: {e}")
+            await db_session.commit()
+        except Exception:
             await db_session.rollback()
+            for (kind, user_id), amount in pending.items():
+                await incr_pending_usage(kind, user_id, amount)
             raise
+        return len(pending)
 
     async def update_usage(self, user_id: str, usage: ApiUsageUpdate, db_session: AsyncSession) -> Optional[ApiUsage]:
         """
@@ -194,6 +163,26 @@ class ApiUsageDAL:
         db_session.add(db_usage)
         await db_session.commit()
         await db_session.refresh(db_usage)
-        return db_usage 
+        return db_usage
+
+
+async def flush_usage():
+    """
+    Flush write-behind usage increments to the database once. Errors are logged, not raised,
+    so a failed flush never interrupts the caller (the flush loop or application shutdown).
+    """
+    try:
+        async with async_session_maker() as session:
+            await ApiUsageDAL().flush_pending_usage(session)
+    except Exception as e:
+        logging.error(f"Usage flush failed: {e}")
+
+async def usage_flush_loop(interval: float):
+    """
+    Background task that periodically flushes write-behind usage increments to the database.
+    The final flush on shutdown is done by the lifespan after cancelling this task.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        await flush_usage()
 
-    
\ No newline at end of file
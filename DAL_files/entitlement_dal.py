@@ -0,0 +1,227 @@
+import hashlib
+from typing import Any, Dict, Optional
+from sqlalchemy import and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from models.api_usage import ApiUsage
+from models.plan import Plan
+from models.user_subscription import UserSubscription
+from models.users_api_key import UsersApiKey
+from redis_store import delete_cached_keys, get_cached_json, set_cached_json
+from tools.answer_cache import LRUCache
+from config import settings
+import logging
+import uuid
+
+"""
+Data Access Layer for API entitlements: resolves an API key to its user, current usage,
+active subscription and plan limits, with the immutable parts cached between requests.
+"""
+
+ACTIVE_SUBSCRIPTION_STATUSES = ["active", "Active"]
+
+# Usage kinds metered per API key: kind -> (ApiUsage counter column, Plan limit column)
+USAGE_KINDS = {
+    "chat": ("chatUsage", "chatLimit"),
+    "invoice": ("invoiceUsage", "invoiceLimit"),
+}
+
+
+class Entitlement:
+    """
+    Resolved entitlement for one API key. `usage` holds the live counters, `limits` the plan limits.
+    """
+    __slots__ = ("api_key_id", "user_id", "usage", "limits", "has_usage", "has_subscription", "has_plan")
+
+    def __init__(self, api_key_id: str, user_id: str, usage: Optional[Dict[str, int]], limits: Optional[Dict[str, Optional[int]]],
+                 has_subscription: bool, has_plan: bool):
+        self.api_key_id = api_key_id
+        self.user_id = user_id
+        self.usage = usage or {}
+        self.limits = limits or {}
+        self.has_usage = usage is not None
+        self.has_subscription = has_subscription
+        self.has_plan = has_plan
+
+
+class EntitlementCache:
+    """
+    Short-TTL cache for API key -> user and user -> plan limits, kept in a bounded
+    in-process LRU and optionally mirrored in Redis so invalidations reach every worker.
+    API keys are only stored as SHA-256 digests, never in key names.
+    """
+    def __init__(self, ttl: int = 30, use_redis: bool = False, max_entries: int = 10000):
+        """
+        Initialize the cache with a TTL in seconds, an optional Redis tier and the maximum
+        number of entries kept in process memory.
+        """
+        self.ttl = ttl
+        self.use_redis = use_redis
+        self._local = LRUCache(ttl, max_entries)
+
+    @staticmethod
+    def key_cache_key(api_key: str) -> str:
+        return f"entitlement:key:{hashlib.sha256(api_key.encode('utf-8')).hexdigest()}"
+
+    @staticmethod
+    def plan_cache_key(user_id: str) -> str:
+        return f"entitlement:plan:{user_id}"
+
+    async def get(self, cache_key: str) -> Optional[Any]:
+        """
+        Return a cached value, checking process memory first and then Redis.
+        """
+        value = self._local.get(cache_key)
+        if value is not None:
+            return value
+        if self.use_redis:
+            try:
+                value = await get_cached_json(cache_key)
+            except Exception as e:
+                logging.error(f"Entitlement cache read failed: {e}")
+                return None
+            if value is not None:
+                self._local.put(cache_key, value)
+            return value
+        return None
+
+    async def set(self, cache_key: str, value: Any) -> None:
+        """
+        Cache a JSON-serializable value in every tier.
+        """
+        self._local.put(cache_key, value)
+        if self.use_redis:
+            try:
+                await set_cached_json(cache_key, value, self.ttl)
+            except Exception as e:
+                logging.error(f"Entitlement cache write failed: {e}")
+
+    async def invalidate_key(self, api_key: str) -> None:
+        """
+        Forget the cached owner of an API key (call on toggle, status change or revoke).
+        """
+        await self._invalidate(self.key_cache_key(api_key))
+
+    async def invalidate_user(self, user_id: str) -> None:
+        """
+        Forget the cached plan limits of a user (call on subscription or plan change).
+        """
+        await self._invalidate(self.plan_cache_key(user_id))
+
+    def clear(self) -> None:
+        self._local.clear()
+
+    async def _invalidate(self, cache_key: str) -> None:
+        self._local.pop(cache_key)
+        if self.use_redis:
+            try:
+                await delete_cached_keys(cache_key)
+            except Exception as e:
+                logging.error(f"Entitlement cache invalidation failed: {e}")
+
+
+entitlement_cache = EntitlementCache(
+    ttl=settings.entitlement_cache_ttl,
+    use_redis=settings.entitlement_cache_use_redis,
+    max_entries=settings.entitlement_cache_max_entries,
+)
+
+
+class EntitlementDAL:
+    """
+    Data Access Layer for resolving API key entitlements.
+    """
+    def __init__(self, db_session: AsyncSession, cache: EntitlementCache = entitlement_cache):
+        """
+        Initialize with a database session and the entitlement cache.
+        """
+        self.db_session = db_session
+        self.cache = cache
+
+    async def resolve(self, api_key: str) -> Optional[Entitlement]:
+        """
+        Resolve an active API key to its entitlement.
+        Uses one usage lookup when key and plan are cached, otherwise one joined query.
+        Returns None if the key does not exist or is inactive.
+        """
+        key_entry = await self.cache.get(self.cache.key_cache_key(api_key))
+        plan_entry = None
+        if key_entry is not None:
+            plan_entry = await self.cache.get(self.cache.plan_cache_key(key_entry["user_id"]))
+        if key_entry is not None and plan_entry is not None:
+            usage = await self.get_usage_counters(key_entry["api_key_id"])
+            return Entitlement(
+                api_key_id=key_entry["api_key_id"],
+                user_id=key_entry["user_id"],
+                usage=usage,
+                limits=plan_entry["limits"],
+                has_subscription=True,
+                has_plan=True,
+            )
+        return await self._resolve_joined(api_key)
+
+    async def get_usage_counters(self, api_key_id: str) -> Optional[Dict[str, int]]:
+        """
+        Read the live usage counters for an API key.
+        """
+        columns = [getattr(ApiUsage, usage_column) for usage_column, _ in USAGE_KINDS.values()]
+        result = await self.db_session.execute(
+            select(*columns).where(ApiUsage.users_api_key_id == uuid.UUID(str(api_key_id)))
+        )
+        row = result.first()
+        if row is None:
+            return None
+        return {kind: value or 0 for kind, value in zip(USAGE_KINDS, row)}
+
+    async def _resolve_joined(self, api_key: str) -> Optional[Entitlement]:
+        usage_columns = [getattr(ApiUsage, usage_column) for usage_column, _ in USAGE_KINDS.values()]
+        limit_columns = [getattr(Plan, limit_column) for _, limit_column in USAGE_KINDS.values()]
+        stmt = (
+            select(
+                UsersApiKey.users_api_key_id,
+                UsersApiKey.user_id,
+                ApiUsage.id,
+                UserSubscription.id,
+                Plan.id,
+                *usage_columns,
+                *limit_columns,
+            )
+            .select_from(UsersApiKey)
+            .outerjoin(ApiUsage, ApiUsage.users_api_key_id == UsersApiKey.users_api_key_id)
+            .outerjoin(
+                UserSubscription,
+                and_(
+                    UserSubscription.userId == UsersApiKey.user_id,
+                    UserSubscription.status.in_(ACTIVE_SUBSCRIPTION_STATUSES),
+                ),
+            )
+            .outerjoin(Plan, Plan.id == UserSubscription.planId)
+            .where(UsersApiKey.api_key == api_key, UsersApiKey.is_active == True)
+            .limit(1)
+        )
+        result = await self.db_session.execute(stmt)
+        row = result.first()
+        if row is None:
+            return None
+
+        api_key_id, user_id, usage_id, subscription_id, plan_id = row[:5]
+        n = len(USAGE_KINDS)
+        usage_values = row[5:5 + n]
+        limit_values = row[5 + n:5 + 2 * n]
+
+        api_key_id = str(api_key_id)
+        usage = {kind: value or 0 for kind, value in zip(USAGE_KINDS, usage_values)} if usage_id is not None else None
+        limits = dict(zip(USAGE_KINDS, limit_values)) if plan_id is not None else None
+
+        await self.cache.set(self.cache.key_cache_key(api_key), {"api_key_id": api_key_id, "user_id": user_id})
+        if limits is not None:
+            await self.cache.set(self.cache.plan_cache_key(user_id), {"limits": limits})
+
+        return Entitlement(
+            api_key_id=api_key_id,
+            user_id=user_id,
+            usage=usage,
+            limits=limits,
+            has_subscription=subscription_id is not None,
+            has_plan=plan_id is not None,
+        )
@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Tuple
+from redis_store import get_invoice_result, store_invoice_result
+from config import settings
+
+"""
+Content-addressed cache for invoice extraction results.
+Results are keyed by the SHA-256 of the uploaded bytes plus the operation, doc_type,
+model names and prompt version, so identical re-uploads skip the LLM entirely.
+"""
+
+CACHE_BACKENDS = ["redis", "disk", "none"]
+
+
+def invoice_cache_key(content: bytes, operation: str, doc_type: Optional[str], identity: str) -> str:
+    """
+    Build the cache key for a document: SHA-256 of the bytes, combined with everything
+    that changes the extraction output (operation, doc_type, models and prompt version).
+    """
+    digest = hashlib.sha256(content).hexdigest()
+    scope = hashlib.sha256(f"{operation}|{doc_type or ''}|{identity}".encode("utf-8")).hexdigest()[:16]
+    return f"{scope}:{digest}"
+
+
+def is_cacheable(result: Any) -> bool:
+    """
+    Only successful, JSON-serializable dict results are cached; error payloads are not.
+    """
+    return isinstance(result, dict) and "error" not in result and "pageErrors" not in result
+
+
+class DiskInvoiceCache:
+    """
+    On-disk backend: one JSON file per key, LRU-evicted when the entry count or total size
+    exceeds its cap. File modification times record recency, so the order survives restarts.
+    """
+    def __init__(self, directory: str, max_entries: int, max_bytes: int, ttl: int):
+        """
+        Initialize with the cache directory, entry and byte caps, and the TTL in seconds.
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._index: Optional["OrderedDict[str, int]"] = None
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Return the cached result for `key`, or None on a miss or expired entry.
+        """
+        path = self._path(key)
+        with self._lock:
+            self._load_index()
+            if key not in self._index:
+                return None
+            try:
+                if time.time() - os.path.getmtime(path) > self.ttl:
+                    self._remove(key)
+                    return None
+                with open(path, "r", encoding="utf-8") as f:
+                    value = json.load(f)
+                os.utime(path, None)
+            except (OSError, ValueError):
+                self._remove(key)
+                return None
+            self._index.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Store a result and evict least recently used entries beyond the caps.
+        """
+        payload = json.dumps(value).encode("utf-8")
+        path = self._path(key)
+        with self._lock:
+            self._load_index()
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+            self._total_bytes += len(payload) - self._index.pop(key, 0)
+            self._index[key] = len(payload)
+            while self._index and (len(self._index) > self.max_entries or self._total_bytes > self.max_bytes):
+                self._remove(next(iter(self._index)))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key.replace(":", "_") + ".json")
+
+    def _remove(self, key: str) -> None:
+        self._total_bytes -= self._index.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _load_index(self) -> None:
+        if self._index is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name[:-len(".json")].replace("_", ":", 1), stat.st_size))
+        self._index = OrderedDict()
+        self._total_bytes = 0
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+
+
+class InvoiceResultCache:
+    """
+    Cache front-end used by the invoice endpoints. Backed by Redis (shared between
+    workers, LRU by a sorted set of access times) or a local directory.
+    """
+    def __init__(self, backend: str = "redis", directory: str = ".cache/invoice_results",
+                 max_entries: int = 10000, max_bytes: int = 512 * 1024 * 1024, ttl: int = 7 * 24 * 3600):
+        """
+        Initialize the cache with a backend ("redis", "disk" or "none") and its limits.
+        """
+        if backend not in CACHE_BACKENDS:
+            raise ValueError(f"Unsupported invoice cache backend: {backend}")
+        self.backend = backend
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._disk = DiskInvoiceCache(directory, max_entries, max_bytes, ttl) if backend == "disk" else None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend != "none"
+
+    async def get(self, key: str) -> Optional[Any]:
+        """
+        Return the cached result for `key`, or None. Backend errors count as a miss.
+        """
+        try:
+            if self.backend == "redis":
+                payload = await get_invoice_result(key, self.ttl)
+                return json.loads(payload) if payload is not None else None
+            if self.backend == "disk":
+                return await asyncio.get_event_loop().run_in_executor(None, self._disk.get, key)
+        except Exception as e:
+            logging.error(f"Invoice cache read failed: {e}")
+        return None
+
+    async def set(self, key: str, value: Any) -> None:
+        """
+        Store a result. Backend errors are logged and ignored.
+        """
+        try:
+            if self.backend == "redis":
+                await store_invoice_result(key, json.dumps(value), self.ttl, self.max_entries)
+            elif self.backend == "disk":
+                await asyncio.get_event_loop().run_in_executor(None, self._disk.set, key, value)
+        except Exception as e:
+            logging.error(f"Invoice cache write failed: {e}")
+
+    async def get_or_extract(
+        self,
+        content: bytes,
+        operation: str,
+        doc_type: Optional[str],
+        identity: str,
+        extract: Callable[[], Awaitable[Any]],
+    ) -> Tuple[Any, bool]:
+        """
+        Return `(result, cache_hit)`. On a miss `extract()` runs and a successful result is stored.
+        """
+        if not self.enabled:
+            return await extract(), False
+        key = invoice_cache_key(content, operation, doc_type, identity)
+        cached = await self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached, True
+        self.misses += 1
+        result = await extract()
+        if is_cacheable(result):
+            await self.set(key, result)
+        return result, False
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "hits": self.hits, "misses": self.misses}
+
+
+invoice_result_cache = InvoiceResultCache(
+    backend=settings.invoice_cache_backend,
+    directory=settings.invoice_cache_dir,
+    max_entries=settings.invoice_cache_max_entries,
+    max_bytes=settings.invoice_cache_max_bytes,
+    ttl=settings.invoice_cache_ttl,
+)
@@ -1,43 +1,132 @@
-import os
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
-from schemas.invoice_schemas import InvoiceData
 import fitz
-import base64
 import json
+import logging
 import re
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from groq import Groq
+from agno.media import Image
+from fastapi import HTTPException
 from dotenv import load_dotenv
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+from config import settings
+from llm_gateway import LLMGateway, invoice_text_gateway, invoice_vision_gateway
 load_dotenv()
 
+_render_pool: Optional[ProcessPoolExecutor] = None
 
-class SimpleInvoiceExtractor:
-    def __init__(self, groq_api_key: str):
-        self.model = ChatGroq(
-            temperature=0.1,
-            groq_api_key=groq_api_key,
-            model_name="meta-llama/llama-4-scout-17b-16e-instruct",
-        )
-        self.model2 = ChatGroq(
-            temperature=0.1,
-            groq_api_key=groq_api_key,
-            model_name="llama-3.3-70b-versatile",
-        )
 
-        self.text_extract_prompt_template = self.image_text_extract_prompt = ChatPromptTemplate.from_messages([
-            ("system", "Extract all text content from this document exactly as it appears.\n      Maintain the original layout and formatting as much as possible.\n      Pay special attention to:\n      1. Table structures and numerical data\n      2. Invoice-specific fields like dates, amounts, and IDs\n      3. Vendor and customer information\n      4. Line items with quantities and prices"),
+def _render_pdf_pages(pdf_bytes: bytes, page_numbers: List[int], dpi: int) -> List[bytes]:
+    """
+    Rasterize the given PDF pages to PNG bytes. Runs inside the render process pool.
+    """
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        return [doc.load_page(n).get_pixmap(dpi=dpi).tobytes("png") for n in page_numbers]
+    finally:
+        doc.close()
+
+
+def _extract_pdf_text_layer(pdf_bytes: bytes) -> List[str]:
+    """
+    Return the embedded text layer of every PDF page (empty string for scanned pages).
+    """
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        return [doc.load_page(n).get_text().strip() for n in range(doc.page_count)]
+    finally:
+        doc.close()
+
+
+def get_render_pool() -> ProcessPoolExecutor:
+    """
+    Return the process pool used for PDF rasterization, creating it on first use.
+    """
+    global _render_pool
+    if _render_pool is None:
+        _render_pool = ProcessPoolExecutor(max_workers=settings.invoice_render_workers)
+    return _render_pool
+
+
+def shutdown_render_pool():
+    """
+    Shut down the PDF render process pool. Called from the application lifespan.
+    """
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown(wait=False, cancel_futures=True)
+        _render_pool = None
+
+
+async def render_pdf_pages(pdf_bytes: bytes, page_numbers: List[int], dpi: Optional[int] = None) -> List[bytes]:
+    """
+    Rasterize PDF pages to PNG bytes in the process pool, one chunk of pages per worker.
+    """
+    if not page_numbers:
+        return []
+    dpi = dpi or settings.invoice_pdf_dpi
+    workers = max(1, min(settings.invoice_render_workers, len(page_numbers)))
+    chunks = [page_numbers[i::workers] for i in range(workers)]
+    loop = asyncio.get_event_loop()
+    rendered = await asyncio.gather(*[
+        loop.run_in_executor(get_render_pool(), _render_pdf_pages, pdf_bytes, chunk, dpi)
+        for chunk in chunks
+    ])
+    images = {}
+    for chunk, chunk_images in zip(chunks, rendered):
+        images.update(zip(chunk, chunk_images))
+    return [images[n] for n in page_numbers]
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == "" or value == "string" or value == [] or value == {}
+
 
-            ("human",
-                [
-                    {"type":"text", "text": "Extract all text from this document with high accuracy:"},
-                    {"type": "image_url", "image_url": {"url": "{image_url}"}}
-                ])
-        ])
+def _merge_fields(base: Optional[Dict[str, Any]], update: Dict[str, Any], prefer_update: bool = False) -> Dict[str, Any]:
+    merged = dict(base or {})
+    for key, value in update.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge_fields(merged[key], value, prefer_update)
+        elif _is_empty(merged.get(key)) or (prefer_update and not _is_empty(value)):
+            merged[key] = value
+    return merged
 
-        self.prompt_template = ChatPromptTemplate.from_messages([
-            ("system", """
+
+def merge_invoice_pages(pages: List[Dict[str, Any]], page_numbers: Optional[List[Any]] = None) -> Dict[str, Any]:
+    """
+    Merge per-page invoice extractions into one invoice.
+    Header fields keep the first non-empty value, financial totals keep the last one
+    (totals are printed at the end), and line items are concatenated in page order.
+    `page_numbers` labels each extraction in `pageErrors` (default: 1, 2, ...).
+    """
+    merged: Dict[str, Any] = {}
+    line_items: List[Any] = []
+    page_errors = []
+    for page_number, page in zip(page_numbers or range(1, len(pages) + 1), pages):
+        if not isinstance(page, dict) or "error" in page:
+            page_errors.append({"page": page_number, "error": page.get("error") if isinstance(page, dict) else str(page)})
+            continue
+        for key, value in page.items():
+            if key == "lineItems":
+                line_items.extend(value or [])
+            elif isinstance(value, dict):
+                merged[key] = _merge_fields(merged.get(key), value, prefer_update=(key == "financials"))
+            elif _is_empty(merged.get(key)):
+                merged[key] = value
+    merged["lineItems"] = line_items
+    if page_errors:
+        merged["pageErrors"] = page_errors
+    return merged
+
+
+TEXT_EXTRACT_SYSTEM_PROMPT = """Extract all text content from this document exactly as it appears.
+Maintain the original layout and formatting as much as possible.
+Pay special attention to:
+1. Table structures and numerical data
+2. Invoice-specific fields like dates, amounts, and IDs
+3. Vendor and customer information
+4. Line items with quantities and prices"""
+
+INVOICE_JSON_SYSTEM_PROMPT = """
 You are an expert invoice data extraction assistant. You must return ONLY a valid JSON object with no additional text, formatting, or explanations.
 
 CRITICAL RULES:
@@ -86,31 +175,31 @@ METADATA:
 
 Return the JSON in this exact structure:
 
-{{
+{
   "invoiceNumber": "string",
   "date": "string",
   "dueDate": "string",
-  "vendor": {{
+  "vendor": {
     "name": "string",
     "address": "string",
     "taxId": "string",
     "contactInfo": "string"
-  }},
-  "customer": {{
+  },
+  "customer": {
     "name": "string",
     "address": "string",
     "contactInfo": "string"
-  }},
+  },
   "lineItems": [
-    {{
+    {
       "description": "string",
       "qty": "string",
       "rate": "string",
       "amount": "string"
       // The keys here should match exactly as they appear in the document, e.g., "Unit price", "MRP", "Rate", etc.
-    }}
+    }
   ],
-  "financials": {{
+  "financials": {
     "subtotal": "string",
     "discount": "string",
     "tax": "string",
@@ -119,52 +208,63 @@ Return the JSON in this exact structure:
     "total": "string",
     "currency": "string",
     "taxName": "string"
-  }},
-  "payment": {{
+  },
+  "payment": {
     "method": "string",
     "terms": "string",
-    "bankDetails": {{
+    "bankDetails": {
       "accountNumber": "string",
       "routingNumber": "string",
       "iban": "string",
       "swift": "string",
       "bankName": "string"
-    }},
+    },
     "paymentLink": "string"
-  }},
-  "meta": {{
+  },
+  "meta": {
     "language": "string",
     "languageName": "string",
     "country": "string",
     "countryCode": "string",
-    "confidence": {{
+    "confidence": {
       "overall": 0,
-      "fields": {{}}
-    }},
-    "audit": {{
+      "fields": {}
+    },
+    "audit": {
       "status": "string",
       "issues": [],
-      "taxCompliance": {{
+      "taxCompliance": {
         "status": "string",
         "details": "string"
-      }}
-    }},
-    "suggestions": {{
+      }
+    },
+    "suggestions": {
       "invoiceType": "string",
       "categories": [
-        {{"name": "string", "confidence": 0}}
+        {"name": "string", "confidence": 0}
       ],
       "vendorTypes": [],
       "selectedCategory": "string",
       "selectedVendorType": null
-    }}
-  }}
-}}
+    }
+  }
+}
 
 IMPORTANT: Return ONLY the JSON object. Ensure all syntax is valid JSON.
-"""),
-            ("human", "Extract invoice data from this text and return structured JSON:\n{text}")
-        ])
+"""
+
+
+class SimpleInvoiceExtractor:
+    """
+    Document text and invoice JSON extraction. Text-model and vision-model calls go through
+    the invoice LLM gateways, so a slow provider is hedged and a failing one is skipped.
+    """
+    # Bump when any extraction prompt changes so cached results are not reused
+    PROMPT_VERSION = "2"
+
+    def __init__(self, text_gateway: LLMGateway = invoice_text_gateway, vision_gateway: LLMGateway = invoice_vision_gateway):
+        self.text_gateway = text_gateway
+        self.vision_gateway = vision_gateway
 
     def clean_json_response(self, response: str) -> str:
         """Clean the response to extract pure JSON"""
@@ -257,30 +357,21 @@ IMPORTANT: Return ONLY the JSON object. Ensure all syntax is valid JSON.
             return "invoice"
         return "invoice"    
 
-    def extract_invoice_fromate_from_text(self, text: str, doctype: str):
+    async def aextract_invoice_json_from_text(self, text: str, doc_type: str) -> dict:
+        """
+        Extract structured invoice JSON from document text with the text model.
+        """
         try:
-            # Get raw response from model
-            chain = self.prompt_template | self.model2
-            response = chain.invoke(
-                {"text": text, "documentType": doctype},
-                config={"return_token_usage": True}
+            response = await self.text_gateway.run(
+                f"Extract invoice data from this text and return structured JSON:\n{text}",
+                system_message=INVOICE_JSON_SYSTEM_PROMPT,
             )
-            
             # Clean the response to extract pure JSON
-            clean_response = self.clean_json_response(response.content)
-
-            # Parse JSON manually with better error handling
-            try:
-                parsed_data = json.loads(clean_response)
-                return parsed_data
-            except json.JSONDecodeError as json_error:
-                raise HTTPException(status_code=500, detail=str(json_error))
-                
+            return json.loads(self.clean_json_response(response.content or ""))
         except Exception as e:
-            print(f"Error processing text: {e}")
+            logging.error(f"Error processing text: {e}")
             raise HTTPException(status_code=500, detail="Internal processing error")
 
-
     def fix_common_json_issues(self, json_str: str) -> str:
         """Fix common JSON formatting issues"""
         # Remove trailing commas
@@ -292,91 +383,102 @@ IMPORTANT: Return ONLY the JSON object. Ensure all syntax is valid JSON.
         
         return json_str
     
-    def extract_from_pdf_bytes(self, pdf_bytes: bytes) -> InvoiceData:
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        if doc.page_count == 0:
+    @property
+    def cache_identity(self) -> str:
+        """
+        Models and prompt version that determine extraction output, used in result cache keys.
+        """
+        return f"{settings.invoice_text_models}|{settings.invoice_vision_models}|{self.PROMPT_VERSION}"
+
+    async def aextract_text_from_pdf_bytes(self, pdf_bytes: bytes) -> dict:
+        """
+        Extract the text of every page of a PDF.
+        Pages with an embedded text layer are read directly; only scanned pages are
+        rasterized (in the process pool) and sent to the vision model, concurrently.
+        """
+        page_texts = await asyncio.get_event_loop().run_in_executor(None, _extract_pdf_text_layer, pdf_bytes)
+        if not page_texts:
             raise ValueError("No pages found in PDF")
-        page = doc.load_page(0)
-        pix = page.get_pixmap()
-        img_bytes = pix.tobytes("png")
-        base64_image = base64.b64encode(img_bytes).decode("utf-8")
-        return self.extract_from_base64_image(base64_image)
 
-    def extract_from_base64_image(self, base64_image: str) -> InvoiceData:
-        try:
-            chain = (
-                self.text_extract_prompt_template 
-                | self.model 
-                | {"text": StrOutputParser(), "metadata": lambda x: x}
-            )
-            result = chain.invoke(
-                {"image_url": f"data:image/png;base64,{base64_image}"},
-                config={"return_token_usage": True}
-            )
-            
-            token_usage = result["metadata"].usage_metadata
-            
-            return {"text": result["text"]}
-            
-        except Exception as e:
-            print(f"Error processing base64 image: {e}")
-            raise
+        min_chars = settings.invoice_text_layer_min_chars
+        scanned_pages = [n for n, text in enumerate(page_texts) if len(text) < min_chars]
+        images = await render_pdf_pages(pdf_bytes, scanned_pages)
+
+        semaphore = asyncio.Semaphore(settings.invoice_page_concurrency)
 
-    def extract_invoice_json_from_image_groq(self, image_bytes: bytes, doc_type: str) -> dict:
+        async def read_page(image_bytes: bytes) -> str:
+            async with semaphore:
+                result = await self.aextract_text_from_image(image_bytes)
+                return result["text"]
+
+        vision_texts = await asyncio.gather(*[read_page(image) for image in images])
+        for page_number, text in zip(scanned_pages, vision_texts):
+            page_texts[page_number] = text
+        return {"text": "\n\n".join(page_texts), "pages": len(page_texts), "vision_pages": len(scanned_pages)}
+
+    async def aextract_invoice_json_from_pdf(self, pdf_bytes: bytes, doc_type: str) -> dict:
         """
-        Accepts image bytes, sends to Groq LLM with invoice extraction prompt, returns parsed JSON dict.
+        Extract structured invoice JSON from every page of a PDF.
+        Pages with an embedded text layer go through a single text-model call together; only
+        pages below `invoice_text_layer_min_chars` are rasterized in the process pool and sent
+        to the vision model, concurrently (bounded by `invoice_page_concurrency`). The
+        extractions are merged into one invoice in page order.
         """
-        import base64
-        import json
-        # Convert image bytes to base64 and build data URL
-        base64_image = base64.b64encode(image_bytes).decode("utf-8")
-        image_data_url = f"data:image/png;base64,{base64_image}"
-        api_key = os.getenv("GROQ_API_KEY")
-        # Build the prompt and call Groq API
-        client = Groq(api_key=api_key)
-        system_prompt = (
-            "You are an expert invoice data extraction assistant. You must return ONLY a valid JSON object with no additional text, formatting, or explanations.\n\n"
-            "CRITICAL RULES:\n1. Return ONLY the JSON object - no markdown, no code blocks, no explanations\n2. Ensure all JSON syntax is correct - no trailing commas, proper quotes, valid structure\n3. Use consistent field names throughout\n4. All string values must be properly quoted\n5. All numeric values should be strings for consistency\n6. Do not include any comments or extra text\n\n"
-            "DYNAMIC FIELD NAMES:\n- For all fields in lineItems (and anywhere else in the JSON where the document provides a field name), use the exact field names as they appear in the document.\n- For example, if the document uses \"Unit price\", \"MRP\", \"Rate\", \"Qty\", \"Quantity\", \"Description\", etc., use those exact keys in the output JSON.\n- Do not standardize, translate, or change the field names.\n- If a field is missing in the document, keep the value as null.\n\n"
-            "Extract the following information from the document:\n\n"
-            "BASIC DETAILS:\n- Invoice number, date, due date\n- Reference numbers or codes\n\n"
-            "VENDOR INFORMATION:\n- Name, address, tax ID, contact information\n\n"
-            "CUSTOMER INFORMATION:\n- Name, address, contact information\n\n"
-            "LINE ITEMS:\n- Description, quantity, unit price/rate, amount\n- Use original field names from document (e.g., \"qty\" vs \"quantity\", \"rate\" vs \"unitPrice\")\n\n"
-            "FINANCIAL DETAILS:\n- Subtotal, taxes, discounts, shipping, total\n- Currency and tax information\n\n"
-            "PAYMENT INFORMATION:\n- Payment method, terms, bank details\n- Payment links or early discount terms\n\n"
-            "METADATA:\n- Language detection (ISO 639-1)\n- Country identification\n- Confidence scores for extraction accuracy\n- Financial validation and audit results\n\n"
-            "Return the JSON in this exact structure:\n\n"
-            "{\n  \"invoiceNumber\": \"string\",\n  \"date\": \"string\",\n  \"dueDate\": \"string\",\n  \"vendor\": {\n    \"name\": \"string\",\n    \"address\": \"string\",\n    \"taxId\": \"string\",\n    \"contactInfo\": \"string\"\n  },\n  \"customer\": {\n    \"name\": \"string\",\n    \"address\": \"string\",\n    \"contactInfo\": \"string\"\n  },\n  \"lineItems\": [\n    {\n      \"description\": \"string\",\n      \"qty\": \"string\",\n      \"rate\": \"string\",\n      \"amount\": \"string\"\n      // The keys here should match exactly as they appear in the document, e.g., \"Unit price\", \"MRP\", \"Rate\", etc.\n    }\n  ],\n  \"financials\": {\n    \"subtotal\": \"string\",\n    \"discount\": \"string\",\n    \"tax\": \"string\",\n    \"taxRate\": \"string\",\n    \"shipping\": \"string\",\n    \"total\": \"string\",\n    \"currency\": \"string\",\n    \"taxName\": \"string\"\n  },\n  \"payment\": {\n    \"method\": \"string\",\n    \"terms\": \"string\",\n    \"bankDetails\": {\n      \"accountNumber\": \"string\",\n      \"routingNumber\": \"string\",\n      \"iban\": \"string\",\n      \"swift\": \"string\",\n      \"bankName\": \"string\"\n    },\n    \"paymentLink\": \"string\"\n  },\n  \"meta\": {\n    \"language\": \"string\",\n    \"languageName\": \"string\",\n    \"country\": \"string\",\n    \"countryCode\": \"string\",\n    \"confidence\": {\n      \"overall\": 0,\n      \"fields\": {}\n    },\n    \"audit\": {\n      \"status\": \"string\",\n      \"issues\": [],\n      \"taxCompliance\": {\n        \"status\": \"string\",\n        \"details\": \"string\"\n      }\n    },\n    \"suggestions\": {\n      \"invoiceType\": \"string\",\n      \"categories\": [\n        {\"name\": \"string\", \"confidence\": 0}\n      ],\n      \"vendorTypes\": [],\n      \"selectedCategory\": \"string\",\n      \"selectedVendorType\": null\n    }\n  }\n}\n\nIMPORTANT: Return ONLY the JSON object. Ensure all syntax is valid JSON."
+        page_texts = await asyncio.get_event_loop().run_in_executor(None, _extract_pdf_text_layer, pdf_bytes)
+        if not page_texts:
+            raise ValueError("No pages found in PDF")
+
+        min_chars = settings.invoice_text_layer_min_chars
+        text_pages = [n for n, text in enumerate(page_texts) if len(text) >= min_chars]
+        scanned_pages = [n for n, text in enumerate(page_texts) if len(text) < min_chars]
+        text = "\n\n".join(page_texts[n] for n in text_pages)
+        if not scanned_pages:
+            return await self.aextract_invoice_json_from_text(text, doc_type)
+
+        images = await render_pdf_pages(pdf_bytes, scanned_pages)
+        if not text_pages and len(images) == 1:
+            return await self.aextract_invoice_json_from_image(images[0], doc_type)
+
+        semaphore = asyncio.Semaphore(settings.invoice_page_concurrency)
+
+        async def extract_part(func, content) -> dict:
+            async with semaphore:
+                try:
+                    return await func(content, doc_type)
+                except Exception as e:
+                    return {"error": getattr(e, "detail", None) or str(e)}
+
+        # (first page, page label, extraction) for the text-layer pages and each scanned page
+        parts = [(n, n + 1, extract_part(self.aextract_invoice_json_from_image, image)) for n, image in zip(scanned_pages, images)]
+        if text_pages:
+            label = text_pages[0] + 1 if len(text_pages) == 1 else [n + 1 for n in text_pages]
+            parts.append((text_pages[0], label, extract_part(self.aextract_invoice_json_from_text, text)))
+        parts.sort(key=lambda part: part[0])
+        results = await asyncio.gather(*[extraction for _, _, extraction in parts])
+        return merge_invoice_pages(list(results), [label for _, label, _ in parts])
+
+    async def aextract_text_from_image(self, image_bytes: bytes) -> dict:
+        """
+        Read the text of a document image with the vision model.
+        """
+        response = await self.vision_gateway.run(
+            "Extract all text from this document with high accuracy:",
+            images=[Image(content=image_bytes)],
+            system_message=TEXT_EXTRACT_SYSTEM_PROMPT,
         )
-        user_prompt = [
-            {
-                "type": "text",
-                "text": f"Document type: {doc_type}\nExtract all text content from this document exactly as it appears.\n      Maintain the original layout and formatting as much as possible.\n      Pay special attention to:\n      1. Table structures and numerical data\n      2. Invoice-specific fields like dates, amounts, and IDs\n      3. Vendor and customer information\n      4. Line items with quantities and prices"
-            },
-            {
-                "type": "image_url",
-                "image_url": {"url": image_data_url}
-            }
-        ]
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
-        completion = client.chat.completions.create(
-            model="meta-llama/llama-4-scout-17b-16e-instruct",
-            messages=messages,
-            temperature=1,
-            max_completion_tokens=5071,
-            top_p=1,
-            stream=False,
-            response_format={"type": "json_object"},
-            stop=None,
+        return {"text": response.content or ""}
+
+    async def aextract_invoice_json_from_image(self, image_bytes: bytes, doc_type: str) -> dict:
+        """
+        Extract structured invoice JSON directly from a document image with the vision model.
+        """
+        response = await self.vision_gateway.run(
+            f"Document type: {doc_type}\n{TEXT_EXTRACT_SYSTEM_PROMPT}",
+            images=[Image(content=image_bytes)],
+            system_message=INVOICE_JSON_SYSTEM_PROMPT,
         )
-        # The response is in completion.choices[0].message.content
-        response_content = completion.choices[0].message.content
         try:
-            return json.loads(response_content)
+            return json.loads(self.clean_json_response(response.content or ""))
         except Exception as e:
-            # Optionally, return the raw string if JSON parsing fails
-            return {"error": str(e), "raw": response_content}
\ No newline at end of file
+            # Return the raw reply when it is not valid JSON
+            return {"error": str(e), "raw": response.content}
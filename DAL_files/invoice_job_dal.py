@@ -0,0 +1,173 @@
+import asyncio
+import json
+import time
+import uuid
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from redis_store import get_invoice_batch_fields, store_invoice_batch_fields
+
+"""
+Job queue for batch invoice extraction: batches are split into per-document jobs,
+processed by a fixed pool of asyncio workers, and polled by batch ID.
+Document payloads stay in the memory of the worker process that accepted the batch; batch
+state and results live in Redis (one hash per batch, a field per document), so a poll can
+land on any worker. Jobs still pending when a process shuts down are marked failed.
+"""
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+SHUTDOWN_ERROR = "Interrupted by a server shutdown; please resubmit this document"
+
+
+class InvoiceJobQueue:
+    """
+    Asyncio-backed batch job queue. Each document is one job; `processor(user_id, document)`
+    does the extraction and its return value becomes the document result.
+    """
+    def __init__(
+        self,
+        processor: Callable[[str, Dict[str, Any]], Awaitable[Any]],
+        workers: int = 4,
+        result_ttl: int = 3600,
+    ):
+        """
+        Initialize the queue with a document processor, the number of concurrent workers,
+        and how long batch state is kept after its last update (seconds).
+        """
+        self.processor = processor
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._payloads: Dict[Tuple[str, int], Tuple[str, Dict[str, Any]]] = {}
+        self._running: Dict[Tuple[str, int], Dict[str, Any]] = {}
+
+    async def submit_batch(self, user_id: str, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Record the batch in Redis, enqueue one job per document and return the new batch status.
+        Each document is a dict with at least `name` and the fields the processor expects.
+        """
+        self._ensure_workers()
+        batch_id = str(uuid.uuid4())
+        meta = {"batch_id": batch_id, "user_id": user_id, "created_at": time.time(), "total": len(documents)}
+        jobs = [
+            {"index": i, "name": doc.get("name"), "status": JOB_QUEUED, "result": None, "error": None, "finished_at": None}
+            for i, doc in enumerate(documents)
+        ]
+        fields = {f"doc:{job['index']}": json.dumps(job) for job in jobs}
+        fields["meta"] = json.dumps(meta)
+        await store_invoice_batch_fields(batch_id, fields, self.result_ttl)
+        for i, doc in enumerate(documents):
+            self._payloads[(batch_id, i)] = (user_id, doc)
+            self._queue.put_nowait((batch_id, i))
+        return self.batch_status(self._batch(meta, jobs), include_results=False)
+
+    async def get_batch(self, batch_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the batch if it exists and belongs to the user.
+        """
+        fields = await get_invoice_batch_fields(batch_id)
+        if "meta" not in fields:
+            return None
+        meta = json.loads(fields["meta"])
+        if meta["user_id"] != user_id:
+            return None
+        jobs = [json.loads(fields[f"doc:{i}"]) for i in range(meta["total"]) if f"doc:{i}" in fields]
+        return self._batch(meta, jobs)
+
+    @staticmethod
+    def batch_status(batch: Dict[str, Any], include_results: bool = True) -> Dict[str, Any]:
+        """
+        Public view of a batch, optionally without per-document results.
+        """
+        status = {key: value for key, value in batch.items() if key not in ("user_id", "documents")}
+        if include_results:
+            status["documents"] = batch["documents"]
+        else:
+            status["documents"] = [
+                {key: value for key, value in doc.items() if key != "result"} for doc in batch["documents"]
+            ]
+        return status
+
+    async def stop(self):
+        """
+        Cancel the workers and mark the jobs this process still held as failed, so their
+        batches finish instead of staying queued or running. Called from the application lifespan on shutdown.
+        """
+        for task in self._worker_tasks:
+            task.cancel()
+        if self._worker_tasks:
+            await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._queue = None
+        interrupted = list(self._running.values())
+        interrupted += [self._job(batch_id, index, doc) for (batch_id, index), (_, doc) in self._payloads.items()]
+        self._running.clear()
+        self._payloads.clear()
+        for job in interrupted:
+            job.update(status=JOB_FAILED, error=SHUTDOWN_ERROR, finished_at=time.time())
+            await self._store_job(job)
+
+    @staticmethod
+    def _batch(meta: Dict[str, Any], jobs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Batch view (status, counters, finish time) derived from its documents' states."""
+        completed = sum(1 for job in jobs if job["status"] == JOB_COMPLETED)
+        failed = sum(1 for job in jobs if job["status"] == JOB_FAILED)
+        if completed + failed == meta["total"]:
+            status = JOB_COMPLETED
+        elif all(job["status"] == JOB_QUEUED for job in jobs):
+            status = JOB_QUEUED
+        else:
+            status = JOB_RUNNING
+        finished_at = max((job["finished_at"] or 0 for job in jobs), default=None) if status == JOB_COMPLETED else None
+        return dict(meta, status=status, finished_at=finished_at, completed=completed, failed=failed, documents=jobs)
+
+    @staticmethod
+    def _job(batch_id: str, index: int, document: Dict[str, Any]) -> Dict[str, Any]:
+        return {"batch_id": batch_id, "index": index, "name": document.get("name"), "status": JOB_QUEUED, "result": None, "error": None, "finished_at": None}
+
+    async def _store_job(self, job: Dict[str, Any]):
+        state = {key: value for key, value in job.items() if key != "batch_id"}
+        try:
+            await store_invoice_batch_fields(job["batch_id"], {f"doc:{job['index']}": json.dumps(state, default=str)}, self.result_ttl)
+        except Exception as e:
+            logging.error(f"Storing invoice job {job['batch_id']}/{job['index']} failed: {e}")
+
+    def _ensure_workers(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._worker_tasks = [task for task in self._worker_tasks if not task.done()]
+        while len(self._worker_tasks) < self.workers:
+            self._worker_tasks.append(asyncio.create_task(self._worker()))
+
+    async def _worker(self):
+        while True:
+            batch_id, index = await self._queue.get()
+            try:
+                await self._run_job(batch_id, index)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, batch_id: str, index: int):
+        payload = self._payloads.pop((batch_id, index), None)
+        if payload is None:
+            return
+        user_id, document = payload
+        job = self._running[(batch_id, index)] = self._job(batch_id, index, document)
+        job["status"] = JOB_RUNNING
+        await self._store_job(job)
+        try:
+            job["result"] = await self.processor(user_id, document)
+            job["status"] = JOB_COMPLETED
+        except asyncio.CancelledError:
+            # Left in _running: stop() records it as interrupted
+            raise
+        except Exception as e:
+            logging.error(f"Invoice job {batch_id}/{index} failed: {e}")
+            job["status"] = JOB_FAILED
+            job["error"] = getattr(e, "detail", None) or str(e)
+        job["finished_at"] = time.time()
+        del self._running[(batch_id, index)]
+        await self._store_job(job)
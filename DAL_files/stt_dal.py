@@ -1,39 +1,107 @@
 import os
-from elevenlabs.client import ElevenLabs
+import asyncio
+from typing import Any, Dict, Optional, Type
+from elevenlabs.client import AsyncElevenLabs
 from fastapi import HTTPException, UploadFile
-from io import BytesIO
 from config import settings
 
 """
 Data Access Layer for Speech-to-Text (STT) operations using ElevenLabs API.
 """
 
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+def transcription_text(transcription: Any) -> str:
+    """
+    Extract the text from the different transcription shapes returned by STT providers.
+    """
+    if isinstance(transcription, dict) and "text" in transcription:
+        return transcription["text"]
+    elif hasattr(transcription, "text"):
+        return transcription.text
+    elif isinstance(transcription, str):
+        return transcription
+    else:
+        raise Exception(f"Unexpected transcription type: {type(transcription)}")
+
+class ElevenLabsSTTBackend:
+    """
+    ElevenLabs Scribe backend. One async client (and HTTP connection pool) is reused
+    for every request; the upload is streamed from its spooled file, not copied into memory.
+    """
+    name = "elevenlabs"
+
+    def __init__(self):
+        self._client: Optional[AsyncElevenLabs] = None
+
+    @property
+    def client(self) -> AsyncElevenLabs:
+        if self._client is None:
+            self._client = AsyncElevenLabs(api_key=settings.elevenlabs_api_key, timeout=settings.stt_timeout)
+        return self._client
+
+    async def transcribe(self, audio_file: UploadFile) -> str:
+        await audio_file.seek(0)
+        transcription = await self.client.speech_to_text.convert(
+            file=(audio_file.filename, audio_file.file, audio_file.content_type),
+            model_id="scribe_v1",
+            tag_audio_events=True,
+            language_code='eng',
+            diarize=True,
+        )
+        return transcription_text(transcription)
+
+class LocalSTTBackend:
+    """
+    Local stand-in backend for tests and offline development: reads the upload in chunks
+    (like a streaming provider would) and returns `settings.stt_local_text`.
+    """
+    name = "local"
+
+    async def transcribe(self, audio_file: UploadFile) -> str:
+        await audio_file.seek(0)
+        while await audio_file.read(UPLOAD_CHUNK_SIZE):
+            pass
+        return settings.stt_local_text
+
+STT_BACKENDS: Dict[str, Type] = {
+    ElevenLabsSTTBackend.name: ElevenLabsSTTBackend,
+    LocalSTTBackend.name: LocalSTTBackend,
+}
+
+def register_stt_backend(name: str, backend_cls: Type):
+    """
+    Register an STT backend class (anything with `async transcribe(audio_file) -> str`).
+    """
+    STT_BACKENDS[name] = backend_cls
+
 class STTDAL:
     """
     Data Access Layer for converting speech audio files to text using ElevenLabs.
     """
+    def __init__(self, backend: Optional[str] = None, max_concurrency: Optional[int] = None):
+        """
+        Initialize with the backend name (default `settings.stt_backend`) and the
+        per-process limit on concurrent transcriptions (default `settings.stt_max_concurrency`).
+        """
+        backend = backend or settings.stt_backend
+        if backend not in STT_BACKENDS:
+            raise ValueError(f"Unsupported STT backend: {backend}")
+        self.backend = STT_BACKENDS[backend]()
+        self.max_concurrency = max_concurrency or settings.stt_max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
     async def speech_to_text(self, audio_file: UploadFile) -> str:
         """
-        Convert an uploaded audio file to text using the ElevenLabs STT API.
+        Convert an uploaded audio file to text using the configured STT backend,
+        without blocking the event loop.
         """
-        client = ElevenLabs(api_key=settings.elevenlabs_api_key)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
         try:
-            audio_data = BytesIO(await audio_file.read())
-            transcription = client.speech_to_text.convert(
-                file=audio_data,
-                model_id="scribe_v1",
-                tag_audio_events=True,
-                language_code='eng',
-                diarize=True,
-            )
-            # Handle different possible return types
-            if isinstance(transcription, dict) and "text" in transcription:
-                return transcription["text"]
-            elif hasattr(transcription, "text"):
-                return transcription.text
-            elif isinstance(transcription, str):
-                return transcription
-            else:
-                raise Exception(f"Unexpected transcription type: {type(transcription)}")
+            async with self._semaphore:
+                return await asyncio.wait_for(self.backend.transcribe(audio_file), settings.stt_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="ElevenLabs STT request timed out")
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"ElevenLabs STT error: {str(e)}")
\ No newline at end of file
+            raise HTTPException(status_code=500, detail=f"ElevenLabs STT error: {str(e)}")
@@ -3,11 +3,13 @@ from sqlalchemy.future import select
 from sqlalchemy.exc import IntegrityError
 from models.tool import Tool
 from schemas.tool_schemas import ToolCreate, ToolUpdate
+from tools.tool_catalog import tool_catalog
 from typing import Optional, List
 import uuid
 
 """
 Data Access Layer for tool management: create, retrieve, update, delete, and list tools.
+Writes invalidate the cached tool catalog used by the chat endpoints (in every worker).
 """
 
 class ToolDAL:
@@ -43,10 +45,11 @@ class ToolDAL:
         try:
             await self.db_session.commit()
             await self.db_session.refresh(tool_obj)
-            return tool_obj
         except IntegrityError:
             await self.db_session.rollback()
             raise ValueError("Tool already exists or constraint failed")
+        await tool_catalog.notify_changed()
+        return tool_obj
 
     async def update(self, tool_id: uuid.UUID, tool_update: ToolUpdate) -> Optional[Tool]:
         """
@@ -60,10 +63,11 @@ class ToolDAL:
         try:
             await self.db_session.commit()
             await self.db_session.refresh(tool_obj)
-            return tool_obj
         except IntegrityError:
             await self.db_session.rollback()
             raise ValueError("Update failed due to constraint violation")
+        await tool_catalog.notify_changed()
+        return tool_obj
 
     async def delete(self, tool_id: uuid.UUID) -> bool:
         """
@@ -74,4 +78,5 @@ class ToolDAL:
             return False
         await self.db_session.delete(tool_obj)
         await self.db_session.commit()
+        await tool_catalog.notify_changed()
         return True 
\ No newline at end of file
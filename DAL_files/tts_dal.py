@@ -1,5 +1,6 @@
 import os
-from elevenlabs.client import ElevenLabs
+from typing import AsyncIterator, Optional
+from elevenlabs.client import AsyncElevenLabs
 from elevenlabs import VoiceSettings
 from schemas.tts_schemas import TTSRequest
 from fastapi import HTTPException
@@ -15,46 +16,95 @@ DEFAULT_VOICE_ID = settings.default_voice_id
 DEFAULT_MODEL_ID = settings.default_model_id
 DEFAULT_OUTPUT_FORMAT = settings.default_output_format
 
+# Content types for ElevenLabs output formats, by codec prefix
+OUTPUT_MEDIA_TYPES = {
+    "mp3": "audio/mpeg",
+    "pcm": "audio/pcm",
+    "ulaw": "audio/basic",
+    "alaw": "audio/x-alaw-basic",
+    "opus": "audio/ogg",
+}
+
+def media_type_for(output_format: str) -> str:
+    """
+    Return the HTTP content type for an ElevenLabs output format (e.g. mp3_44100_128).
+    """
+    return OUTPUT_MEDIA_TYPES.get(output_format.split("_", 1)[0], "application/octet-stream")
+
 class TTSDAL:
     """
     Data Access Layer for converting text to speech audio using ElevenLabs.
     """
+    def __init__(self):
+        """
+        The ElevenLabs client is created on first use and reused for every request.
+        """
+        self._client: Optional[AsyncElevenLabs] = None
+
+    @property
+    def client(self) -> AsyncElevenLabs:
+        if self._client is None:
+            self._client = AsyncElevenLabs(api_key=settings.elevenlabs_api_key)
+        return self._client
+
+    @property
+    def media_type(self) -> str:
+        return media_type_for(settings.default_output_format)
+
     async def text_to_speech(self, tts_request: TTSRequest) -> bytes:
         """
-        Convert text to speech audio bytes using the ElevenLabs TTS API (runs in threadpool).
+        Convert text to speech audio bytes using the ElevenLabs TTS API.
+        Chunks are accumulated in a bytearray (used by the JSON/base64 response mode).
         """
-        # Use ElevenLabs SDK (sync, so run in threadpool)
-        import asyncio
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, self._sync_text_to_speech, tts_request)
+        audio_bytes = bytearray()
+        async for chunk in self.stream_text_to_speech(tts_request):
+            audio_bytes += chunk
+        return bytes(audio_bytes)
 
-    def _sync_text_to_speech(self, tts_request: TTSRequest) -> bytes:
+    async def stream_text_to_speech(self, tts_request: TTSRequest, optimize_streaming_latency: int = 0) -> AsyncIterator[bytes]:
         """
-        Synchronous helper for text-to-speech conversion using ElevenLabs.
+        Stream speech audio chunks from ElevenLabs as soon as they are produced.
+        `optimize_streaming_latency` trades quality for time to first chunk (0 = best quality).
         """
-        client = ElevenLabs(api_key=settings.elevenlabs_api_key)
-        text_input = tts_request.text
-        voice_id = settings.default_voice_id
-        model_id = settings.default_model_id
-        output_format = settings.default_output_format
         # Optional: tune voice settings
         voice_settings = VoiceSettings(
             stability=0.5,
             similarity_boost=0.75
         )
         try:
-            audio_stream = client.text_to_speech.convert(
-                text=text_input,
-                voice_id=voice_id,
-                model_id=model_id,
-                optimize_streaming_latency="0",
+            audio_stream = self.client.text_to_speech.stream(
+                text=tts_request.text,
+                voice_id=settings.default_voice_id,
+                model_id=settings.default_model_id,
+                optimize_streaming_latency=optimize_streaming_latency,
                 voice_settings=voice_settings,
-                output_format=output_format
+                output_format=settings.default_output_format
             )
-            audio_bytes = b""
-            for chunk in audio_stream:
+            async for chunk in audio_stream:
                 if chunk:
-                    audio_bytes += chunk
-            return audio_bytes
+                    yield chunk
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"ElevenLabs TTS error: {str(e)}") 
\ No newline at end of file
+            raise HTTPException(status_code=500, detail=f"ElevenLabs TTS error: {str(e)}")
+
+    async def open_stream(self, tts_request: TTSRequest) -> AsyncIterator[bytes]:
+        """
+        Start a TTS stream and wait for its first chunk, so provider errors surface as an
+        HTTP error before any response bytes are sent. Returns an iterator over all chunks.
+        Uses the `tts_optimize_streaming_latency` level, since the audio is played as it arrives.
+        """
+        stream = self.stream_text_to_speech(tts_request, optimize_streaming_latency=settings.tts_optimize_streaming_latency)
+        try:
+            first_chunk = await stream.__anext__()
+        except StopAsyncIteration:
+            first_chunk = b""
+
+        async def chunks():
+            try:
+                if first_chunk:
+                    yield first_chunk
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                await stream.aclose()
+
+        return chunks()
@@ -3,6 +3,7 @@ from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from sqlalchemy.orm import selectinload
+from DAL_files.entitlement_dal import entitlement_cache
 """
 Data Access Layer for user API key management: create, retrieve, list, and revoke API keys.
 """
@@ -58,6 +59,20 @@ class UsersApiKeyDAL:
         await self.db_session.refresh(key)
         return key
 
+    async def update_api_key_status(self, api_key, is_active):
+        """
+        Set the active status of an API key.
+        """
+        key = await self.get_api_key(api_key)
+        if not key:
+            return None
+
+        key.is_active = is_active
+        await self.db_session.commit()
+        await self.db_session.refresh(key)
+        await entitlement_cache.invalidate_key(api_key)
+        return key
+
     async def toggle_api_key_status(self, api_key):
         """
         Toggle the active status of an API key using direct SQL UPDATE.
@@ -78,6 +93,7 @@ class UsersApiKeyDAL:
             
             await self.db_session.commit()
             await self.db_session.refresh(key)
+            await entitlement_cache.invalidate_key(api_key)
             return key
             
         except Exception as e:
@@ -92,4 +108,5 @@ class UsersApiKeyDAL:
         if key:
              await self.db_session.delete(key)
              await self.db_session.commit()
+             await entitlement_cache.invalidate_key(api_key)
         return key 
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import sys
+import time
+import warnings
+
+from agno.agent import Agent
+from agno.models.google import Gemini
+
+from llm_clients import LLMClientRegistry
+
+"""
+Benchmark for LLM client reuse: a fresh `Gemini` model + `Agent` per request (what the
+controllers used to do) against `LLMClientRegistry` (shared model and connection pool,
+per-request agent), both calling a local stub of the Gemini generateContent endpoint.
+The stub counts the TCP connections it accepts: every new connection is a TCP handshake
+here and an additional TLS handshake against the real API.
+
+Usage: python benchmark_llm_clients.py [requests] [concurrency]
+"""
+
+STUB_RESPONSE = json.dumps({
+    "candidates": [{"content": {"role": "model", "parts": [{"text": "SELECT 1"}]}, "finishReason": "STOP"}],
+    "usageMetadata": {"promptTokenCount": 12, "candidatesTokenCount": 3, "totalTokenCount": 15},
+}).encode("utf-8")
+PROMPT = "Which products sold the most last month?"
+
+
+class StubServer:
+    """
+    Minimal HTTP/1.1 server with keep-alive that answers every request with `STUB_RESPONSE`.
+    """
+    def __init__(self):
+        self.connections = 0
+        self.requests = 0
+        self._server = None
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    def reset(self) -> None:
+        self.connections = self.requests = 0
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.decode("latin-1").split("\r\n")[1:]:
+                    name, _, value = line.partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value)
+                await reader.readexactly(length)
+                self.requests += 1
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(STUB_RESPONSE)}\r\n\r\n".encode("latin-1")
+                    + STUB_RESPONSE
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+
+async def run_batch(make_agent, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            response = await make_agent().arun(PROMPT)
+            assert response.content == "SELECT 1", response.content
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return time.perf_counter() - started
+
+
+async def main(requests: int = 200, concurrency: int = 8):
+    stub = StubServer()
+    base_url = await stub.start()
+
+    def per_request_agent():
+        model = Gemini(id="gemini-2.0-flash", api_key="stub", client_params={"http_options": {"base_url": base_url}})
+        return Agent(model=model)
+
+    registry = LLMClientRegistry(api_key="stub", base_url=base_url)
+    scenarios = (("per-request", per_request_agent), ("registry", registry.agent))
+    # Warm up imports and lazy SDK state outside the measurement
+    for _, make_agent in scenarios:
+        await run_batch(make_agent, 2, 1)
+
+    print(f"{requests} requests, concurrency {concurrency}")
+    for name, make_agent in scenarios:
+        stub.reset()
+        seconds = await run_batch(make_agent, requests, concurrency)
+        print(f"{name:>12}: {seconds / requests * 1000:7.3f} ms/request, {stub.connections:4d} connections for {stub.requests} requests")
+
+    await registry.aclose()
+    await stub.stop()
+
+
+if __name__ == "__main__":
+    # Clients built per request are never closed: that is the behavior being measured
+    warnings.simplefilter("ignore", ResourceWarning)
+    asyncio.run(main(*(int(arg) for arg in sys.argv[1:3])))
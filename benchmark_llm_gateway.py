@@ -0,0 +1,57 @@
+import asyncio
+import random
+import sys
+import time
+
+import numpy as np
+
+from llm_gateway import FakeProvider, LLMGateway
+
+"""
+Tail-latency simulation for the LLM gateway with deterministic fake providers.
+Each provider's latencies are drawn from a seeded heavy-tailed distribution (log-normal
+body, occasional 10x stalls). The same request sequence is sent to the primary provider
+alone and through the gateway with hedging; prints p50/p95/p99 and the extra calls hedging costs.
+
+Usage: python benchmark_llm_gateway.py [requests] [concurrency]
+"""
+
+
+def latencies(seed: int, count: int, median: float = 0.02, stall_rate: float = 0.05) -> list:
+    rng = random.Random(seed)
+    return [median * rng.lognormvariate(0, 0.3) * (10 if rng.random() < stall_rate else 1) for _ in range(count)]
+
+
+async def run(gateway: LLMGateway, requests: int, concurrency: int) -> np.ndarray:
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await gateway.run("prompt")
+            timings.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return np.asarray(timings) * 1000
+
+
+async def main(requests: int = 1000, concurrency: int = 20):
+    scenarios = (
+        ("primary only", lambda: LLMGateway([FakeProvider("primary", latencies(1, requests))], hedge_enabled=False)),
+        ("hedged", lambda: LLMGateway(
+            [FakeProvider("primary", latencies(1, requests)), FakeProvider("secondary", latencies(2, requests, median=0.03))],
+            hedge_delay=0.05, hedge_min_delay=0.01,
+        )),
+    )
+    print(f"{requests} requests, concurrency {concurrency}")
+    for name, make_gateway in scenarios:
+        gateway = make_gateway()
+        timings = await run(gateway, requests, concurrency)
+        calls = sum(provider["calls"] for provider in gateway.stats().values())
+        p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+        print(f"{name:>13}: p50 {p50:6.1f} ms  p95 {p95:6.1f} ms  p99 {p99:6.1f} ms  calls/request {calls / requests:.3f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*(int(arg) for arg in sys.argv[1:3])))
@@ -0,0 +1,79 @@
+import re
+import sys
+import timeit
+from tools.sql_guard import UnsafeSQLError, prepare_sql
+
+"""
+Microbenchmark for SQL post-processing: the previous regex-only `clean_sql` + SELECT check
+against `tools.sql_guard.prepare_sql`, over a corpus of typical LLM SQL replies.
+Prints per-call timings and every reply the two pipelines classify differently.
+
+Usage: python benchmark_sql_guard.py [iterations]
+"""
+
+CORPUS = [
+    "SELECT name, SUM(quantity) AS total FROM order_items GROUP BY name ORDER BY total DESC LIMIT 3;",
+    "```sql\nSELECT p.name, SUM(oi.quantity) AS sold\nFROM products p\nJOIN order_items oi ON oi.product_id = p.id\n"
+    "WHERE oi.created_at >= date_trunc('month', now()) - interval '1 month'\nGROUP BY p.name\nORDER BY sold DESC\nLIMIT 3;\n```",
+    "Here is the SQL query to answer your question:\n\n```sql\nSELECT COUNT(*) * 1.0 / 7 AS daily_avg FROM orders WHERE status = 'shipped';\n```\n\n"
+    "This query counts the shipped orders and divides by seven.",
+    "SELECT customer_id, email FROM `customers` WHERE country = 'DE' -- German customers only\nORDER BY created_at DESC",
+    "WITH monthly AS (\n  SELECT date_trunc('month', created_at) AS month, SUM(total) AS revenue\n  FROM orders GROUP BY 1\n)\n"
+    "SELECT month, revenue FROM monthly ORDER BY month",
+    "**SQL Query:**\nSELECT name FROM products WHERE description ILIKE '%*new*%' ORDER BY price DESC;",
+    "SELECT “name” FROM products WHERE category = ‘toys’",
+    "SELECT id FROM users WHERE note = 'drop; delete from users' LIMIT 10",
+    "ERROR: Cannot generate SELECT query",
+    "WITH gone AS (DELETE FROM sessions WHERE expires_at < now() RETURNING id) SELECT COUNT(id) FROM gone",
+    "SELECT * FROM orders; DROP TABLE orders;",
+    "SELECT * INTO orders_backup FROM orders",
+    "UPDATE products SET price = price * 0.9 WHERE category = 'sale'",
+    "SELECT id, status FROM orders WHERE id = 42 FOR UPDATE",
+    "(SELECT name FROM products ORDER BY price DESC LIMIT 1) UNION ALL (SELECT name FROM products ORDER BY price LIMIT 1)",
+    "SELECT id, total FROM orders ORDER BY created_at DESC OFFSET 20",
+    "SELECT $$'$$; DELETE FROM users; SELECT '$$'",
+]
+
+
+def legacy_clean_sql(sql: str) -> str:
+    """`clean_sql` as it was in controllers/ai_sql_agent.py."""
+    sql = re.sub(r"```sql\s*|```", "", sql.strip(), flags=re.IGNORECASE)
+    sql = re.sub(r"\*\*.*?\*\*", "", sql)
+    sql = re.sub(r"\*.*?\*", "", sql)
+    sql_keywords = r"\b(SELECT|INSERT|UPDATE|DELETE|CREATE|ALTER|DROP|WITH)\b"
+    match = re.search(sql_keywords, sql, re.IGNORECASE)
+    if match:
+        sql = sql[match.start():]
+    sql = re.sub(r";.*$", ";", sql, flags=re.DOTALL)
+    sql = re.sub(r'\s+', ' ', sql.strip())
+    return sql.strip()
+
+
+def legacy_pipeline(reply: str):
+    sql = legacy_clean_sql(reply)
+    if not sql or sql.lower().startswith("error:") or not re.search(r"\bselect\b", sql, re.IGNORECASE):
+        return None
+    return sql
+
+
+def guarded_pipeline(reply: str):
+    try:
+        return prepare_sql(reply, "postgresql", 100000)
+    except UnsafeSQLError:
+        return None
+
+
+def main(iterations: int = 2000):
+    for name, pipeline in (("legacy", legacy_pipeline), ("sql_guard", guarded_pipeline)):
+        seconds = timeit.timeit(lambda: [pipeline(reply) for reply in CORPUS], number=iterations)
+        print(f"{name:>10}: {seconds / (iterations * len(CORPUS)) * 1e6:7.2f} us/reply")
+
+    print("\nDifferences (legacy -> sql_guard):")
+    for reply in CORPUS:
+        before, after = legacy_pipeline(reply), guarded_pipeline(reply)
+        if before != after:
+            print(f"- {reply[:70]!r}\n    legacy:    {before!r}\n    sql_guard: {after!r}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
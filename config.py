@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from dotenv import load_dotenv
 import os
+from typing import Dict, List, Optional
 
 """
 Configuration module for environment variables and application settings using Pydantic.
@@ -30,6 +31,8 @@ class Settings(BaseSettings):
     redis_host: str
     redis_port: str
     redis_password: str
+    redis_max_connections: int = 50
+    redis_socket_timeout: float = 5
 
     # Google OAuth Configuration
     google_client_id: str
@@ -54,6 +57,134 @@ class Settings(BaseSettings):
     default_voice_id: str = "EXAVITQu4vr4xnSDxMaL"
     default_model_id: str = "eleven_flash_v2_5"
     default_output_format: str = "mp3_44100_128"
+    # ElevenLabs latency optimization level of streamed audio (/audio-chat/stream; 0 = best quality, 4 = lowest latency)
+    tts_optimize_streaming_latency: int = 3
+
+    # Speech-to-text ("elevenlabs", or "local" stand-in for tests)
+    stt_backend: str = "elevenlabs"
+    stt_max_concurrency: int = 8
+    stt_timeout: float = 120
+    stt_local_text: str = "local transcription"
+
+    # Customer database engine pooling
+    sql_engine_max_engines: int = 32
+    sql_engine_idle_ttl: int = 900
+    sql_engine_pool_size: int = 5
+    sql_engine_max_overflow: int = 10
+    sql_engine_pool_recycle: int = 1800
+    sql_engine_dispose_grace: float = 120
+    sql_statement_timeout: float = 30
+    # Worker threads for dialects without an async driver (e.g. SQLite)
+    sql_thread_workers: int = 8
+
+    # Customer database schema snapshot cache
+    schema_cache_ttl: int = 600
+    schema_cache_max_entries: int = 128
+    schema_cache_use_redis: bool = False
+
+    # Text-to-SQL answer cache (prompt -> SQL; optional short-lived SQL -> result)
+    answer_cache_sql_ttl: int = 3600
+    answer_cache_sql_max_entries: int = 1024
+    answer_cache_result_enabled: bool = False
+    answer_cache_result_ttl: int = 60
+    answer_cache_result_max_entries: int = 256
+
+    # Prompt pruning: only the most relevant tables/tools (BM25) within a token budget
+    schema_prune_enabled: bool = True
+    schema_prune_table_top_k: int = 12
+    schema_prune_token_budget: int = 4000
+    tool_prune_top_k: int = 8
+    tool_prune_token_budget: int = 2000
+
+    # Parameterized tool SQL plans
+    sql_plan_cache_max_entries: int = 512
+    sql_plan_cache_max_shapes: int = 4096
+
+    # Tool catalog: cached in process, invalidated by tool writes (Redis pub/sub across workers)
+    tool_catalog_ttl: int = 300
+    tool_catalog_pubsub: bool = True
+
+    # Deterministic tool matcher: tool_config rules + TF-IDF, bypasses the generation call
+    tool_matcher_enabled: bool = True
+    tool_matcher_threshold: float = 0.6
+    tool_matcher_margin: float = 0.15
+
+    # Coalesce identical in-flight /chat requests (same user, database and normalized prompt)
+    chat_single_flight: bool = True
+
+    # Server-sent events chat (/chat/stream): result rows sent per "rows" event
+    chat_stream_rows_per_event: int = 100
+
+    # SQL result delivery: rows in the /chat response, /results pages, NDJSON streaming
+    sql_result_page_size: int = 10
+    sql_result_max_page_size: int = 1000
+    sql_stream_batch_size: int = 1000
+    sql_stream_max_rows: int = 1000000
+    sql_page_token_ttl: int = 3600
+    # LIMIT added to generated SQL that has none (also bounds pages and streams)
+    sql_max_result_rows: int = 100000
+
+    # Refine prompt: results over the budget are sent as column statistics + a sample
+    refine_result_token_budget: int = 1500
+    refine_value_max_chars: int = 200
+
+    # API key entitlement cache
+    entitlement_cache_ttl: int = 30
+    entitlement_cache_use_redis: bool = False
+    entitlement_cache_max_entries: int = 10000
+
+    # Usage metering (write-behind accumulates increments in Redis)
+    usage_write_behind: bool = False
+    usage_flush_interval: float = 5
+
+    # Invoice PDF extraction
+    invoice_pdf_dpi: int = 150
+    invoice_render_workers: int = 2
+    invoice_page_concurrency: int = 4
+    invoice_text_layer_min_chars: int = 50
+
+    # Batch invoice extraction
+    invoice_batch_workers: int = 4
+    invoice_batch_max_documents: int = 500
+    invoice_batch_result_ttl: int = 3600
+    invoice_batch_max_file_bytes: int = 25 * 1024 * 1024
+    invoice_batch_max_archive_bytes: int = 200 * 1024 * 1024
+
+    # Invoice extraction result cache ("redis", "disk" or "none")
+    invoice_cache_backend: str = "redis"
+    invoice_cache_dir: str = ".cache/invoice_results"
+    invoice_cache_max_entries: int = 10000
+    invoice_cache_max_bytes: int = 512 * 1024 * 1024
+    invoice_cache_ttl: int = 7 * 24 * 3600
+    invoice_cache_count_usage: bool = True
+
+    # LLM execution
+    llm_max_workers: int = 16
+    llm_timeout: float = 60
+    llm_default_concurrency: int = 8
+    llm_provider_concurrency: Dict[str, int] = {"Google": 16, "Groq": 8}
+
+    # Shared LLM HTTP clients: keep-alive pools reused across requests
+    llm_max_connections: int = 100
+    llm_max_keepalive_connections: int = 20
+    llm_keepalive_expiry: float = 60
+    llm_base_url: Optional[str] = None
+
+    # LLM gateway: providers in preference order, hedging after the primary's p95, circuit breakers
+    llm_gateway_providers: List[str] = ["gemini", "groq"]
+    llm_gateway_models: Dict[str, str] = {"gemini": "gemini-2.0-flash", "groq": "llama-3.3-70b-versatile"}
+    llm_hedge_enabled: bool = True
+    llm_hedge_delay: float = 2.0
+    llm_hedge_min_delay: float = 0.5
+    llm_latency_alpha: float = 0.1
+    llm_breaker_failures: int = 5
+    llm_breaker_reset: float = 30
+
+    # Invoice extraction LLMs: providers in preference order (same gateway hedging and breakers),
+    # with a text model and a vision model per provider
+    invoice_llm_providers: List[str] = ["groq", "gemini"]
+    invoice_text_models: Dict[str, str] = {"groq": "llama-3.3-70b-versatile", "gemini": "gemini-2.0-flash"}
+    invoice_vision_models: Dict[str, str] = {"groq": "meta-llama/llama-4-scout-17b-16e-instruct", "gemini": "gemini-2.0-flash"}
 
     model_config = SettingsConfigDict(env_file=DOTENV_PATH, extra="allow")
 
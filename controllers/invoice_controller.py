@@ -2,10 +2,10 @@ from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Form
 from fastapi.responses import JSONResponse
 import os
 from DAL_files.invoice_dal import SimpleInvoiceExtractor
+from DAL_files.invoice_cache_dal import invoice_result_cache
 from schemas.invoice_schemas import InvoiceTextRequest
 import tempfile
 import re
-from config import settings
 from dependencies import invoice_usage_checker
 from DAL_files.api_usage_dal import ApiUsageDAL
 from database import get_session
@@ -16,8 +16,7 @@ load_dotenv()
 
 
 invoice_router = APIRouter()
-api_key = settings.groq_api_key
-invoice_extractor = SimpleInvoiceExtractor(groq_api_key=api_key)
+invoice_extractor = SimpleInvoiceExtractor()
 usage_service = ApiUsageDAL()
 
 """
@@ -35,7 +34,7 @@ async def extract_invoice(
     try:
         doc_type = invoice_extractor.classify_document(request.text)
         print("-----------------",doc_type,"-------------")
-        invoice_data = invoice_extractor.extract_invoice_fromate_from_text(request.text, doc_type)
+        invoice_data = await invoice_extractor.aextract_invoice_json_from_text(request.text, doc_type)
         
         # Increment invoice usage counter after successful extraction
         
@@ -56,15 +55,17 @@ async def extract_pdf_image_text(
     try:
         suffix = os.path.splitext(file.filename)[1].lower()
         file_bytes = file.file.read()
-       
-        if suffix == ".pdf":
-            invoice_data = invoice_extractor.extract_from_pdf_bytes(file_bytes)
-        elif suffix in [".jpg", ".jpeg", ".png", ".bmp"]:
-            import base64
-            base64_image = base64.b64encode(file_bytes).decode("utf-8")
-            invoice_data = invoice_extractor.extract_from_base64_image(base64_image)
-        else:
+
+        async def extract():
+            if suffix == ".pdf":
+                return await invoice_extractor.aextract_text_from_pdf_bytes(file_bytes)
+            return await invoice_extractor.aextract_text_from_image(file_bytes)
+
+        if suffix != ".pdf" and suffix not in [".jpg", ".jpeg", ".png", ".bmp"]:
             raise HTTPException(status_code=400, detail=f"Unsupported file type: {suffix}")
+        invoice_data, _ = await invoice_result_cache.get_or_extract(
+            file_bytes, "text", None, invoice_extractor.cache_identity, extract
+        )
         
         # Increment invoice usage counter after successful extraction
         
@@ -88,18 +89,16 @@ async def extract_invoice_image_groq(
         if suffix not in allowed_image_types + [".pdf"]:
             raise HTTPException(status_code=400, detail=f"Unsupported file type: {suffix}")
         file_bytes = await file.read()
-        if suffix == ".pdf":
-            # Convert first page of PDF to image bytes
-            import fitz
-            doc = fitz.open(stream=file_bytes, filetype="pdf")
-            if doc.page_count == 0:
-                raise HTTPException(status_code=400, detail="No pages found in PDF")
-            page = doc.load_page(0)
-            pix = page.get_pixmap()
-            image_bytes = pix.tobytes("png")
-        else:
-            image_bytes = file_bytes
-        invoice_data = invoice_extractor.extract_invoice_json_from_image_groq(image_bytes, doc_type)
+
+        async def extract():
+            if suffix == ".pdf":
+                # Every page is extracted (text layer first, vision for scanned pages) and merged
+                return await invoice_extractor.aextract_invoice_json_from_pdf(file_bytes, doc_type)
+            return await invoice_extractor.aextract_invoice_json_from_image(file_bytes, doc_type)
+
+        invoice_data, _ = await invoice_result_cache.get_or_extract(
+            file_bytes, "json", doc_type, invoice_extractor.cache_identity, extract
+        )
         return invoice_data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
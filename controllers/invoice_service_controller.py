@@ -1,12 +1,20 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Form
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Form, Header, Response
 from fastapi.responses import JSONResponse
 import os
 from DAL_files.invoice_dal import SimpleInvoiceExtractor
-from schemas.invoice_schemas import InvoiceTextRequest2
+from schemas.invoice_schemas import InvoiceTextRequest2, InvoiceBatchTextRequest
+from DAL_files.invoice_job_dal import InvoiceJobQueue
+from DAL_files.invoice_cache_dal import invoice_result_cache
+from DAL_files.entitlement_dal import EntitlementDAL
+from database import async_session_maker
+from config import settings
+from typing import List
+import io
+import zipfile
 import tempfile 
 import re
 import os
-from dependencies import invoice_usage_checker
+from dependencies import invoice_usage_checker, api_key_user
 from dotenv import load_dotenv
 from database import get_session
 from sqlmodel.ext.asyncio.session import AsyncSession
@@ -16,12 +24,109 @@ load_dotenv()
 
 
 invoice_service_router = APIRouter()
-api_key = os.getenv("GROQ_API_KEY")
-if not api_key:
-    raise ValueError("GROQ_API_KEY environment variable is required")
-invoice_extractor = SimpleInvoiceExtractor(groq_api_key=api_key)
+invoice_extractor = SimpleInvoiceExtractor()
 api_usage_dal = ApiUsageDAL()
 
+IMAGE_SUFFIXES = [".jpg", ".jpeg", ".png", ".bmp"]
+BATCH_MODES = ["json", "text"]
+
+
+async def extract_document(document: dict):
+    """
+    Run extraction for one batch document.
+    `kind` is "text", "pdf" or "image"; `mode` "json" returns structured invoice JSON,
+    "text" returns the raw document text (same as /extract/pdf-image-text).
+    Returns `(result, cache_hit)`.
+    """
+    kind = document["kind"]
+    doc_type = document.get("doc_type") or "invoice"
+    if kind == "text":
+        result = await invoice_extractor.aextract_invoice_json_from_text(document["text"], doc_type)
+        return result, False
+    if document["mode"] == "text":
+        return await extract_file_text(document["content"], kind == "pdf")
+    return await extract_file_json(document["content"], kind == "pdf", doc_type)
+
+
+async def extract_file_text(file_bytes: bytes, is_pdf: bool):
+    """
+    Extract the raw text of a PDF or image, served from the result cache when the same
+    bytes were extracted before. Returns `(result, cache_hit)`.
+    """
+    async def extract():
+        if is_pdf:
+            return await invoice_extractor.aextract_text_from_pdf_bytes(file_bytes)
+        return await invoice_extractor.aextract_text_from_image(file_bytes)
+
+    return await invoice_result_cache.get_or_extract(file_bytes, "text", None, invoice_extractor.cache_identity, extract)
+
+
+async def extract_file_json(file_bytes: bytes, is_pdf: bool, doc_type: str):
+    """
+    Extract structured invoice JSON from a PDF or image, served from the result cache when
+    the same bytes were extracted before with the same doc_type. Returns `(result, cache_hit)`.
+    """
+    async def extract():
+        if is_pdf:
+            # Every page is extracted (text layer first, vision for scanned pages) and merged
+            return await invoice_extractor.aextract_invoice_json_from_pdf(file_bytes, doc_type)
+        return await invoice_extractor.aextract_invoice_json_from_image(file_bytes, doc_type)
+
+    return await invoice_result_cache.get_or_extract(file_bytes, "json", doc_type, invoice_extractor.cache_identity, extract)
+
+
+async def meter_extraction(user_id: str, session: AsyncSession, cache_hit: bool):
+    """
+    Count one invoice usage, unless the result came from the cache and cached results are free.
+    """
+    if cache_hit and not settings.invoice_cache_count_usage:
+        return
+    await api_usage_dal.increment_invoice_usage(user_id, session)
+
+
+async def process_batch_document(user_id: str, document: dict):
+    """
+    Job processor: extract one document and meter it as one invoice usage.
+    """
+    result, cache_hit = await extract_document(document)
+    async with async_session_maker() as session:
+        await meter_extraction(user_id, session, cache_hit)
+    return result
+
+
+invoice_job_queue = InvoiceJobQueue(
+    processor=process_batch_document,
+    workers=settings.invoice_batch_workers,
+    result_ttl=settings.invoice_batch_result_ttl,
+)
+
+
+def file_document(name: str, content: bytes, doc_type: str, mode: str) -> dict:
+    """
+    Build a batch document from an uploaded file, or None if its type is unsupported.
+    """
+    suffix = os.path.splitext(name)[1].lower()
+    if suffix == ".pdf":
+        kind = "pdf"
+    elif suffix in IMAGE_SUFFIXES:
+        kind = "image"
+    else:
+        return None
+    return {"name": name, "kind": kind, "content": content, "doc_type": doc_type, "mode": mode}
+
+
+async def check_batch_quota(x_api_key: str, session: AsyncSession, documents: int):
+    """
+    Reject a batch that would take the key past its plan's invoice limit.
+    """
+    entitlement = await EntitlementDAL(session).resolve(x_api_key)
+    limit = entitlement.limits.get("invoice") if entitlement else None
+    if limit is not None and entitlement.usage.get("invoice", 0) + documents > limit:
+        raise HTTPException(
+            status_code=403,
+            detail=f"Invoice usage limit would be exceeded: {limit - entitlement.usage.get('invoice', 0)} documents remaining"
+        )
+
 @invoice_service_router.post("/extract/invoice")
 async def extract_invoice(
     request: InvoiceTextRequest2, 
@@ -32,7 +137,7 @@ async def extract_invoice(
     Classify document type and extract invoice data from provided text.
     """
     try:
-        invoice_data = invoice_extractor.extract_invoice_fromate_from_text(request.text, request.doc_type)
+        invoice_data = await invoice_extractor.aextract_invoice_json_from_text(request.text, request.doc_type)
      
         # Increment invoice usage counter after successful extraction
         await api_usage_dal.increment_invoice_usage(user_id, session)
@@ -43,28 +148,25 @@ async def extract_invoice(
 
 @invoice_service_router.post("/extract/pdf-image-text")
 async def extract_pdf_image_text(
+    response: Response,
     file: UploadFile = File(...),
     user_id: str = Depends(invoice_usage_checker),
     session: AsyncSession = Depends(get_session)
 ):
     """
     Extract invoice data from an uploaded PDF or image file (in-memory, no temp file).
+    Identical re-uploads are served from the result cache (X-Cache: HIT).
     """
     try:
         suffix = os.path.splitext(file.filename)[1].lower()
-        file_bytes = file.file.read()
-       
-        if suffix == ".pdf":
-            invoice_data = invoice_extractor.extract_from_pdf_bytes(file_bytes)
-        elif suffix in [".jpg", ".jpeg", ".png", ".bmp"]:
-            import base64
-            base64_image = base64.b64encode(file_bytes).decode("utf-8")
-            invoice_data = invoice_extractor.extract_from_base64_image(base64_image)
-        else:
+        if suffix != ".pdf" and suffix not in IMAGE_SUFFIXES:
             raise HTTPException(status_code=400, detail=f"Unsupported file type: {suffix}")
-        
+        file_bytes = file.file.read()
+        invoice_data, cache_hit = await extract_file_text(file_bytes, suffix == ".pdf")
+        response.headers["X-Cache"] = "HIT" if cache_hit else "MISS"
+
         # Increment invoice usage counter after successful extraction
-        await api_usage_dal.increment_invoice_usage(user_id, session)
+        await meter_extraction(user_id, session, cache_hit)
         
         return invoice_data
     except Exception as e:
@@ -72,6 +174,7 @@ async def extract_pdf_image_text(
 
 @invoice_service_router.post("/extract/invoice-image-groq")
 async def extract_invoice_image_groq(
+    response: Response,
     file: UploadFile = File(...),
     doc_type: str = Form(...),
     user_id: str = Depends(invoice_usage_checker),
@@ -87,19 +190,105 @@ async def extract_invoice_image_groq(
         if suffix not in allowed_image_types + [".pdf"]:
             raise HTTPException(status_code=400, detail=f"Unsupported file type: {suffix}")
         file_bytes = await file.read()
-        if suffix == ".pdf":
-            # Convert first page of PDF to image bytes
-            import fitz
-            doc = fitz.open(stream=file_bytes, filetype="pdf")
-            if doc.page_count == 0:
-                raise HTTPException(status_code=400, detail="No pages found in PDF")
-            page = doc.load_page(0)
-            pix = page.get_pixmap()
-            image_bytes = pix.tobytes("png")
-        else:
-            image_bytes = file_bytes
-        invoice_data = invoice_extractor.extract_invoice_json_from_image_groq(image_bytes, doc_type)
-        await api_usage_dal.increment_invoice_usage(user_id, session)
+        invoice_data, cache_hit = await extract_file_json(file_bytes, suffix == ".pdf", doc_type)
+        response.headers["X-Cache"] = "HIT" if cache_hit else "MISS"
+        await meter_extraction(user_id, session, cache_hit)
         return invoice_data
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@invoice_service_router.post("/batch/extract/files")
+async def submit_invoice_file_batch(
+    files: List[UploadFile] = File(...),
+    doc_type: str = Form("invoice"),
+    mode: str = Form("json"),
+    x_api_key: str = Header(..., alias="X-API-Key"),
+    user_id: str = Depends(invoice_usage_checker),
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Queue a batch of PDF/image files (or .zip archives of them) for extraction.
+    Each document is processed and metered separately. Poll /batch/{batch_id} for results.
+    """
+    if mode not in BATCH_MODES:
+        raise HTTPException(status_code=400, detail=f"Unsupported mode: {mode}")
+    documents = []
+    for upload in files:
+        content = await upload.read()
+        if os.path.splitext(upload.filename)[1].lower() == ".zip":
+            try:
+                archive = zipfile.ZipFile(io.BytesIO(content))
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail=f"Invalid zip archive: {upload.filename}")
+            unpacked = 0
+            for info in archive.infolist():
+                if info.is_dir() or file_document(info.filename, b"", doc_type, mode) is None:
+                    continue
+                # Check the declared size before inflating (reads stop at it), so archives can't expand without bound
+                unpacked += info.file_size
+                if info.file_size > settings.invoice_batch_max_file_bytes or unpacked > settings.invoice_batch_max_archive_bytes:
+                    raise HTTPException(status_code=400, detail=f"Zip archive {upload.filename} is too large when extracted")
+                try:
+                    entry = archive.read(info)
+                except (zipfile.BadZipFile, NotImplementedError, RuntimeError) as e:
+                    raise HTTPException(status_code=400, detail=f"Invalid zip entry {info.filename}: {e}")
+                document = file_document(info.filename, entry, doc_type, mode)
+                if document is not None:
+                    documents.append(document)
+        else:
+            document = file_document(upload.filename, content, doc_type, mode)
+            if document is None:
+                raise HTTPException(status_code=400, detail=f"Unsupported file type: {upload.filename}")
+            documents.append(document)
+
+    if not documents:
+        raise HTTPException(status_code=400, detail="No supported documents found")
+    if len(documents) > settings.invoice_batch_max_documents:
+        raise HTTPException(status_code=400, detail=f"A batch may contain at most {settings.invoice_batch_max_documents} documents")
+    await check_batch_quota(x_api_key, session, len(documents))
+    return await invoice_job_queue.submit_batch(user_id, documents)
+
+@invoice_service_router.post("/batch/extract/invoice")
+async def submit_invoice_text_batch(
+    request: InvoiceBatchTextRequest,
+    x_api_key: str = Header(..., alias="X-API-Key"),
+    user_id: str = Depends(invoice_usage_checker),
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Queue a batch of raw invoice texts for structured extraction. Poll /batch/{batch_id} for results.
+    """
+    if not request.texts:
+        raise HTTPException(status_code=400, detail="No texts provided")
+    if len(request.texts) > settings.invoice_batch_max_documents:
+        raise HTTPException(status_code=400, detail=f"A batch may contain at most {settings.invoice_batch_max_documents} documents")
+    await check_batch_quota(x_api_key, session, len(request.texts))
+    documents = [
+        {"name": f"text-{i}", "kind": "text", "text": text, "doc_type": request.doc_type}
+        for i, text in enumerate(request.texts)
+    ]
+    return await invoice_job_queue.submit_batch(user_id, documents)
+
+@invoice_service_router.get("/batch/{batch_id}")
+async def get_invoice_batch(batch_id: str, include_results: bool = True, user_id: str = Depends(api_key_user)):
+    """
+    Return the status of a batch and, once available, each document's result.
+    Polling only needs a valid API key (the batch was admitted and is metered per document),
+    so a batch that used the remaining quota can still be collected.
+    """
+    batch = await invoice_job_queue.get_batch(batch_id, user_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return InvoiceJobQueue.batch_status(batch, include_results=include_results)
+
+@invoice_service_router.get("/batch/{batch_id}/documents/{index}")
+async def get_invoice_batch_document(batch_id: str, index: int, user_id: str = Depends(api_key_user)):
+    """
+    Return the status and result of a single document in a batch.
+    """
+    batch = await invoice_job_queue.get_batch(batch_id, user_id)
+    if batch is None or not 0 <= index < len(batch["documents"]):
+        raise HTTPException(status_code=404, detail="Document not found")
+    return batch["documents"][index]
+
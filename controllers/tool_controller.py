@@ -4,6 +4,7 @@ from typing import List, Dict, Any, Optional
 from models.tool import Tool
 from schemas.tool_schemas import ToolCreate, ToolResponse
 from database import get_session
+from tools.tool_catalog import tool_catalog
  # Assuming OpenAI for LLM, replace with your provider if needed
 import os
 from sqlalchemy import text, select
@@ -11,8 +12,7 @@ from sqlalchemy.ext.asyncio import create_async_engine
 
 tool_router = APIRouter()
 
-from agno.agent import Agent
-from agno.models.google import Gemini
+from llm_clients import llm_clients
 
 def generate_sql_template(name: str, description: str) -> str:
     prompt = (
@@ -21,11 +21,7 @@ def generate_sql_template(name: str, description: str) -> str:
         "(e.g., {column}, {table}, {condition}). Only output the SQL template, nothing else.\n\n"
         f"Name: {name}\nDescription: {description}\nSQL Template:"
     )
-    model = Gemini(
-        id="gemini-2.0-flash", 
-        api_key=os.getenv("GEMINI_API_KEY")  # Or however you load your key
-    )
-    agent = Agent(model=model)
+    agent = llm_clients.agent()
     response = agent.run(prompt)
     if response and response.content:
         return response.content.strip()
@@ -47,6 +43,7 @@ async def create_tool(tool: ToolCreate, db: AsyncSession = Depends(get_session))
     db.add(db_tool)
     await db.commit()
     await db.refresh(db_tool)
+    await tool_catalog.notify_changed()
     return db_tool
 
 @tool_router.get("/", response_model=List[ToolResponse])
@@ -16,6 +16,12 @@ async_engine: AsyncEngine = create_async_engine(
     echo=True,
 )
 
+async_session_maker = sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
+
 # Initialize the DB
 async def init_db():
     """
@@ -43,12 +49,7 @@ async def get_session() -> AsyncSession:
     """
     Dependency that provides an async database session for FastAPI endpoints.
     """
-    async_session = sessionmaker(
-        bind=async_engine,
-        class_=AsyncSession,
-        expire_on_commit=False
-    )
-    async with async_session() as session:
+    async with async_session_maker() as session:
         yield session
 
 # CLI run support
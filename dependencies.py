@@ -8,7 +8,7 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 from DAL_files.roles_dal import RoleDAL
 from DAL_files.users_api_key_dal import UsersApiKeyDAL
 from typing import List, Any, Optional
-from redis_store import token_in_blocklist
+from redis_store import token_in_blocklist, get_pending_usage
 from DAL_files.payment_dal import PaymentDAL
 from datetime import datetime
 from models.user_subscription import UserSubscription
@@ -18,121 +18,74 @@ from models.users_api_key import UsersApiKey
 from sqlalchemy.future import select
 from models.api_usage import ApiUsage
 from models.plan import Plan
+from DAL_files.entitlement_dal import EntitlementDAL, USAGE_KINDS
+from config import settings
+import logging
 
 
-async def chat_usage_checker(
-    x_api_key: str = Header(..., alias="X-API-Key"),
-    session: AsyncSession = Depends(get_session)
-):
+def usage_checker(kind: str):
     """
-    Dependency to check if the user (by API key) has not exceeded their chat usage limit.
+    Build a dependency that checks the user (by API key) has not exceeded their `kind` usage limit
+    ("chat" or "invoice"). The key, usage, active subscription and plan limits are resolved in a
+    single joined query, or from the entitlement cache plus one usage lookup.
     Raises HTTPException if not allowed.
     Returns user_id if allowed.
     """
-    # 1. Check API key
-    result = await session.execute(
-        select(UsersApiKey).where(
-            UsersApiKey.api_key == x_api_key,
-            UsersApiKey.is_active == True
-        )
-    )
-    api_key_obj = result.scalar_one_or_none()
-    if not api_key_obj:
-        raise HTTPException(status_code=401, detail="Invalid API key")
-    api_key_id = api_key_obj.users_api_key_id
-    user_id = api_key_obj.user_id
+    if kind not in USAGE_KINDS:
+        raise ValueError(f"Unknown usage kind: {kind}")
+
+    async def checker(
+        x_api_key: str = Header(..., alias="X-API-Key"),
+        session: AsyncSession = Depends(get_session)
+    ):
+        entitlement = await EntitlementDAL(session).resolve(x_api_key)
+
+        # 1. Check API key
+        if entitlement is None:
+            raise HTTPException(status_code=401, detail="Invalid API key")
 
-    # 2. Get API usage for user
-    result = await session.execute(
-        select(ApiUsage).where(ApiUsage.users_api_key_id == api_key_id)
-    )
-    usage_obj = result.scalar_one_or_none()
-    if not usage_obj:
-        raise HTTPException(status_code=404, detail="API usage not found for user")
-    chat_usage = usage_obj.chatUsage
+        # 2. Check API usage for the key
+        if not entitlement.has_usage:
+            raise HTTPException(status_code=404, detail="API usage not found for user")
 
-    # 3. Get subscription for user
-    result = await session.execute(
-        select(UserSubscription).where(
-            UserSubscription.userId == user_id,
-            UserSubscription.status.in_(["active", "Active"])
-        )
-    )
-    subscription_obj = result.scalar_one_or_none()
-    if not subscription_obj:
-        raise HTTPException(status_code=404, detail="Subscription not found for user")
-    plan_id = subscription_obj.planId
+        # 3. Check subscription and plan for the user
+        if not entitlement.has_subscription:
+            raise HTTPException(status_code=404, detail="Subscription not found for user")
+        if not entitlement.has_plan:
+            raise HTTPException(status_code=404, detail="Plan not found")
 
-    # 4. Get plan for plan_id
-    result = await session.execute(
-        select(Plan).where(Plan.id == plan_id)
-    )
-    plan_obj = result.scalar_one_or_none()
-    if not plan_obj:
-        raise HTTPException(status_code=404, detail="Plan not found")
-    chat_limit = plan_obj.chatLimit
+        # 4. Compare usage with plan limit (including write-behind increments not yet flushed)
+        limit = entitlement.limits.get(kind)
+        usage = entitlement.usage.get(kind, 0)
+        if limit is not None and settings.usage_write_behind:
+            try:
+                usage += await get_pending_usage(kind, entitlement.user_id)
+            except Exception as e:
+                logging.error(f"Reading pending usage failed: {e}")
+        if limit is not None and usage >= limit:
+            raise HTTPException(status_code=403, detail=f"{kind.capitalize()} usage limit reached")
 
-    # 5. Compare usage with plan limit
-    if chat_limit is not None and chat_usage >= chat_limit:
-        raise HTTPException(status_code=403, detail="Chat usage limit reached")
+        return entitlement.user_id
 
-    return user_id
+    checker.__name__ = f"{kind}_usage_checker"
+    return checker
 
 
-async def invoice_usage_checker(
+async def api_key_user(
     x_api_key: str = Header(..., alias="X-API-Key"),
     session: AsyncSession = Depends(get_session)
 ):
     """
-    Dependency to check if the user (by API key) has not exceeded their invoice usage limit.
-    Raises HTTPException if not allowed.
-    Returns user_id if allowed.
+    Authenticate by API key only, without a usage limit check (e.g. fetching results of work
+    that was already admitted and metered).
+    Raises HTTPException if the key is invalid.
+    Returns user_id.
     """
-    # 1. Check API key
-    result = await session.execute(
-        select(UsersApiKey).where(
-            UsersApiKey.api_key == x_api_key,
-            UsersApiKey.is_active == True
-        )
-    )
-    api_key_obj = result.scalar_one_or_none()
-    if not api_key_obj:
+    entitlement = await EntitlementDAL(session).resolve(x_api_key)
+    if entitlement is None:
         raise HTTPException(status_code=401, detail="Invalid API key")
-    api_key_id = api_key_obj.users_api_key_id
-    user_id = api_key_obj.user_id
-
-    # 2. Get API usage for user
-    result = await session.execute(
-        select(ApiUsage).where(ApiUsage.users_api_key_id == api_key_id)
-    )
-    usage_obj = result.scalar_one_or_none()
-    if not usage_obj:
-        raise HTTPException(status_code=404, detail="API usage not found for user")
-    invoice_usage = usage_obj.invoiceUsage
-
-    # 3. Get subscription for user
-    result = await session.execute(
-        select(UserSubscription).where(
-            UserSubscription.userId == user_id,
-            UserSubscription.status.in_(["active", "Active"])
-        )
-    )
-    subscription_obj = result.scalar_one_or_none()
-    if not subscription_obj:
-        raise HTTPException(status_code=404, detail="Subscription not found for user")
-    plan_id = subscription_obj.planId
-
-    # 4. Get plan for plan_id
-    result = await session.execute(
-        select(Plan).where(Plan.id == plan_id)
-    )
-    plan_obj = result.scalar_one_or_none()
-    if not plan_obj:
-        raise HTTPException(status_code=404, detail="Plan not found")
-    invoice_limit = plan_obj.invoiceLimit
+    return entitlement.user_id
 
-    # 5. Compare usage with plan limit
-    if invoice_limit is not None and invoice_usage >= invoice_limit:
-        raise HTTPException(status_code=403, detail="Invoice usage limit reached")
 
-    return user_id
+chat_usage_checker = usage_checker("chat")
+invoice_usage_checker = usage_checker("invoice")
@@ -0,0 +1,111 @@
+from typing import Any, Dict, Optional
+
+import httpx
+from agno.agent import Agent
+from agno.models.google import Gemini
+from google import genai
+from google.genai import types as genai_types
+
+from config import settings
+
+"""
+Application-scoped LLM clients.
+Model objects and the HTTP connection pools behind them are created once (started from
+the application lifespan) and shared by every request, so requests reuse keep-alive
+connections instead of paying client construction and a new TLS handshake each time.
+Agents hold per-run state, so each request still gets its own `Agent` bound to a shared model.
+"""
+
+DEFAULT_MODEL_ID = "gemini-2.0-flash"
+
+
+class LLMClientRegistry:
+    """
+    Shared Gemini models backed by one pooled `genai.Client`.
+    """
+    def __init__(
+        self,
+        api_key: Optional[str],
+        timeout: float = 60,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 60,
+        base_url: Optional[str] = None,
+    ):
+        """
+        Args:
+            api_key (str): Gemini API key.
+            timeout (float): Per-request HTTP timeout in seconds.
+            max_connections (int): Maximum open connections per pool.
+            max_keepalive_connections (int): Idle connections kept open for reuse.
+            keepalive_expiry (float): Seconds an idle connection is kept.
+            base_url (str, optional): Alternative API endpoint (proxy, local stub).
+        """
+        self.api_key = api_key
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.base_url = base_url
+        self._http_client: Optional[httpx.Client] = None
+        self._async_http_client: Optional[httpx.AsyncClient] = None
+        self._client: Optional[genai.Client] = None
+        self._models: Dict[str, Gemini] = {}
+
+    def start(self) -> None:
+        """Open the connection pools and the SDK client. Called from the lifespan; also done
+        lazily on first use (scripts, workers without the lifespan)."""
+        if self._client is not None:
+            return
+        timeout = httpx.Timeout(self.timeout)
+        self._http_client = httpx.Client(limits=self.limits, timeout=timeout)
+        self._async_http_client = httpx.AsyncClient(limits=self.limits, timeout=timeout)
+        # Passing our own httpx clients makes the SDK use them (and their pools) for every call
+        http_options = genai_types.HttpOptions(
+            base_url=self.base_url,
+            timeout=int(self.timeout * 1000),
+            httpx_client=self._http_client,
+            httpx_async_client=self._async_http_client,
+        )
+        self._client = genai.Client(api_key=self.api_key, http_options=http_options)
+
+    def model(self, model_id: str = DEFAULT_MODEL_ID) -> Gemini:
+        """Return the shared model for `model_id` (created on first use)."""
+        model = self._models.get(model_id)
+        if model is None:
+            self.start()
+            model = self._models[model_id] = Gemini(id=model_id, api_key=self.api_key, client=self._client)
+        return model
+
+    def agent(self, model_id: str = DEFAULT_MODEL_ID, **kwargs: Any) -> Agent:
+        """Create a per-request agent on the shared model.
+
+        Args:
+            model_id (str): Gemini model id.
+            **kwargs: Agent options (e.g. `output_schema`).
+
+        Returns:
+            Agent: A new agent; its run state is not shared with other requests.
+        """
+        return Agent(model=self.model(model_id), **kwargs)
+
+    async def aclose(self) -> None:
+        """Close the connection pools. Called on application shutdown."""
+        if self._async_http_client is not None:
+            await self._async_http_client.aclose()
+        if self._http_client is not None:
+            self._http_client.close()
+        self._http_client = self._async_http_client = self._client = None
+        self._models.clear()
+
+
+llm_clients = LLMClientRegistry(
+    api_key=settings.gemini_api_key,
+    timeout=settings.llm_timeout,
+    max_connections=settings.llm_max_connections,
+    max_keepalive_connections=settings.llm_max_keepalive_connections,
+    keepalive_expiry=settings.llm_keepalive_expiry,
+    base_url=settings.llm_base_url,
+)
@@ -0,0 +1,168 @@
+import asyncio
+import functools
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from fastapi import HTTPException
+from config import settings
+
+"""
+Async execution layer for LLM calls.
+Runs agents through their native async API when available, otherwise on a bounded
+dedicated thread pool, so a slow completion never blocks the event loop. Each provider
+gets its own concurrency limit and every call is bounded by a timeout.
+"""
+
+
+class LLMCallCounter:
+    """
+    Number of LLM calls made while handling one request.
+    """
+    __slots__ = ("count",)
+
+    def __init__(self):
+        self.count = 0
+
+
+_call_counter: ContextVar[Optional[LLMCallCounter]] = ContextVar("llm_call_counter", default=None)
+
+
+class LLMExecutor:
+    """
+    Runs LLM agent calls and blocking provider SDK calls off the event loop with
+    per-provider concurrency limits and timeouts.
+    """
+    def __init__(
+        self,
+        max_workers: int = 16,
+        timeout: float = 60,
+        default_concurrency: int = 8,
+        provider_concurrency: Optional[Dict[str, int]] = None,
+    ):
+        """
+        Initialize the executor.
+        max_workers bounds the fallback thread pool, timeout is the default per-call
+        deadline in seconds, and provider_concurrency maps provider names to the number
+        of in-flight calls allowed for that provider.
+        """
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.default_concurrency = default_concurrency
+        self.provider_concurrency: Dict[str, int] = dict(provider_concurrency or {})
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    @staticmethod
+    def provider_of(agent: Any) -> str:
+        """
+        Return the provider name of an agent's model (e.g. "Google").
+        """
+        model = getattr(agent, "model", None)
+        return getattr(model, "provider", None) or type(model).__name__
+
+    async def run(self, agent: Any, prompt: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """
+        Run an agent asynchronously and return its response.
+        Uses `agent.arun` when it yields an awaitable, otherwise `agent.run` on the thread pool.
+        Raises HTTPException(504) if the call exceeds the timeout.
+        """
+        provider = self.provider_of(agent)
+        self._count_call()
+        async with self._semaphore(provider):
+            arun = getattr(agent, "arun", None)
+            if arun is not None:
+                result = arun(prompt, **kwargs)
+                if inspect.isawaitable(result):
+                    return await self._with_timeout(result, provider, timeout)
+            call = functools.partial(agent.run, prompt, **kwargs)
+            return await self._with_timeout(self._submit(call), provider, timeout)
+
+    async def stream(self, agent: Any, prompt: Any, timeout: Optional[float] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        """
+        Run an agent in streaming mode and yield its run events as they arrive.
+        The timeout bounds each wait for the next event, so a long answer is not cut off but a
+        stalled stream raises HTTPException(504). Agents without an async streaming API yield
+        their final response once.
+        """
+        provider = self.provider_of(agent)
+        self._count_call()
+        async with self._semaphore(provider):
+            arun = getattr(agent, "arun", None)
+            events = arun(prompt, stream=True, **kwargs) if arun is not None else None
+            if not hasattr(events, "__anext__"):
+                if inspect.isawaitable(events):
+                    yield await self._with_timeout(events, provider, timeout)
+                else:
+                    call = functools.partial(agent.run, prompt, **kwargs)
+                    yield await self._with_timeout(self._submit(call), provider, timeout)
+                return
+            try:
+                while True:
+                    try:
+                        event = await self._with_timeout(events.__anext__(), provider, timeout)
+                    except StopAsyncIteration:
+                        break
+                    yield event
+            finally:
+                aclose = getattr(events, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+
+    def track_calls(self) -> LLMCallCounter:
+        """
+        Start counting the agent calls made in the current request (context) and return the counter.
+        """
+        counter = LLMCallCounter()
+        _call_counter.set(counter)
+        return counter
+
+    async def run_blocking(self, provider: str, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """
+        Run a blocking provider SDK call (e.g. token counting) on the thread pool,
+        under the provider's concurrency limit and timeout.
+        """
+        async with self._semaphore(provider):
+            call = functools.partial(fn, *args, **kwargs)
+            return await self._with_timeout(self._submit(call), provider, timeout)
+
+    def shutdown(self) -> None:
+        """
+        Shut down the fallback thread pool. Called from the application lifespan.
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    @staticmethod
+    def _count_call() -> None:
+        counter = _call_counter.get()
+        if counter is not None:
+            counter.count += 1
+
+    def _submit(self, call: Callable[[], Any]) -> "asyncio.Future[Any]":
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm")
+        return asyncio.get_running_loop().run_in_executor(self._pool, call)
+
+    def _semaphore(self, provider: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(provider)
+        if semaphore is None:
+            limit = self.provider_concurrency.get(provider, self.default_concurrency)
+            semaphore = self._semaphores[provider] = asyncio.Semaphore(limit)
+        return semaphore
+
+    async def _with_timeout(self, awaitable: Any, provider: str, timeout: Optional[float]) -> Any:
+        try:
+            return await asyncio.wait_for(awaitable, timeout if timeout is not None else self.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail=f"{provider} LLM request timed out")
+
+
+llm_executor = LLMExecutor(
+    max_workers=settings.llm_max_workers,
+    timeout=settings.llm_timeout,
+    default_concurrency=settings.llm_default_concurrency,
+    provider_concurrency=settings.llm_provider_concurrency,
+)
@@ -0,0 +1,364 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from agno.agent import Agent
+from agno.utils.log import log_debug, logger
+from fastapi import HTTPException
+
+from config import settings
+from llm_clients import llm_clients
+from llm_executor import llm_executor
+
+"""
+Provider-agnostic LLM gateway.
+Callers ask for a completion; the gateway sends it to the preferred healthy provider and,
+when that provider is slower than its own recent p95, hedges with the next one and keeps
+whichever answers first. Failures fall through to the next provider immediately.
+Each provider tracks exponentially weighted latency quantiles and sits behind a circuit
+breaker, so a failing provider is skipped until a probe call succeeds again.
+"""
+
+
+class LatencyTracker:
+    """
+    Exponentially weighted estimates of a provider's latency: mean, p50 and p95.
+    Each quantile moves towards new samples in steps scaled by the recent mean deviation,
+    so the estimates follow shifts in latency within a few dozen calls.
+    """
+    def __init__(self, alpha: float = 0.1):
+        """
+        Args:
+            alpha (float): Weight of a new sample (0-1).
+        """
+        self.alpha = alpha
+        self.samples = 0
+        self.mean: Optional[float] = None
+        self.deviation = 0.0
+        self.quantiles: Dict[float, float] = {}
+
+    def observe(self, seconds: float) -> None:
+        self.samples += 1
+        if self.mean is None:
+            self.mean = seconds
+            self.quantiles = {0.5: seconds, 0.95: seconds}
+            return
+        # Step size from the deviation before this sample, so large samples don't bias it upwards
+        step = self.alpha * max(self.deviation, 0.001) * 2
+        for q, estimate in self.quantiles.items():
+            # Stochastic quantile update: equilibrium where a fraction q of samples is below
+            self.quantiles[q] = max(estimate + step * (q - (seconds < estimate)) / max(q, 1 - q), 0.0)
+        self.deviation += self.alpha * (abs(seconds - self.mean) - self.deviation)
+        self.mean += self.alpha * (seconds - self.mean)
+
+    @property
+    def p50(self) -> Optional[float]:
+        return self.quantiles.get(0.5)
+
+    @property
+    def p95(self) -> Optional[float]:
+        return self.quantiles.get(0.95)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures; after `reset_timeout` seconds one
+    probe call is let through (half-open) and its outcome closes or reopens the breaker.
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            failure_threshold (int): Consecutive failures that open the breaker.
+            reset_timeout (float): Seconds the breaker stays open before a probe.
+            clock (Callable[[], float]): Time source (injectable for deterministic tests).
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.clock() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        """Whether a call may be sent now (claims the probe slot when half-open)."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.probing or self.failures >= self.failure_threshold:
+            self.opened_at = self.clock()
+        self.probing = False
+
+    def release(self) -> None:
+        """Give back a probe slot whose call was cancelled (no outcome)."""
+        self.probing = False
+
+
+class LLMProvider(ABC):
+    """
+    Common interface of gateway providers: `run` returns an agent-style response (with
+    `content` and `model_provider`) or raises. `images` are agno media attached to the prompt.
+    """
+    name = "provider"
+
+    @abstractmethod
+    async def run(self, prompt: str, timeout: Optional[float] = None, images: Optional[Sequence[Any]] = None, **agent_kwargs: Any) -> Any:
+        ...
+
+
+class AgentProvider(LLMProvider):
+    """
+    A provider backed by an agno model; every call gets its own agent on the shared model
+    and goes through `llm_executor` (provider concurrency limit, timeout, call counting).
+    """
+    def __init__(self, name: str, model_factory: Callable[[], Any]):
+        """
+        Args:
+            name (str): Provider name used in metrics and settings.
+            model_factory (Callable[[], Model]): Returns the (shared) model; called per request.
+        """
+        self.name = name
+        self.model_factory = model_factory
+
+    async def run(self, prompt: str, timeout: Optional[float] = None, images: Optional[Sequence[Any]] = None, **agent_kwargs: Any) -> Any:
+        agent = Agent(model=self.model_factory(), **agent_kwargs)
+        run_kwargs = {"images": list(images)} if images else {}
+        return await llm_executor.run(agent, prompt, timeout=timeout, **run_kwargs)
+
+
+class FakeResponse:
+    """
+    Response of `FakeProvider` (same `content` / `metrics` / `model_provider` surface as an agent run).
+    """
+    __slots__ = ("content", "metrics", "model_provider")
+
+    def __init__(self, content: Any, provider: str):
+        self.content = content
+        self.metrics = None
+        self.model_provider = provider
+
+
+class FakeProvider(LLMProvider):
+    """
+    Deterministic provider for tests and benchmarks: the n-th call sleeps `latencies[n]`
+    (cycled) and fails when n is in `failures`.
+    """
+    def __init__(self, name: str = "fake", latencies: Sequence[float] = (0.0,), content: Any = "fake response", failures: Sequence[int] = ()):
+        """
+        Args:
+            name (str): Provider name.
+            latencies (Sequence[float]): Per-call latencies in seconds, cycled.
+            content (Any): Response content, or a callable taking the prompt.
+            failures (Sequence[int]): Zero-based call numbers that raise instead of answering.
+        """
+        self.name = name
+        self.latencies = list(latencies) or [0.0]
+        self.content = content
+        self.failures = set(failures)
+        self.calls = 0
+
+    async def run(self, prompt: str, timeout: Optional[float] = None, images: Optional[Sequence[Any]] = None, **agent_kwargs: Any) -> Any:
+        call = self.calls
+        self.calls += 1
+        await asyncio.sleep(self.latencies[call % len(self.latencies)])
+        if call in self.failures:
+            raise RuntimeError(f"{self.name} call {call} failed")
+        return FakeResponse(self.content(prompt) if callable(self.content) else self.content, self.name)
+
+
+class ProviderState:
+    """
+    Gateway bookkeeping for one provider: latency, breaker and counters.
+    """
+    def __init__(self, provider: LLMProvider, alpha: float, breaker: CircuitBreaker):
+        self.provider = provider
+        self.latency = LatencyTracker(alpha)
+        self.breaker = breaker
+        self.metrics = {"calls": 0, "failures": 0, "cancelled": 0, "hedges": 0, "wins": 0, "hedge_wins": 0}
+
+    def stats(self) -> Dict[str, Any]:
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 1) if value is not None else None
+        return dict(self.metrics, state=self.breaker.state, p50_ms=ms(self.latency.p50), p95_ms=ms(self.latency.p95))
+
+
+class LLMGateway:
+    """
+    Routes completions over providers in preference order with hedging, fallback and
+    circuit breakers.
+    """
+    def __init__(
+        self,
+        providers: Sequence[LLMProvider],
+        hedge_enabled: bool = True,
+        hedge_delay: float = 2.0,
+        hedge_min_delay: float = 0.5,
+        hedge_min_samples: int = 20,
+        latency_alpha: float = 0.1,
+        breaker_failures: int = 5,
+        breaker_reset: float = 30,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            providers (Sequence[LLMProvider]): Providers, preferred first.
+            hedge_enabled (bool): Whether slow calls are hedged to the next provider.
+            hedge_delay (float): Hedge delay (seconds) until a provider has latency statistics.
+            hedge_min_delay (float): Lower bound of the p95-based hedge delay.
+            hedge_min_samples (int): Samples needed before the provider's p95 is used.
+            latency_alpha (float): EWMA weight of new latency samples.
+            breaker_failures (int): Consecutive failures that open a provider's breaker.
+            breaker_reset (float): Seconds before an open breaker lets a probe through.
+            clock (Callable[[], float]): Time source for breakers.
+        """
+        self.hedge_enabled = hedge_enabled
+        self.hedge_delay = hedge_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.states: List[ProviderState] = [
+            ProviderState(provider, latency_alpha, CircuitBreaker(breaker_failures, breaker_reset, clock)) for provider in providers
+        ]
+
+    async def run(self, prompt: str, timeout: Optional[float] = None, images: Optional[Sequence[Any]] = None, **agent_kwargs: Any) -> Any:
+        """Get a completion from the fastest healthy provider.
+
+        The preferred available provider is called first. If it hasn't answered after its
+        hedge delay (its p95, once known), the next available provider is called too and the
+        first successful response wins; the other call is cancelled. A failed call moves on
+        to the next provider without waiting.
+
+        Args:
+            prompt (str): The prompt.
+            timeout (float, optional): Per-call timeout (see `llm_executor`).
+            images (Sequence[Image], optional): Images attached to the prompt (vision models).
+            **agent_kwargs: Agent options such as `output_schema`.
+
+        Returns:
+            Any: The winning agent response.
+
+        Raises:
+            HTTPException: 503 if every provider's breaker is open; otherwise the last
+            provider error when all calls fail.
+        """
+        candidates = iter(self.states)
+        exhausted = False
+        pending: Dict["asyncio.Task[Any]", Tuple[ProviderState, bool]] = {}
+        last_error: Optional[BaseException] = None
+
+        def launch(hedge: bool = False) -> bool:
+            nonlocal exhausted
+            for state in candidates:
+                if state.breaker.allow():
+                    state.metrics["calls"] += 1
+                    state.metrics["hedges"] += hedge
+                    pending[asyncio.ensure_future(self._timed(state, prompt, timeout, images, agent_kwargs))] = (state, hedge)
+                    return True
+            exhausted = True
+            return False
+
+        if not launch():
+            raise HTTPException(status_code=503, detail="No LLM provider is currently available")
+        try:
+            while pending:
+                wait_for = None
+                if self.hedge_enabled and not exhausted and len(pending) == 1:
+                    wait_for = self._hedge_after(next(iter(pending.values()))[0])
+                done, _ = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Still waiting after the hedge delay: race the next provider
+                    launch(hedge=True)
+                    continue
+                for task in done:
+                    state, hedge = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        state.metrics["wins"] += 1
+                        state.metrics["hedge_wins"] += hedge
+                        return task.result()
+                    last_error = error
+                    logger.warning(f"LLM provider {state.provider.name} failed: {error!r}")
+                if not pending:
+                    # Fall back to the next provider right away
+                    launch()
+        finally:
+            for task, (state, _) in pending.items():
+                task.cancel()
+                state.metrics["cancelled"] += 1
+                state.breaker.release()
+        raise last_error
+
+    async def _timed(self, state: ProviderState, prompt: str, timeout: Optional[float], images: Optional[Sequence[Any]], agent_kwargs: Dict[str, Any]) -> Any:
+        started = time.monotonic()
+        try:
+            response = await state.provider.run(prompt, timeout=timeout, images=images, **agent_kwargs)
+        except asyncio.CancelledError:
+            raise
+        except BaseException:
+            state.metrics["failures"] += 1
+            state.breaker.record_failure()
+            raise
+        state.latency.observe(time.monotonic() - started)
+        state.breaker.record_success()
+        log_debug(f"LLM provider {state.provider.name} answered in {time.monotonic() - started:.3f}s")
+        return response
+
+    def _hedge_after(self, state: ProviderState) -> float:
+        if state.latency.samples < self.hedge_min_samples:
+            return self.hedge_delay
+        return max(self.hedge_min_delay, state.latency.p95)
+
+    def stats(self) -> Dict[str, Any]:
+        return {state.provider.name: state.stats() for state in self.states}
+
+
+def build_provider(name: str, model_id: Optional[str] = None) -> LLMProvider:
+    """Create a configured provider by name ("gemini", "groq" or "fake"), by default on its `llm_gateway_models` model."""
+    model_id = model_id or settings.llm_gateway_models.get(name)
+    if name == "gemini":
+        return AgentProvider(name, lambda: llm_clients.model(model_id))
+    if name == "groq":
+        from agno.models.groq import Groq
+
+        model = Groq(id=model_id, api_key=settings.groq_api_key)
+        return AgentProvider(name, lambda: model)
+    if name == "fake":
+        return FakeProvider(name)
+    raise ValueError(f"Unknown LLM provider: {name}")
+
+
+def build_gateway(providers: Sequence[str], models: Optional[Dict[str, str]] = None) -> LLMGateway:
+    """Create a gateway over the named providers (optionally on other models) with the configured hedging and breakers."""
+    models = models or {}
+    return LLMGateway(
+        [build_provider(name, models.get(name)) for name in providers],
+        hedge_enabled=settings.llm_hedge_enabled,
+        hedge_delay=settings.llm_hedge_delay,
+        hedge_min_delay=settings.llm_hedge_min_delay,
+        latency_alpha=settings.llm_latency_alpha,
+        breaker_failures=settings.llm_breaker_failures,
+        breaker_reset=settings.llm_breaker_reset,
+    )
+
+
+llm_gateway = build_gateway(settings.llm_gateway_providers)
+# Invoice extraction keeps its own latency statistics and breakers (page-sized vision calls)
+invoice_text_gateway = build_gateway(settings.invoice_llm_providers, settings.invoice_text_models)
+invoice_vision_gateway = build_gateway(settings.invoice_llm_providers, settings.invoice_vision_models)
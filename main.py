@@ -20,14 +20,24 @@ from controllers.api_usage_controller import api_usage_router
 from controllers.users_api_key_controller import users_api_key_router
 from controllers.plan_controller import plan_router
 from middleware import register_middleware
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+import asyncio
 from database import init_db
+from redis_store import init_redis, close_redis
+from tools.engine_registry import engine_registry
+from tools.sql import shutdown_sql_pool
+from llm_executor import llm_executor
+from llm_clients import llm_clients
+from tools.tool_catalog import tool_catalog
+from DAL_files.api_usage_dal import flush_usage, usage_flush_loop
+from DAL_files.invoice_dal import shutdown_render_pool
+from config import settings
 import yaml
 
 from controllers.invoice_controller import invoice_router
 from controllers.help_and_support_controller import help_support_router
 from controllers.user_usage_controller import user_usage_router
-from controllers.invoice_service_controller import invoice_service_router
+from controllers.invoice_service_controller import invoice_service_router, invoice_job_queue
 
 load_dotenv()
 
@@ -36,11 +46,40 @@ load_dotenv()
 @asynccontextmanager
 async def life_span(app:FastAPI):
     """
-    Application lifespan event handler. Initializes the database on startup.
+    Application lifespan event handler. Initializes the database, the shared Redis pool, the
+    pooled LLM clients, the optional write-behind usage flusher and the tool catalog change listener on startup;
+    stops batch invoice workers, flushes pending usage and disposes pooled
+    customer database engines, the SQL and LLM thread pools, the LLM connection pools, the PDF render pool and the Redis pool on shutdown.
     """
     print("server starting...")
     await init_db()
+    await init_redis()
+    llm_clients.start()
+    usage_flusher = None
+    if settings.usage_write_behind:
+        usage_flusher = asyncio.create_task(usage_flush_loop(settings.usage_flush_interval))
+    catalog_listener = None
+    if settings.tool_catalog_pubsub:
+        catalog_listener = asyncio.create_task(tool_catalog.listen())
     yield
+    if catalog_listener is not None:
+        catalog_listener.cancel()
+        with suppress(asyncio.CancelledError):
+            await catalog_listener
+    if usage_flusher is not None:
+        usage_flusher.cancel()
+        with suppress(asyncio.CancelledError):
+            await usage_flusher
+    await invoice_job_queue.stop()
+    if settings.usage_write_behind:
+        # Final flush after the batch workers stopped metering; errors are logged, so teardown continues
+        await flush_usage()
+    await engine_registry.adispose_all()
+    shutdown_sql_pool()
+    llm_executor.shutdown()
+    await llm_clients.aclose()
+    shutdown_render_pool()
+    await close_redis()
     print("server has been stopped")
 
 app = FastAPI(
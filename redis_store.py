@@ -1,4 +1,7 @@
 import redis.asyncio as aioredis
+import json
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
 from config import settings
 
 JIT_EXPIRY = 3600
@@ -6,17 +9,54 @@ JIT_EXPIRY = 3600
 """
 Async Redis utility functions for JWT blocklist and prompt template storage.
 Handles token blacklisting and prompt template caching for user sessions.
+All helpers share one application-scoped connection pool, opened and closed in the lifespan.
 """
 
-# Create Redis connection
+_redis_pool: Optional[aioredis.ConnectionPool] = None
+_redis_client: Optional[aioredis.Redis] = None
+
+# Create the shared Redis connection pool
+async def init_redis() -> aioredis.Redis:
+    """
+    Create the shared Redis connection pool and client. Called from the application lifespan;
+    safe to call more than once.
+    """
+    global _redis_pool, _redis_client
+    if _redis_client is None:
+        _redis_pool = aioredis.ConnectionPool(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            password=settings.redis_password,
+            max_connections=settings.redis_max_connections,
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_socket_timeout,
+            health_check_interval=30,
+        )
+        _redis_client = aioredis.Redis(connection_pool=_redis_pool)
+    return _redis_client
+
+# Close the shared Redis connection pool
+async def close_redis():
+    """
+    Close the shared Redis client and disconnect every pooled connection.
+    """
+    global _redis_pool, _redis_client
+    client, pool = _redis_client, _redis_pool
+    _redis_client = _redis_pool = None
+    if client is not None:
+        await client.aclose()
+    if pool is not None:
+        await pool.disconnect()
+
+# Get the shared Redis client
 async def get_redis_client():
     """
-    Create and return an async Redis client using settings from config.
+    Return the shared async Redis client, creating the pool on first use
+    (e.g. in scripts that run without the application lifespan).
     """
-    return aioredis.Redis(
-        host=settings.redis_host,
-        port=settings.redis_port,
-        password=settings.redis_password)
+    if _redis_client is None:
+        return await init_redis()
+    return _redis_client
 
 # Add JTI (JWT ID) to blocklist with expiration
 async def add_jti_to_blocklist(jti: str):
@@ -35,6 +75,30 @@ async def token_in_blocklist(jti: str) -> bool:
     jti_value = await redis_client.get(jti)
     return jti_value is not None
 
+# Check many JTIs against the blocklist in one round trip
+async def tokens_in_blocklist(jtis: Iterable[str]) -> Dict[str, bool]:
+    """
+    Check several JWT IDs (JTIs) against the Redis blocklist with a single MGET.
+    Returns a dict of {jti: is_blocked}.
+    """
+    jtis = list(jtis)
+    if not jtis:
+        return {}
+    redis_client = await get_redis_client()
+    values = await redis_client.mget(jtis)
+    return {jti: value is not None for jti, value in zip(jtis, values)}
+
+# Add many JTIs to the blocklist in one round trip
+async def add_jtis_to_blocklist(jtis: Iterable[str]):
+    """
+    Add several JWT IDs (JTIs) to the Redis blocklist in one pipeline.
+    """
+    redis_client = await get_redis_client()
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for jti in jtis:
+            pipe.set(name=jti, value="", ex=JIT_EXPIRY)
+        await pipe.execute()
+
 # Store prompt template in Redis with user_id and session_id
 async def store_prompt_template(user_id: str, session_id: str, prompt_template: str):
     """
@@ -57,8 +121,211 @@ async def get_prompt_template(user_id: str, session_id: str) -> str:
         return value.decode("utf-8")
     return None
 
-store = aioredis.Redis(
-  host=settings.redis_host,
-  port=settings.redis_port,
-  password=settings.redis_password
-)
\ No newline at end of file
+# Store many prompt templates in one round trip
+async def store_prompt_templates(templates: Dict[Tuple[str, str], str]):
+    """
+    Store several prompt templates, keyed by (user_id, session_id), in one pipeline.
+    """
+    if not templates:
+        return
+    redis_client = await get_redis_client()
+    await redis_client.mset({
+        f"prompt_template:{user_id}:{session_id}": prompt_template
+        for (user_id, session_id), prompt_template in templates.items()
+    })
+
+# Get many prompt templates in one round trip
+async def get_prompt_templates(keys: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[str]]:
+    """
+    Retrieve several prompt templates, keyed by (user_id, session_id), with a single MGET.
+    Missing templates map to None.
+    """
+    keys = list(keys)
+    if not keys:
+        return {}
+    redis_client = await get_redis_client()
+    values = await redis_client.mget([f"prompt_template:{user_id}:{session_id}" for user_id, session_id in keys])
+    return {key: value.decode("utf-8") if value is not None else None for key, value in zip(keys, values)}
+
+# Store a serialized schema snapshot for a customer database fingerprint
+async def store_schema_snapshot(fingerprint: str, snapshot_json: str, ttl: int):
+    """
+    Store a serialized schema snapshot in Redis with an expiration time.
+    """
+    redis_client = await get_redis_client()
+    await redis_client.set(f"schema_snapshot:{fingerprint}", snapshot_json, ex=ttl)
+
+# Get a serialized schema snapshot for a customer database fingerprint
+async def get_schema_snapshot(fingerprint: str) -> str:
+    """
+    Retrieve a serialized schema snapshot from Redis.
+    Returns the JSON string, or None if not found.
+    """
+    redis_client = await get_redis_client()
+    value = await redis_client.get(f"schema_snapshot:{fingerprint}")
+    if value is not None:
+        return value.decode("utf-8")
+    return None
+
+# Delete a schema snapshot for a customer database fingerprint
+async def delete_schema_snapshot(fingerprint: str):
+    """
+    Remove a schema snapshot from Redis.
+    """
+    redis_client = await get_redis_client()
+    await redis_client.delete(f"schema_snapshot:{fingerprint}")
+
+# Store a JSON-serializable value under a cache key with expiration
+async def set_cached_json(key: str, value, ttl: int):
+    """
+    Store a JSON-serializable value in Redis with an expiration time.
+    """
+    redis_client = await get_redis_client()
+    await redis_client.set(key, json.dumps(value), ex=ttl)
+
+# Get a JSON value stored under a cache key
+async def get_cached_json(key: str):
+    """
+    Retrieve and decode a JSON value from Redis.
+    Returns None if not found.
+    """
+    redis_client = await get_redis_client()
+    value = await redis_client.get(key)
+    if value is not None:
+        return json.loads(value)
+    return None
+
+# Delete one or more cache keys
+async def delete_cached_keys(*keys: str):
+    """
+    Remove the given keys from Redis.
+    """
+    if not keys:
+        return
+    redis_client = await get_redis_client()
+    await redis_client.delete(*keys)
+
+TOOL_CATALOG_CHANNEL = "tool_catalog_changed"
+
+# Notify every worker that the tool catalog changed
+async def publish_tool_catalog_changed(origin: str):
+    """
+    Publish a tool catalog change notification. `origin` identifies the publishing worker.
+    """
+    redis_client = await get_redis_client()
+    await redis_client.publish(TOOL_CATALOG_CHANNEL, origin)
+
+# Subscribe to tool catalog change notifications
+async def subscribe_tool_catalog_changes():
+    """
+    Return a PubSub subscribed to tool catalog changes. The caller reads it with
+    `get_message(timeout=...)` and closes it with `aclose()`.
+    """
+    redis_client = await get_redis_client()
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    await pubsub.subscribe(TOOL_CATALOG_CHANNEL)
+    return pubsub
+
+INVOICE_RESULT_LRU = "invoice_result_lru"
+
+# Get a cached invoice extraction result and mark it as recently used
+async def get_invoice_result(key: str, ttl: int) -> str:
+    """
+    Retrieve a cached invoice extraction result from Redis and refresh its LRU position and TTL.
+    Returns the JSON string, or None if not found.
+    """
+    redis_client = await get_redis_client()
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.get(f"invoice_result:{key}")
+        pipe.expire(f"invoice_result:{key}", ttl)
+        pipe.zadd(INVOICE_RESULT_LRU, {key: time.time()}, xx=True)
+        value, _, _ = await pipe.execute()
+    if value is None:
+        return None
+    return value.decode("utf-8")
+
+# Store an invoice extraction result, evicting the least recently used beyond max_entries
+async def store_invoice_result(key: str, result_json: str, ttl: int, max_entries: int):
+    """
+    Store an invoice extraction result in Redis with an expiration time.
+    Entries beyond `max_entries` are evicted least recently used first.
+    """
+    redis_client = await get_redis_client()
+    now = time.time()
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.set(f"invoice_result:{key}", result_json, ex=ttl)
+        pipe.zadd(INVOICE_RESULT_LRU, {key: now})
+        pipe.zremrangebyscore(INVOICE_RESULT_LRU, "-inf", now - ttl)
+        pipe.zcard(INVOICE_RESULT_LRU)
+        *_, size = await pipe.execute()
+    if size > max_entries:
+        evicted = await redis_client.zpopmin(INVOICE_RESULT_LRU, size - max_entries)
+        if evicted:
+            await redis_client.delete(*[f"invoice_result:{member.decode('utf-8')}" for member, _ in evicted])
+
+# Store fields of a batch invoice extraction's shared state
+async def store_invoice_batch_fields(batch_id: str, fields: Dict[str, str], ttl: int):
+    """
+    Set fields of a batch's state hash (`meta` plus one field per document) and refresh its expiration time.
+    """
+    redis_client = await get_redis_client()
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.hset(f"invoice_batch:{batch_id}", mapping=fields)
+        pipe.expire(f"invoice_batch:{batch_id}", ttl)
+        await pipe.execute()
+
+# Get the shared state of a batch invoice extraction
+async def get_invoice_batch_fields(batch_id: str) -> Dict[str, str]:
+    """
+    Retrieve every field of a batch's state hash.
+    Returns an empty dict if the batch is unknown or expired.
+    """
+    redis_client = await get_redis_client()
+    fields = await redis_client.hgetall(f"invoice_batch:{batch_id}")
+    return {key.decode("utf-8"): value.decode("utf-8") for key, value in fields.items()}
+
+USAGE_PENDING_SET = "usage_pending"
+
+# Record a pending (not yet flushed) usage increment for a user
+async def incr_pending_usage(kind: str, user_id: str, amount: int = 1) -> int:
+    """
+    Increment the pending usage counter for a user and mark it for flushing.
+    Returns the new pending value.
+    """
+    redis_client = await get_redis_client()
+    member = f"{kind}:{user_id}"
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.incrby(f"{USAGE_PENDING_SET}:{member}", amount)
+        pipe.sadd(USAGE_PENDING_SET, member)
+        value, _ = await pipe.execute()
+    return int(value)
+
+# Get the pending usage counter for a user
+async def get_pending_usage(kind: str, user_id: str) -> int:
+    """
+    Return the usage increments recorded for a user that are not yet flushed to the database.
+    """
+    redis_client = await get_redis_client()
+    value = await redis_client.get(f"{USAGE_PENDING_SET}:{kind}:{user_id}")
+    return int(value) if value is not None else 0
+
+# Atomically take every pending usage counter
+async def pop_pending_usage(batch_size: int = 1000) -> dict:
+    """
+    Take and reset all pending usage counters.
+    Returns a dict of {(kind, user_id): amount}.
+    """
+    redis_client = await get_redis_client()
+    pending = {}
+    while True:
+        members = await redis_client.spop(USAGE_PENDING_SET, count=batch_size)
+        if not members:
+            return pending
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for member in members:
+                pipe.getdel(f"{USAGE_PENDING_SET}:{member.decode('utf-8')}")
+            values = await pipe.execute()
+        for member, value in zip(members, values):
+            if value is not None and int(value):
+                kind, user_id = member.decode("utf-8").split(":", 1)
+                pending[(kind, user_id)] = int(value)
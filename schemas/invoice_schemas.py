@@ -64,4 +64,10 @@ class InvoiceTextRequest2(BaseModel):
     """
     text: str
     doc_type:str
-   
\ No newline at end of file
+   
+class InvoiceBatchTextRequest(BaseModel):
+    """
+    Schema for a batch request to extract invoice data from several raw texts.
+    """
+    texts: List[str]
+    doc_type: str = "invoice"
@@ -0,0 +1,18 @@
+import os
+import sys
+
+# Settings are read from the environment at import time; the tests never reach these services
+TEST_ENVIRONMENT = {
+    "DATABASE_HOSTNAME": "localhost", "DATABASE_PASSWORD": "test", "DATABASE_NAME": "test",
+    "DATABASE_USERNAME": "test", "DATABASE_PORT": "5432", "JWT_SECRET": "test", "JWT_ALGORITHM": "HS256",
+    "REDIS_HOST": "localhost", "REDIS_PORT": "6379", "REDIS_PASSWORD": "test",
+    "GOOGLE_CLIENT_ID": "test", "GOOGLE_CLIENT_SECRET": "test",
+    "MAIL_USERNAME": "test", "MAIL_PASSWORD": "test", "MAIL_FROM": "test@example.com", "MAIL_PORT": "25",
+    "MAIL_SERVER": "localhost", "MAIL_FROM_NAME": "test",
+    "GROQ_API_KEY": "test", "GEMINI_API_KEY": "test", "ELEVENLABS_API_KEY": "test",
+    "UPSTASH_REDIS_REST_URL": "http://localhost", "UPSTASH_REDIS_REST_TOKEN": "test",
+}
+for name, value in TEST_ENVIRONMENT.items():
+    os.environ.setdefault(name, value)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
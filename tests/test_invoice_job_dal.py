@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+import DAL_files.invoice_job_dal as invoice_job_dal
+from DAL_files.invoice_job_dal import JOB_COMPLETED, JOB_FAILED, SHUTDOWN_ERROR, InvoiceJobQueue
+
+
+@pytest.fixture
+def batch_store(monkeypatch):
+    """In-memory stand-in for the Redis batch hashes."""
+    hashes = {}
+
+    async def store_fields(batch_id, fields, ttl):
+        hashes.setdefault(batch_id, {}).update(fields)
+
+    async def get_fields(batch_id):
+        return dict(hashes.get(batch_id, {}))
+
+    monkeypatch.setattr(invoice_job_dal, "store_invoice_batch_fields", store_fields)
+    monkeypatch.setattr(invoice_job_dal, "get_invoice_batch_fields", get_fields)
+    return hashes
+
+
+async def wait_for_batch(queue, batch_id, user_id):
+    for _ in range(200):
+        batch = await queue.get_batch(batch_id, user_id)
+        if batch["status"] == JOB_COMPLETED:
+            return batch
+        await asyncio.sleep(0.01)
+    raise AssertionError("batch did not finish")
+
+
+def test_batch_runs_every_document(batch_store):
+    async def processor(user_id, document):
+        if document["name"] == "bad.pdf":
+            raise ValueError("unreadable")
+        return {"user": user_id, "name": document["name"]}
+
+    async def scenario():
+        queue = InvoiceJobQueue(processor, workers=2)
+        submitted = await queue.submit_batch("u1", [{"name": "a.pdf"}, {"name": "bad.pdf"}, {"name": "c.pdf"}])
+        batch = await wait_for_batch(queue, submitted["batch_id"], "u1")
+        other_user = await queue.get_batch(submitted["batch_id"], "u2")
+        await queue.stop()
+        return submitted, batch, other_user
+
+    submitted, batch, other_user = asyncio.run(scenario())
+    assert submitted["status"] == "queued"
+    assert all("result" not in doc for doc in submitted["documents"])
+    assert (batch["completed"], batch["failed"], batch["total"]) == (2, 1, 3)
+    assert batch["documents"][0]["result"] == {"user": "u1", "name": "a.pdf"}
+    assert batch["documents"][1]["status"] == JOB_FAILED
+    assert batch["documents"][1]["error"] == "unreadable"
+    assert other_user is None
+
+
+def test_batch_state_is_shared_between_queues(batch_store):
+    async def processor(user_id, document):
+        return document["name"]
+
+    async def scenario():
+        accepting = InvoiceJobQueue(processor, workers=1)
+        polling = InvoiceJobQueue(processor, workers=1)
+        submitted = await accepting.submit_batch("u1", [{"name": "a.pdf"}])
+        batch = await wait_for_batch(polling, submitted["batch_id"], "u1")
+        await accepting.stop()
+        return batch
+
+    assert asyncio.run(scenario())["documents"][0]["result"] == "a.pdf"
+
+
+def test_stop_marks_unfinished_jobs_failed(batch_store):
+    started = []
+
+    async def processor(user_id, document):
+        started.append(document["name"])
+        await asyncio.sleep(10)
+
+    async def scenario():
+        queue = InvoiceJobQueue(processor, workers=1)
+        submitted = await queue.submit_batch("u1", [{"name": "running.pdf"}, {"name": "queued.pdf"}])
+        while not started:
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return await queue.get_batch(submitted["batch_id"], "u1")
+
+    batch = asyncio.run(scenario())
+    assert batch["status"] == JOB_COMPLETED
+    assert batch["failed"] == 2
+    assert {doc["error"] for doc in batch["documents"]} == {SHUTDOWN_ERROR}
@@ -0,0 +1,158 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from llm_gateway import FakeProvider, LLMGateway
+
+
+class CancelTrackingProvider(FakeProvider):
+    """FakeProvider that records whether its call was cancelled."""
+    cancelled = False
+
+    async def run(self, prompt, timeout=None, images=None, **agent_kwargs):
+        try:
+            return await super().run(prompt, timeout, images, **agent_kwargs)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_hedge_fires_after_primary_p95():
+    primary = FakeProvider("primary", latencies=[0.02, 0.02, 0.02, 1.0], content="primary")
+    secondary = FakeProvider("secondary", latencies=[0.0], content="secondary")
+    gateway = LLMGateway([primary, secondary], hedge_delay=5.0, hedge_min_delay=0.01, hedge_min_samples=3)
+
+    async def scenario():
+        # Warm-up calls answer well within the default hedge delay, so nothing is hedged
+        for _ in range(3):
+            assert (await gateway.run("x")).content == "primary"
+        assert secondary.calls == 0
+        hedge_after = gateway._hedge_after(gateway.states[0])
+        assert 0.01 <= hedge_after < 0.5
+        started = time.monotonic()
+        response = await gateway.run("x")
+        return response, time.monotonic() - started
+
+    response, elapsed = asyncio.run(scenario())
+    assert response.content == "secondary"
+    assert elapsed < 0.5
+    stats = gateway.stats()
+    assert stats["secondary"]["hedges"] == 1
+    assert stats["secondary"]["hedge_wins"] == 1
+
+
+def test_first_success_wins_and_loser_is_cancelled():
+    slow = CancelTrackingProvider("slow", latencies=[0.5], content="slow")
+    fast = FakeProvider("fast", latencies=[0.0], content="fast")
+    gateway = LLMGateway([slow, fast], hedge_delay=0.05)
+
+    response = asyncio.run(gateway.run("x"))
+    assert response.content == "fast"
+    assert slow.cancelled
+    stats = gateway.stats()
+    assert stats["slow"]["cancelled"] == 1
+    assert stats["slow"]["failures"] == 0
+    assert stats["slow"]["state"] == "closed"
+    assert stats["fast"]["wins"] == 1
+
+
+def test_failure_falls_back_without_waiting_for_the_hedge():
+    primary = FakeProvider("primary", failures=[0])
+    secondary = FakeProvider("secondary", content="secondary")
+    gateway = LLMGateway([primary, secondary], hedge_delay=5.0)
+
+    started = time.monotonic()
+    assert asyncio.run(gateway.run("x")).content == "secondary"
+    assert time.monotonic() - started < 1.0
+    assert gateway.stats()["primary"]["failures"] == 1
+
+
+def test_breaker_opens_then_probes():
+    clock = FakeClock()
+    primary = FakeProvider("primary", content="primary", failures=[0, 1, 2])
+    secondary = FakeProvider("secondary", content="secondary")
+    gateway = LLMGateway([primary, secondary], breaker_failures=2, breaker_reset=10, clock=clock)
+
+    async def call():
+        return (await gateway.run("x")).content
+
+    assert [asyncio.run(call()) for _ in range(2)] == ["secondary", "secondary"]
+    assert gateway.stats()["primary"]["state"] == "open"
+    # Open: the primary is skipped
+    assert asyncio.run(call()) == "secondary"
+    assert primary.calls == 2
+
+    # Half-open: one probe; its failure reopens the breaker
+    clock.now = 10
+    assert gateway.stats()["primary"]["state"] == "half_open"
+    assert asyncio.run(call()) == "secondary"
+    assert primary.calls == 3
+    assert gateway.stats()["primary"]["state"] == "open"
+
+    # A successful probe closes it again
+    clock.now = 20
+    assert asyncio.run(call()) == "primary"
+    assert gateway.stats()["primary"]["state"] == "closed"
+
+
+def test_all_breakers_open_is_503():
+    gateway = LLMGateway([FakeProvider("only", failures=range(10))], breaker_failures=1)
+    with pytest.raises(RuntimeError):
+        asyncio.run(gateway.run("x"))
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(gateway.run("x"))
+    assert error.value.status_code == 503
+
+
+class FakeCountResponse:
+    total_tokens = 7
+
+
+class FakeGeminiModel:
+    """The parts of a Gemini model that token usage estimation touches."""
+    provider = "Google"
+    id = "gemini-test"
+
+    def __init__(self):
+        self.counted = 0
+        self.models = self
+
+    def get_client(self):
+        return self
+
+    def count_tokens(self, model, contents):
+        self.counted += 1
+        return FakeCountResponse()
+
+
+@pytest.mark.parametrize("primary_latency, winner, expected_usage", [
+    (0.0, "Google", {"total_tokens": 7}),
+    (0.5, "Groq", None),
+])
+def test_usage_is_attributed_to_the_winning_provider(primary_latency, winner, expected_usage):
+    from controllers.ai_sql_agent import resolve_token_usage
+
+    model = FakeGeminiModel()
+    gateway = LLMGateway(
+        [FakeProvider("Google", latencies=[primary_latency]), FakeProvider("Groq", latencies=[0.0])],
+        hedge_delay=0.05,
+    )
+
+    async def scenario():
+        response = await gateway.run("prompt")
+        return response, await resolve_token_usage(response, model, "prompt")
+
+    response, usage = asyncio.run(scenario())
+    assert response.model_provider == winner
+    assert usage == expected_usage
+    assert model.counted == (1 if winner == "Google" else 0)
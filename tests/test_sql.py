@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+import pytest
+
+import tools.sql as sql_module
+from config import settings
+from tools.sql import SQLTools
+
+# Counts far past any test timeout unless interrupted
+SLOW_QUERY = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) AS c FROM n"
+
+
+@pytest.fixture
+def sql_tools(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "sql_thread_workers", 1)
+    sql_module.shutdown_sql_pool()
+    yield SQLTools(db_url=f"sqlite:///{tmp_path / 'test.db'}")
+    sql_module.shutdown_sql_pool()
+
+
+def test_thread_fallback_runs_queries(sql_tools):
+    rows = asyncio.run(sql_tools.arun_sql("SELECT 1 AS one UNION ALL SELECT 2", timeout=5))
+    assert rows == [{"one": 1}, {"one": 2}]
+
+
+def test_timeout_interrupts_the_statement(sql_tools):
+    async def scenario():
+        started = time.monotonic()
+        with pytest.raises(asyncio.TimeoutError):
+            await sql_tools.arun_sql(SLOW_QUERY, timeout=0.2)
+        # The single worker thread is free again: the interrupted statement gave it back
+        rows = await sql_tools.arun_sql("SELECT 1 AS one", timeout=5)
+        return rows, time.monotonic() - started
+
+    rows, elapsed = asyncio.run(scenario())
+    assert rows == [{"one": 1}]
+    assert elapsed < 3
+
+
+def test_cancellation_interrupts_the_statement(sql_tools):
+    async def scenario():
+        task = asyncio.ensure_future(sql_tools.arun_sql(SLOW_QUERY, timeout=60))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return await sql_tools.arun_sql("SELECT 1 AS one", timeout=5)
+
+    assert asyncio.run(scenario()) == [{"one": 1}]
@@ -0,0 +1,81 @@
+import pytest
+from benchmark_sql_guard import CORPUS
+from tools.sql_guard import UnsafeSQLError, clean_sql, inspect_sql, prepare_sql
+
+
+# Expected `prepare_sql(reply, "postgresql", 100)` for each benchmark corpus reply (None: rejected)
+CORPUS_EXPECTED = [
+    "SELECT name, SUM(quantity) AS total FROM order_items GROUP BY name ORDER BY total DESC LIMIT 3",
+    "SELECT p.name, SUM(oi.quantity) AS sold FROM products p JOIN order_items oi ON oi.product_id = p.id "
+    "WHERE oi.created_at >= date_trunc('month', now()) - interval '1 month' GROUP BY p.name ORDER BY sold DESC LIMIT 3",
+    "SELECT COUNT(*) * 1.0 / 7 AS daily_avg FROM orders WHERE status = 'shipped' LIMIT 100",
+    'SELECT customer_id, email FROM "customers" WHERE country = \'DE\' ORDER BY created_at DESC LIMIT 100',
+    "WITH monthly AS ( SELECT date_trunc('month', created_at) AS month, SUM(total) AS revenue FROM orders GROUP BY 1 ) "
+    "SELECT month, revenue FROM monthly ORDER BY month LIMIT 100",
+    "SELECT name FROM products WHERE description ILIKE '%*new*%' ORDER BY price DESC LIMIT 100",
+    "SELECT \"name\" FROM products WHERE category = 'toys' LIMIT 100",
+    "SELECT id FROM users WHERE note = 'drop; delete from users' LIMIT 10",
+    None,
+    None,
+    None,
+    None,
+    None,
+    None,
+    "(SELECT name FROM products ORDER BY price DESC LIMIT 1) UNION ALL (SELECT name FROM products ORDER BY price LIMIT 1) LIMIT 100",
+    "SELECT id, total FROM orders ORDER BY created_at DESC LIMIT 100 OFFSET 20",
+    None,
+]
+
+
+def guarded(reply, dialect="postgresql"):
+    try:
+        return prepare_sql(reply, dialect, 100)
+    except UnsafeSQLError:
+        return None
+
+
+@pytest.mark.parametrize("reply, expected", list(zip(CORPUS, CORPUS_EXPECTED)))
+def test_corpus(reply, expected):
+    assert guarded(reply) == expected
+
+
+def test_dollar_quoted_string_hides_no_second_statement():
+    check = inspect_sql("SELECT $$'$$; DELETE FROM users; SELECT '$$'", "postgresql")
+    assert not check.read_only
+    assert check.reason == "Only a single SQL statement is allowed"
+
+
+def test_dollar_quoted_string_is_kept_verbatim():
+    sql = "SELECT $tag$ a -- not a comment; $tag$ AS x, a$b FROM t"
+    assert prepare_sql(sql, "postgresql", 10) == f"{sql} LIMIT 10"
+
+
+def test_mysql_hash_comment_does_not_swallow_the_rest():
+    sql = "SELECT * FROM t\n# note\nWHERE a=1"
+    assert prepare_sql(sql, "mysql", 100) == "SELECT * FROM t WHERE a=1 LIMIT 100"
+    assert clean_sql(sql, "mysql") == "SELECT * FROM t WHERE a=1"
+
+
+def test_mysql_backslash_escape_hides_no_second_statement():
+    # Standard SQL reads one string here; MySQL ends it at \'' and runs the DELETE
+    assert guarded("SELECT 'a\\''; DELETE FROM users; -- '", "mysql") is None
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT * FROM t OFFSET 5", "SELECT * FROM t LIMIT 100 OFFSET 5"),
+    ("SELECT * FROM t ORDER BY id OFFSET :b0", "SELECT * FROM t ORDER BY id LIMIT 100 OFFSET :b0"),
+    ("SELECT * FROM t LIMIT 5 OFFSET 5", "SELECT * FROM t LIMIT 5 OFFSET 5"),
+    ("SELECT offset FROM t", "SELECT offset FROM t LIMIT 100"),
+    ("SELECT a FROM t ORDER BY offset", "SELECT a FROM t ORDER BY offset LIMIT 100"),
+])
+def test_limit_goes_before_a_trailing_offset(sql, expected):
+    assert prepare_sql(sql, "mysql", 100) == expected
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM t FOR UPDATE",
+    "SELECT * FROM t FOR NO KEY UPDATE",
+    "SELECT * FROM t LOCK IN SHARE MODE",
+])
+def test_locking_clauses_are_rejected(sql):
+    assert guarded(sql, "mysql") is None
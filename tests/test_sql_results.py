@@ -0,0 +1,53 @@
+from sqlalchemy import create_engine, text
+
+from tools.sql_guard import prepare_sql
+from tools.sql_results import paged_sql
+
+
+def run_page(engine, sql_query, offset, limit):
+    statement, params = paged_sql(sql_query, offset, limit)
+    with engine.connect() as connection:
+        return [tuple(row) for row in connection.execute(statement, params)]
+
+
+def make_engine():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE a (id INTEGER, name TEXT)"))
+        connection.execute(text("CREATE TABLE b (id INTEGER, a_id INTEGER)"))
+        for i in range(10):
+            connection.execute(text("INSERT INTO a VALUES (:i, :n)"), {"i": i, "n": f"a{i}"})
+            connection.execute(text("INSERT INTO b VALUES (:i, :i)"), {"i": 100 + i})
+    return engine
+
+
+def test_guarded_statement_is_paged_in_place():
+    sql_query = prepare_sql("SELECT a.id, b.id FROM a JOIN b ON b.a_id = a.id ORDER BY a.id", "mysql", max_rows=100)
+    statement, params = paged_sql(sql_query, 20, 10)
+    assert str(statement) == "SELECT a.id, b.id FROM a JOIN b ON b.a_id = a.id ORDER BY a.id LIMIT :page_limit OFFSET :page_offset"
+    assert params == {"page_offset": 20, "page_limit": 10}
+
+
+def test_window_stays_inside_the_query_limit_and_offset():
+    engine = make_engine()
+    sql_query = "SELECT id FROM a ORDER BY id LIMIT 5 OFFSET 2"
+    assert run_page(engine, sql_query, 0, 3) == [(2,), (3,), (4,)]
+    assert run_page(engine, sql_query, 3, 3) == [(5,), (6,)]
+    assert run_page(engine, sql_query, 6, 3) == []
+
+
+def test_duplicate_column_names_are_not_wrapped():
+    engine = make_engine()
+    sql_query = prepare_sql("SELECT a.id, b.id FROM a JOIN b ON b.id = a.id + 100 ORDER BY a.id;", "sqlite", max_rows=100)
+    statement, _ = paged_sql(sql_query, 0, 2)
+    assert "paged_result" not in str(statement)
+    assert run_page(engine, sql_query, 1, 2) == [(1, 101), (2, 102)]
+
+
+def test_statement_without_trailing_limit_is_wrapped():
+    engine = make_engine()
+    sql_query = "SELECT id FROM a WHERE id IN (SELECT id FROM a ORDER BY id LIMIT 4)"
+    statement, params = paged_sql(sql_query, 1, 2)
+    assert "AS paged_result" in str(statement)
+    assert params == {"page_offset": 1, "page_limit": 2}
+    assert sorted(run_page(engine, sql_query, 0, 10)) == [(0,), (1,), (2,), (3,)]
@@ -0,0 +1,67 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from config import settings
+from DAL_files.stt_dal import STT_BACKENDS, UPLOAD_CHUNK_SIZE, LocalSTTBackend, STTDAL, register_stt_backend
+
+
+def upload(content: bytes = b"RIFF" + b"\0" * 100) -> UploadFile:
+    return UploadFile(file=io.BytesIO(content), filename="question.wav")
+
+
+def test_local_backend_reads_the_whole_upload():
+    audio = upload(b"x" * (UPLOAD_CHUNK_SIZE * 2 + 1))
+    text = asyncio.run(LocalSTTBackend().transcribe(audio))
+    assert text == settings.stt_local_text
+    assert audio.file.tell() == UPLOAD_CHUNK_SIZE * 2 + 1
+
+
+def test_stt_dal_uses_the_configured_backend():
+    service = STTDAL(backend="local")
+    assert isinstance(service.backend, LocalSTTBackend)
+    assert asyncio.run(service.speech_to_text(upload())) == settings.stt_local_text
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        STTDAL(backend="missing")
+
+
+def test_registered_backend_and_timeout(monkeypatch):
+    class SlowBackend:
+        async def transcribe(self, audio_file):
+            await asyncio.sleep(1)
+            return "late"
+
+    # setitem first so the registration is undone after the test
+    monkeypatch.setitem(STT_BACKENDS, "slow", None)
+    register_stt_backend("slow", SlowBackend)
+    monkeypatch.setattr(settings, "stt_timeout", 0.01)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(STTDAL(backend="slow").speech_to_text(upload()))
+    assert error.value.status_code == 504
+
+
+def test_concurrency_is_limited():
+    active = []
+    peak = []
+
+    class CountingBackend:
+        async def transcribe(self, audio_file):
+            active.append(1)
+            peak.append(len(active))
+            await asyncio.sleep(0.01)
+            active.pop()
+            return "ok"
+
+    service = STTDAL(backend="local", max_concurrency=2)
+    service.backend = CountingBackend()
+
+    async def scenario():
+        return await asyncio.gather(*[service.speech_to_text(upload()) for _ in range(6)])
+
+    assert asyncio.run(scenario()) == ["ok"] * 6
+    assert max(peak) == 2
@@ -0,0 +1,187 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from config import settings
+
+
+"""
+Answer cache for text-to-SQL requests.
+Level 1 maps (db fingerprint, schema version, tool catalog, normalized prompt) to the
+generated SQL, skipping the SQL-generation LLM call. Level 2 (optional, short TTL) maps
+(db fingerprint, SQL text) to the raw query result and the refined answers produced for it,
+skipping the query and the refine LLM call.
+"""
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION_RE = re.compile(r"[\s?.!;]+$")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalize a user prompt for exact-match caching.
+
+    Args:
+        prompt (str): The user's natural language question.
+
+    Returns:
+        str: Lowercased prompt with collapsed whitespace and no trailing punctuation.
+    """
+    prompt = _WHITESPACE_RE.sub(" ", prompt.strip().lower())
+    return _TRAILING_PUNCTUATION_RE.sub("", prompt)
+
+
+def catalog_version(text: str) -> str:
+    """Return a short, stable hash of prompt context such as the rendered tool list."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache with a per-entry TTL and hit/miss counters.
+    """
+    def __init__(self, ttl: float, max_entries: int):
+        """
+        Args:
+            ttl (float): Seconds an entry stays valid.
+            max_entries (int): Maximum number of entries before least recently used ones are evicted.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Return a live entry without touching recency or counters."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_prefix(self, prefix: str) -> int:
+        """Drop every entry whose tuple key starts with `prefix`. Returns the number removed."""
+        with self._lock:
+            keys = [key for key in self._entries if isinstance(key, tuple) and key and key[0] == prefix]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class AnswerCache:
+    """
+    Two-level text-to-SQL cache: prompt -> SQL, and SQL -> result (+ refined answers).
+    """
+    def __init__(self, sql_ttl: int = 3600, sql_max_entries: int = 1024,
+                 result_ttl: int = 60, result_max_entries: int = 256, result_enabled: bool = False):
+        """
+        Args:
+            sql_ttl (int): Seconds a generated SQL entry stays valid.
+            sql_max_entries (int): Maximum number of cached prompts.
+            result_ttl (int): Seconds a query result stays valid. Keep short: data changes.
+            result_max_entries (int): Maximum number of cached results.
+            result_enabled (bool): Whether results are cached at all.
+        """
+        self.sql_cache = LRUCache(sql_ttl, sql_max_entries)
+        self.result_cache = LRUCache(result_ttl, result_max_entries)
+        self.result_enabled = result_enabled
+
+    @staticmethod
+    def sql_key(fingerprint: str, schema_version: str, tools_version: str, prompt: str) -> Tuple[str, str, str, str]:
+        return (fingerprint, schema_version, tools_version, normalize_prompt(prompt))
+
+    def get_sql(self, key: Tuple[str, str, str, str]) -> Optional[Dict[str, Any]]:
+        """Return the cached generation ({used_tool, sql_query, params}) for a prompt key."""
+        return self.sql_cache.get(key)
+
+    def put_sql(self, key: Tuple[str, str, str, str], used_tool: Optional[str], sql_query: str, params: Any = None) -> None:
+        self.sql_cache.put(key, {"used_tool": used_tool, "sql_query": sql_query, "params": params})
+
+    def get_result(self, fingerprint: str, sql_query: str) -> Optional[Any]:
+        """Return the cached result rows of `sql_query`, if result caching is enabled."""
+        if not self.result_enabled:
+            return None
+        entry = self.result_cache.get((fingerprint, sql_query))
+        return entry["result"] if entry is not None else None
+
+    def put_result(self, fingerprint: str, sql_query: str, query_result: Any) -> None:
+        if self.result_enabled:
+            self.result_cache.put((fingerprint, sql_query), {"result": query_result, "answers": {}})
+
+    def get_refined(self, fingerprint: str, sql_query: str, prompt: str) -> Optional[str]:
+        """Return a refined answer already produced for this prompt over the cached result."""
+        if not self.result_enabled:
+            return None
+        entry = self.result_cache.peek((fingerprint, sql_query))
+        return entry["answers"].get(normalize_prompt(prompt)) if entry is not None else None
+
+    def put_refined(self, fingerprint: str, sql_query: str, prompt: str, refined_answer: Optional[str]) -> None:
+        if not self.result_enabled or not refined_answer:
+            return
+        entry = self.result_cache.peek((fingerprint, sql_query))
+        if entry is not None:
+            entry["answers"][normalize_prompt(prompt)] = refined_answer
+
+    def invalidate(self, fingerprint: str) -> int:
+        """Drop every cached SQL and result for one database. Returns the number of entries removed."""
+        return self.sql_cache.invalidate_prefix(fingerprint) + self.result_cache.invalidate_prefix(fingerprint)
+
+    def clear(self) -> None:
+        self.sql_cache.clear()
+        self.result_cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sql": self.sql_cache.stats(),
+            "result": dict(self.result_cache.stats(), enabled=self.result_enabled),
+        }
+
+
+answer_cache = AnswerCache(
+    sql_ttl=settings.answer_cache_sql_ttl,
+    sql_max_entries=settings.answer_cache_sql_max_entries,
+    result_ttl=settings.answer_cache_result_ttl,
+    result_max_entries=settings.answer_cache_result_max_entries,
+    result_enabled=settings.answer_cache_result_enabled,
+)
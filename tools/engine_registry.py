@@ -0,0 +1,315 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Union
+
+from agno.utils.log import log_debug, logger
+
+try:
+    from sqlalchemy import Engine, create_engine
+    from sqlalchemy.engine import URL, make_url
+    from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+except ImportError:
+    raise ImportError("`sqlalchemy` not installed")
+
+from config import settings
+
+
+"""
+Process-wide registry of pooled SQLAlchemy engines for customer databases.
+Engines are keyed by normalized db_url and reused across requests so that
+connection pools survive between chats instead of being rebuilt every time.
+"""
+
+
+def normalize_db_url(db_url: str) -> str:
+    """Normalize a database URL so equivalent URLs share one engine.
+
+    Args:
+        db_url (str): The database connection string.
+
+    Returns:
+        str: Canonical form of the URL (lower-cased driver and host, sorted query).
+    """
+    url = make_url(db_url)
+    url = url.set(
+        drivername=url.drivername.lower(),
+        host=url.host.lower() if url.host else url.host,
+        query=dict(sorted(url.query.items())),
+    )
+    return url.render_as_string(hide_password=False)
+
+
+# Async drivers used for customer databases, by SQLAlchemy backend name.
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "mysql": "asyncmy",
+    "mariadb": "asyncmy",
+}
+
+
+def to_async_url(db_url: str) -> Optional[URL]:
+    """Translate a sync database URL to its async-driver equivalent.
+
+    Args:
+        db_url (str): The database connection string.
+
+    Returns:
+        Optional[URL]: URL using asyncpg/asyncmy, or None if the dialect has no async driver here.
+    """
+    url = make_url(db_url)
+    backend = url.get_backend_name()
+    driver = ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        return None
+    query = dict(url.query)
+    if driver == "asyncpg" and "sslmode" in query:
+        # asyncpg spells libpq's sslmode as ssl
+        query["ssl"] = query.pop("sslmode")
+    return url.set(drivername=f"{backend}+{driver}", query=query)
+
+
+class _EngineEntry:
+    """
+    Bookkeeping for one registered engine.
+    """
+    __slots__ = ("engine", "created_at", "last_used")
+
+    def __init__(self, engine: Union[Engine, AsyncEngine]):
+        now = time.monotonic()
+        self.engine = engine
+        self.created_at = now
+        self.last_used = now
+
+
+class EngineRegistry:
+    """
+    Thread-safe LRU + TTL cache of SQLAlchemy engines keyed by normalized db_url.
+    """
+    def __init__(
+        self,
+        max_engines: int = 32,
+        idle_ttl: float = 900,
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        pool_recycle: int = 1800,
+        dispose_grace: float = 120,
+    ):
+        """
+        Args:
+            max_engines (int): Maximum number of engines kept alive at once.
+            idle_ttl (float): Seconds an engine may stay unused before it is disposed.
+            pool_size (int): Default connection pool size per engine.
+            max_overflow (int): Default pool overflow per engine.
+            pool_recycle (int): Seconds after which pooled connections are recycled.
+            dispose_grace (float): Seconds an evicted async engine waits for in-flight queries
+                to return their connections before its pool is closed anyway.
+        """
+        self.max_engines = max_engines
+        self.idle_ttl = idle_ttl
+        self.default_pool_options: Dict[str, Any] = {
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "pool_recycle": pool_recycle,
+        }
+        self._engines: "OrderedDict[str, _EngineEntry]" = OrderedDict()
+        self._pool_overrides: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.dispose_grace = dispose_grace
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._disposals: Set[Any] = set()
+
+    def configure(self, db_url: str, **pool_options: Any) -> None:
+        """Set per-URL pool options (e.g. pool_size, max_overflow).
+
+        The options apply the next time an engine is built for this URL; an
+        already registered engine is evicted so the new sizing takes effect.
+
+        Args:
+            db_url (str): The database connection string.
+            **pool_options: Keyword arguments forwarded to `create_engine`.
+        """
+        key = normalize_db_url(db_url)
+        with self._lock:
+            self._pool_overrides[key] = pool_options
+            entry = self._engines.pop(key, None)
+        if entry is not None:
+            self._dispose_entry(entry)
+
+    def get_engine(self, db_url: str) -> Engine:
+        """Return the pooled engine for `db_url`, creating it on first use.
+
+        Args:
+            db_url (str): The database connection string.
+
+        Returns:
+            Engine: A shared SQLAlchemy engine.
+        """
+        return self._get(normalize_db_url(db_url))
+
+    def get_async_engine(self, db_url: str) -> Optional[AsyncEngine]:
+        """Return the pooled async engine (asyncpg/asyncmy) for `db_url`.
+
+        Args:
+            db_url (str): The database connection string, using a sync or async driver.
+
+        Returns:
+            Optional[AsyncEngine]: A shared async engine, or None if the dialect has no async driver.
+        """
+        async_url = to_async_url(db_url)
+        if async_url is None:
+            return None
+        try:
+            # Evicted async engines are closed on the loop that uses them
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        return self._get(normalize_db_url(async_url.render_as_string(hide_password=False)))
+
+    def _get(self, key: str) -> Union[Engine, AsyncEngine]:
+        expired = []
+        with self._lock:
+            expired.extend(self._pop_expired())
+            entry = self._engines.get(key)
+            if entry is None:
+                entry = _EngineEntry(self._build_engine(key))
+                self._engines[key] = entry
+                while len(self._engines) > self.max_engines:
+                    _, lru_entry = self._engines.popitem(last=False)
+                    expired.append(lru_entry)
+                log_debug(f"Registered engine for {make_url(key).render_as_string()}")
+            else:
+                self._engines.move_to_end(key)
+            entry.last_used = time.monotonic()
+
+        for old in expired:
+            self._dispose_entry(old)
+        return entry.engine
+
+    def evict(self, db_url: str) -> bool:
+        """Dispose and forget the engine registered for `db_url`.
+
+        Returns:
+            bool: True if an engine was registered for the URL.
+        """
+        key = normalize_db_url(db_url)
+        with self._lock:
+            entry = self._engines.pop(key, None)
+        if entry is None:
+            return False
+        self._dispose_entry(entry)
+        return True
+
+    def dispose_all(self) -> None:
+        """Dispose every registered engine without awaiting async connection close."""
+        with self._lock:
+            entries = list(self._engines.values())
+            self._engines.clear()
+        for entry in entries:
+            self._dispose_entry(entry)
+
+    async def adispose_all(self) -> None:
+        """Dispose every registered engine, closing async connections cleanly. Called on application shutdown."""
+        with self._lock:
+            entries = list(self._engines.values())
+            self._engines.clear()
+        for entry in entries:
+            if isinstance(entry.engine, AsyncEngine):
+                await self._adispose(entry.engine, grace=0)
+            else:
+                self._dispose_entry(entry)
+        # Evictions still waiting for in-flight queries (futures from other threads are wrapped)
+        pending = [task if asyncio.isfuture(task) else asyncio.wrap_future(task) for task in list(self._disposals)]
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of the registry for diagnostics."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "engines": len(self._engines),
+                "max_engines": self.max_engines,
+                "idle_ttl": self.idle_ttl,
+                "entries": [
+                    {
+                        "db_url": make_url(key).render_as_string(),
+                        "idle_seconds": round(now - entry.last_used, 3),
+                        "pool": entry.engine.pool.status(),
+                    }
+                    for key, entry in self._engines.items()
+                ],
+            }
+
+    def _build_engine(self, key: str) -> Union[Engine, AsyncEngine]:
+        """Create a new engine with the default or per-URL pool options."""
+        url = make_url(key)
+        options: Dict[str, Any] = {"pool_pre_ping": True}
+        # SQLite uses its own pool classes which don't accept QueuePool sizing.
+        if url.get_backend_name() != "sqlite":
+            options.update(self.default_pool_options)
+        options.update(self._pool_overrides.get(key, {}))
+        if url.get_driver_name() in ASYNC_DRIVERS.values():
+            return create_async_engine(url, **options)
+        return create_engine(url, **options)
+
+    def _pop_expired(self) -> list:
+        """Remove entries idle for longer than `idle_ttl`. Caller holds the lock."""
+        if not self.idle_ttl:
+            return []
+        cutoff = time.monotonic() - self.idle_ttl
+        expired_keys = [key for key, entry in self._engines.items() if entry.last_used < cutoff]
+        return [self._engines.pop(key) for key in expired_keys]
+
+    def _dispose_entry(self, entry: _EngineEntry) -> None:
+        if isinstance(entry.engine, AsyncEngine):
+            self._schedule_adispose(entry.engine)
+            return
+        try:
+            entry.engine.dispose()
+        except Exception as e:
+            logger.error(f"Error disposing engine: {e}")
+
+    def _schedule_adispose(self, engine: AsyncEngine) -> None:
+        """Close an evicted async engine's pool on its event loop (closing async connections
+        needs the loop) once in-flight queries have returned their connections."""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is not None:
+            task = running.create_task(self._adispose(engine, self.dispose_grace))
+        elif self._loop is not None and self._loop.is_running():
+            task = asyncio.run_coroutine_threadsafe(self._adispose(engine, self.dispose_grace), self._loop)
+        else:
+            # No loop left to close the connections on (e.g. after shutdown): drop the pool
+            try:
+                engine.sync_engine.dispose(close=False)
+            except Exception as e:
+                logger.error(f"Error disposing engine: {e}")
+            return
+        self._disposals.add(task)
+        task.add_done_callback(self._disposals.discard)
+
+    @staticmethod
+    async def _adispose(engine: AsyncEngine, grace: float) -> None:
+        # Connections still checked out would not be closed by dispose(), so let them come back first
+        checkedout = getattr(engine.pool, "checkedout", None)
+        deadline = time.monotonic() + grace
+        while checkedout is not None and checkedout() and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        try:
+            await engine.dispose()
+        except Exception as e:
+            logger.error(f"Error disposing async engine: {e}")
+
+
+engine_registry = EngineRegistry(
+    max_engines=settings.sql_engine_max_engines,
+    idle_ttl=settings.sql_engine_idle_ttl,
+    pool_size=settings.sql_engine_pool_size,
+    max_overflow=settings.sql_engine_max_overflow,
+    pool_recycle=settings.sql_engine_pool_recycle,
+    dispose_grace=settings.sql_engine_dispose_grace,
+)
@@ -0,0 +1,120 @@
+import datetime
+from collections import Counter
+from decimal import Decimal
+from typing import Any, Dict, List, Union
+
+import numpy as np
+import orjson
+
+from tools.schema_retrieval import estimate_tokens
+from tools.sql_results import result_text
+
+
+"""
+Result compaction for the refine prompt.
+Small results are passed through unchanged. Results that exceed the token budget are
+replaced by per-column statistics (computed over every fetched row) and the largest
+sample of rows, with long values truncated, that still fits the budget.
+"""
+
+
+_TOP_VALUES = 3
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+
+
+def _plain_number(value: float) -> Union[int, float]:
+    return int(value) if float(value).is_integer() else round(float(value), 4)
+
+
+def _as_text(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return orjson.dumps(value, default=str).decode("utf-8")
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)} bytes>"
+    return value
+
+
+def truncate_value(value: Any, max_chars: int) -> Any:
+    """Shorten long strings and nested JSON values to at most `max_chars` characters."""
+    value = _as_text(value)
+    if isinstance(value, str) and len(value) > max_chars:
+        return f"{value[:max_chars]}...(+{len(value) - max_chars} chars)"
+    return value
+
+
+def column_stats(rows: List[dict], max_value_chars: int = 200) -> Dict[str, Dict[str, Any]]:
+    """Compute compact statistics for every column of a result.
+
+    Args:
+        rows (List[dict]): Result rows.
+        max_value_chars (int): Maximum length of the example values reported.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: column -> {type, nulls, ...}. Numbers report min/max/mean/sum,
+        dates min/max, everything else distinct count, longest length and most common values.
+    """
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    stats: Dict[str, Dict[str, Any]] = {}
+    for column in columns:
+        values = [row.get(column) for row in rows]
+        present = [value for value in values if value is not None]
+        entry: Dict[str, Any] = {"nulls": len(values) - len(present)}
+        if present and all(_is_number(value) for value in present):
+            array = np.asarray([float(value) for value in present], dtype=np.float64)
+            entry.update(
+                type="number",
+                min=_plain_number(array.min()),
+                max=_plain_number(array.max()),
+                mean=round(float(array.mean()), 4),
+                sum=_plain_number(array.sum()),
+            )
+        elif present and all(isinstance(value, (datetime.date, datetime.datetime)) for value in present):
+            entry.update(type="date", min=min(present).isoformat(), max=max(present).isoformat())
+        elif present:
+            texts = [str(_as_text(value)) for value in present]
+            counts = Counter(texts)
+            entry.update(
+                type="text",
+                distinct=len(counts),
+                max_length=max(len(text) for text in texts),
+                top=[{"value": truncate_value(value, max_value_chars), "count": count} for value, count in counts.most_common(_TOP_VALUES)],
+            )
+        else:
+            entry["type"] = "null"
+        stats[column] = entry
+    return stats
+
+
+def summarize_result(result: Union[List[dict], str], token_budget: int, max_value_chars: int = 200, has_more: bool = False) -> str:
+    """Render a query result for an LLM prompt within a token budget.
+
+    Args:
+        result (List[dict] | str): Result rows, or a query error message.
+        token_budget (int): Approximate token budget for the rendered result.
+        max_value_chars (int): Maximum length of a single value in the sample.
+        has_more (bool): Whether the rows are only the first page of the result.
+
+    Returns:
+        str: The rows as JSON when they fit, otherwise column statistics plus a row sample.
+    """
+    max_chars = max(token_budget, 1) * 4
+    if isinstance(result, str):
+        return result[:max_chars]
+    more_note = f"\n(Only the first {len(result)} rows are shown; the query returned more.)" if has_more else ""
+    full = result_text(result)
+    if estimate_tokens(full) <= token_budget:
+        return full + more_note
+
+    header = f"{len(result)} rows{' (first page only; the query returned more)' if has_more else ''}.\n"
+    stats = "Column statistics: " + orjson.dumps(column_stats(result, max_value_chars), default=str).decode("utf-8") + "\n"
+    sample_size = len(result)
+    while sample_size > 0:
+        sample = [{key: truncate_value(value, max_value_chars) for key, value in row.items()} for row in result[:sample_size]]
+        text = f"{header}{stats}Sample rows ({sample_size} of {len(result)}): {result_text(sample)}"
+        if estimate_tokens(text) <= token_budget:
+            return text
+        sample_size //= 2
+    return (header + stats)[:max_chars]
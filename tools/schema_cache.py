@@ -0,0 +1,171 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from agno.utils.log import log_debug, logger
+
+from config import settings
+from redis_store import delete_schema_snapshot, get_schema_snapshot, store_schema_snapshot
+from tools.engine_registry import normalize_db_url
+
+
+"""
+Cached schema snapshots for customer databases.
+A snapshot holds every table's columns plus the pre-rendered `schema_str` used in prompts,
+so the chat path does a dictionary lookup instead of re-inspecting the database.
+"""
+
+
+def db_fingerprint(db_url: str) -> str:
+    """Return a stable cache key for a database URL.
+
+    The password is deliberately part of the hashed URL: cached schemas, answers and page
+    tokens are shared by callers with the same fingerprint, so only callers that present the
+    same credentials may share them. The digest holds no plain-text credentials.
+
+    Args:
+        db_url (str): The database connection string.
+
+    Returns:
+        str: SHA-256 hex digest of the normalized URL.
+    """
+    return hashlib.sha256(normalize_db_url(db_url).encode("utf-8")).hexdigest()
+
+
+def render_schema_str(tables: Dict[str, List[Dict[str, Any]]]) -> str:
+    """Render the schema block injected into LLM prompts."""
+    return "\n".join([f"Table: {table}\nColumns: {columns}" for table, columns in tables.items()])
+
+
+class SchemaSnapshot:
+    """
+    Immutable view of a database schema at a point in time.
+    """
+    __slots__ = ("fingerprint", "tables", "schema_str", "version", "created_at")
+
+    def __init__(self, fingerprint: str, tables: Dict[str, List[Dict[str, Any]]], created_at: Optional[float] = None):
+        self.fingerprint = fingerprint
+        self.tables = tables
+        self.schema_str = render_schema_str(tables)
+        self.version = hashlib.sha256(self.schema_str.encode("utf-8")).hexdigest()[:16]
+        self.created_at = created_at if created_at is not None else time.time()
+
+    @property
+    def table_names(self) -> List[str]:
+        return list(self.tables)
+
+    def to_json(self) -> str:
+        return json.dumps({"tables": self.tables, "created_at": self.created_at})
+
+    @classmethod
+    def from_json(cls, fingerprint: str, payload: str) -> "SchemaSnapshot":
+        data = json.loads(payload)
+        return cls(fingerprint, data["tables"], created_at=data.get("created_at"))
+
+
+class SchemaCache:
+    """
+    Two-tier schema snapshot cache: in-process LRU with TTL, plus an optional Redis tier
+    shared between workers.
+    """
+    def __init__(self, ttl: int = 600, max_entries: int = 128, use_redis: bool = False):
+        """
+        Args:
+            ttl (int): Seconds a snapshot stays valid.
+            max_entries (int): Maximum number of snapshots kept in process memory.
+            use_redis (bool): Whether to read/write snapshots in Redis as a second tier.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.use_redis = use_redis
+        self._entries: "OrderedDict[str, SchemaSnapshot]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get_snapshot(self, db_url: str, sql_tools) -> SchemaSnapshot:
+        """Return the schema snapshot for `db_url`, loading it through `sql_tools` on a miss.
+
+        Args:
+            db_url (str): The database connection string.
+            sql_tools (SQLTools): Toolkit bound to the same database, used to load the catalog.
+
+        Returns:
+            SchemaSnapshot: Cached or freshly loaded snapshot.
+        """
+        fingerprint = db_fingerprint(db_url)
+
+        snapshot = self._get_local(fingerprint)
+        if snapshot is not None:
+            return snapshot
+
+        if self.use_redis:
+            try:
+                payload = await get_schema_snapshot(fingerprint)
+                if payload is not None:
+                    snapshot = SchemaSnapshot.from_json(fingerprint, payload)
+                    self._put_local(snapshot)
+                    return snapshot
+            except Exception as e:
+                logger.error(f"Error reading schema snapshot from Redis: {e}")
+
+        log_debug(f"Schema cache miss for {fingerprint[:12]}, loading catalog")
+        loop = asyncio.get_event_loop()
+        tables = await loop.run_in_executor(None, sql_tools.describe_all_tables)
+        snapshot = SchemaSnapshot(fingerprint, tables)
+        self._put_local(snapshot)
+
+        if self.use_redis:
+            try:
+                await store_schema_snapshot(fingerprint, snapshot.to_json(), self.ttl)
+            except Exception as e:
+                logger.error(f"Error writing schema snapshot to Redis: {e}")
+        return snapshot
+
+    async def invalidate(self, db_url: str) -> bool:
+        """Drop the cached snapshot for `db_url` from every tier.
+
+        Returns:
+            bool: True if a snapshot was cached in process memory.
+        """
+        fingerprint = db_fingerprint(db_url)
+        with self._lock:
+            removed = self._entries.pop(fingerprint, None) is not None
+        if self.use_redis:
+            try:
+                await delete_schema_snapshot(fingerprint)
+            except Exception as e:
+                logger.error(f"Error deleting schema snapshot from Redis: {e}")
+        return removed
+
+    def clear(self) -> None:
+        """Drop every in-process snapshot."""
+        with self._lock:
+            self._entries.clear()
+
+    def _get_local(self, fingerprint: str) -> Optional[SchemaSnapshot]:
+        with self._lock:
+            snapshot = self._entries.get(fingerprint)
+            if snapshot is None:
+                return None
+            if time.time() - snapshot.created_at > self.ttl:
+                del self._entries[fingerprint]
+                return None
+            self._entries.move_to_end(fingerprint)
+            return snapshot
+
+    def _put_local(self, snapshot: SchemaSnapshot) -> None:
+        with self._lock:
+            self._entries[snapshot.fingerprint] = snapshot
+            self._entries.move_to_end(snapshot.fingerprint)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+schema_cache = SchemaCache(
+    ttl=settings.schema_cache_ttl,
+    max_entries=settings.schema_cache_max_entries,
+    use_redis=settings.schema_cache_use_redis,
+)
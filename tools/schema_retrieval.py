@@ -0,0 +1,214 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from config import settings
+from tools.answer_cache import catalog_version
+from tools.schema_cache import SchemaSnapshot
+
+
+"""
+Relevance filtering for prompt construction.
+Tables (name + column names) and tools (name + description + template) are indexed with
+BM25 over identifier-aware tokens, and only the best matches for the user's question are
+rendered into the prompt, within a token budget.
+"""
+
+
+_CAMEL_RE = re.compile(r"([a-z0-9])([A-Z])")
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from how i in is it me my of on or show than that the this to was "
+    "were what when where which who with give list get find all many much per".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text and identifiers (snake_case, camelCase) into lowercase, lightly stemmed terms.
+
+    Args:
+        text (str): Free text or identifiers.
+
+    Returns:
+        List[str]: Terms with stopwords and bare numbers removed and plural "s" stripped.
+    """
+    text = _CAMEL_RE.sub(r"\1 \2", text).replace("_", " ").lower()
+    terms = []
+    for token in _TOKEN_RE.findall(text):
+        if token in _STOPWORDS or token.isdigit():
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap LLM token estimate (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a small, fixed set of documents, with the term-document matrix held
+    in NumPy so scoring a query is one vectorized sum.
+    """
+    def __init__(self, documents: Sequence[List[str]], k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            documents (Sequence[List[str]]): Tokenized documents.
+            k1 (float): Term frequency saturation.
+            b (float): Length normalization.
+        """
+        self.vocabulary: Dict[str, int] = {}
+        for terms in documents:
+            for term in terms:
+                self.vocabulary.setdefault(term, len(self.vocabulary))
+        n_docs = len(documents)
+        tf = np.zeros((n_docs, max(len(self.vocabulary), 1)), dtype=np.float32)
+        for i, terms in enumerate(documents):
+            for term in terms:
+                tf[i, self.vocabulary[term]] += 1
+        lengths = tf.sum(axis=1)
+        avg_length = lengths.mean() if n_docs else 0.0
+        df = (tf > 0).sum(axis=0)
+        self.idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = k1 * (1 - b + b * lengths / avg_length) if avg_length else np.full(n_docs, k1, dtype=np.float32)
+        self.weights = (tf * (k1 + 1) / (tf + norm[:, None])) * self.idf[None, :]
+
+    def scores(self, query_terms: List[str]) -> np.ndarray:
+        """Return the BM25 score of every document for the query."""
+        columns = [self.vocabulary[term] for term in set(query_terms) if term in self.vocabulary]
+        if not columns:
+            return np.zeros(self.weights.shape[0], dtype=np.float32)
+        return self.weights[:, columns].sum(axis=1)
+
+
+class PromptContextRetriever:
+    """
+    Selects the tables and tools to put in a prompt. Indexes are built once per schema
+    snapshot version / tool catalog and kept in a small LRU.
+    """
+    def __init__(self, table_top_k: int = 12, schema_token_budget: int = 4000,
+                 tool_top_k: int = 8, tool_token_budget: int = 2000, max_indexes: int = 64):
+        """
+        Args:
+            table_top_k (int): Maximum number of tables injected.
+            schema_token_budget (int): Approximate token budget for the schema block.
+            tool_top_k (int): Maximum number of tools injected.
+            tool_token_budget (int): Approximate token budget for the tool block.
+            max_indexes (int): Number of built indexes kept in memory.
+        """
+        self.table_top_k = table_top_k
+        self.schema_token_budget = schema_token_budget
+        self.tool_top_k = tool_top_k
+        self.tool_token_budget = tool_token_budget
+        self.max_indexes = max_indexes
+        self._indexes: "OrderedDict[Tuple[str, str], Tuple[List[str], BM25Index]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def select_tables(self, snapshot: SchemaSnapshot, prompt: str) -> List[str]:
+        """Pick the most relevant tables for a prompt.
+
+        If the whole schema fits the budget it is kept as-is. Otherwise tables are ranked by
+        BM25 and added best-first until `table_top_k` or the token budget is reached; tables
+        with no matching term are only used when nothing matches at all.
+
+        Args:
+            snapshot (SchemaSnapshot): The database schema snapshot.
+            prompt (str): The user's question.
+
+        Returns:
+            List[str]: Selected table names, in schema order.
+        """
+        tables = snapshot.tables
+        if estimate_tokens(snapshot.schema_str) <= self.schema_token_budget:
+            return list(tables)
+        names, index = self._index(
+            ("schema", snapshot.fingerprint + snapshot.version),
+            lambda: [(name, tokenize(name) * 2 + tokenize(" ".join(c["name"] for c in columns))) for name, columns in tables.items()],
+        )
+        blocks = {name: self.render_table(name, tables[name]) for name in names}
+        chosen = self._rank(names, index.scores(tokenize(prompt)), blocks, self.table_top_k, self.schema_token_budget)
+        order = {name: i for i, name in enumerate(tables)}
+        return sorted(chosen, key=order.get)
+
+    def select_tools(self, tools: Sequence[Any], prompt: str) -> List[Any]:
+        """Pick the most relevant tools for a prompt, within the tool budget.
+
+        Args:
+            tools (Sequence[Tool]): All tool rows.
+            prompt (str): The user's question.
+
+        Returns:
+            List[Tool]: Selected tools, in their original order.
+        """
+        blocks = {tool.name: self.render_tool(tool) for tool in tools}
+        if estimate_tokens("".join(blocks.values())) <= self.tool_token_budget and len(tools) <= self.tool_top_k:
+            return list(tools)
+        catalog = "\n".join(blocks.values())
+        names, index = self._index(
+            ("tools", catalog_version(catalog)),
+            lambda: [(tool.name, tokenize(tool.name) * 2 + tokenize(tool.description or "") + tokenize(tool.sql_template or ""))
+                     for tool in tools],
+        )
+        chosen = set(self._rank(names, index.scores(tokenize(prompt)), blocks, self.tool_top_k, self.tool_token_budget))
+        return [tool for tool in tools if tool.name in chosen]
+
+    @staticmethod
+    def render_table(name: str, columns: List[Dict[str, Any]]) -> str:
+        return f"Table: {name}\nColumns: {columns}"
+
+    @staticmethod
+    def render_tool(tool: Any) -> str:
+        # Catalog tools carry their block pre-rendered
+        return getattr(tool, "prompt_block", None) or f"Name: {tool.name}\nDescription: {tool.description}\nSQL Template: {tool.sql_template}"
+
+    def render_schema(self, snapshot: SchemaSnapshot, prompt: str) -> str:
+        """Render the pruned schema block (same format as `SchemaSnapshot.schema_str`)."""
+        tables = self.select_tables(snapshot, prompt)
+        if len(tables) == len(snapshot.tables):
+            return snapshot.schema_str
+        return "\n".join(self.render_table(name, snapshot.tables[name]) for name in tables)
+
+    def _rank(self, names: List[str], scores: np.ndarray, blocks: Dict[str, str], top_k: int, budget: int) -> List[str]:
+        order = np.argsort(-scores, kind="stable")
+        if scores.size and scores[order[0]] > 0:
+            # Only documents sharing a term with the prompt; if none do, fall back to catalog order
+            order = [i for i in order if scores[i] > 0]
+        chosen: List[str] = []
+        used = 0
+        for i in order:
+            cost = estimate_tokens(blocks[names[i]])
+            if chosen and used + cost > budget:
+                continue
+            chosen.append(names[i])
+            used += cost
+            if len(chosen) >= top_k:
+                break
+        return chosen
+
+    def _index(self, key: Tuple[str, str], build) -> Tuple[List[str], BM25Index]:
+        with self._lock:
+            entry = self._indexes.get(key)
+            if entry is not None:
+                self._indexes.move_to_end(key)
+                return entry
+        documents = build()
+        entry = ([name for name, _ in documents], BM25Index([terms for _, terms in documents]))
+        with self._lock:
+            self._indexes[key] = entry
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
+        return entry
+
+
+prompt_context_retriever = PromptContextRetriever(
+    table_top_k=settings.schema_prune_table_top_k,
+    schema_token_budget=settings.schema_prune_token_budget,
+    tool_top_k=settings.tool_prune_top_k,
+    tool_token_budget=settings.tool_prune_token_budget,
+)
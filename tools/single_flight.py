@@ -0,0 +1,64 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+"""
+Request coalescing.
+Concurrent calls with the same key share one execution: the first caller starts it, later
+callers await the same task. The task is shielded, so a caller that goes away doesn't
+cancel the work the others are waiting for. Coalescing is per process; completed results
+are not kept (that is the answer cache's job).
+"""
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical async calls into one.
+    """
+    def __init__(self, retry_on: Optional[Callable[[BaseException], bool]] = None):
+        """
+        Args:
+            retry_on (Callable[[BaseException], bool], optional): Errors of a shared call that
+                only concern the caller that started it (e.g. its client disconnected). Waiting
+                callers start a new call instead of failing with them.
+        """
+        self.retry_on = retry_on
+        self._calls: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        self.metrics = {"leaders": 0, "followers": 0, "retries": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Run `fn()` unless a call with the same key is in flight, then share its outcome.
+
+        Args:
+            key (Hashable): Identity of the call.
+            fn (Callable[[], Awaitable]): Starts the call; only invoked by the first caller.
+
+        Returns:
+            Tuple[Any, bool]: The result and whether it came from another caller's call.
+        """
+        while True:
+            task = self._calls.get(key)
+            shared = task is not None and not task.done()
+            if not shared:
+                task = self._calls[key] = asyncio.ensure_future(fn())
+                task.add_done_callback(lambda done, key=key: self._forget(key, done))
+                self.metrics["leaders"] += 1
+            else:
+                self.metrics["followers"] += 1
+            try:
+                return await asyncio.shield(task), shared
+            except Exception as e:
+                if shared and self.retry_on is not None and self.retry_on(e):
+                    self.metrics["retries"] += 1
+                    continue
+                raise
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.metrics, in_flight=len(self._calls))
+
+    def _forget(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every caller went away
+            task.exception()
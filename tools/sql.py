@@ -1,17 +1,107 @@
+import asyncio
+import functools
 import json
-from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+import orjson
 
 from agno.tools import Toolkit
 from agno.utils.log import log_debug, logger
 
 try:
-    from sqlalchemy import Engine, create_engine
+    from sqlalchemy import Engine
+    from sqlalchemy.ext.asyncio import AsyncEngine
     from sqlalchemy.inspection import inspect
     from sqlalchemy.orm import Session, sessionmaker
-    from sqlalchemy.sql.expression import text
+    from sqlalchemy.sql.expression import TextClause, text
 except ImportError:
     raise ImportError("`sqlalchemy` not installed")
 
+from config import settings
+from tools.engine_registry import engine_registry
+
+# Single-query catalog lookups used by `describe_all_tables`.
+_POSTGRES_CATALOG_SQL = """
+SELECT c.relname, a.attname, format_type(a.atttypid, a.atttypmod), NOT a.attnotnull
+FROM pg_catalog.pg_attribute a
+JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = :schema
+  AND c.relkind IN ('r', 'p')
+  AND a.attnum > 0
+  AND NOT a.attisdropped
+ORDER BY c.relname, a.attnum
+"""
+
+_MYSQL_CATALOG_SQL = """
+SELECT c.TABLE_NAME, c.COLUMN_NAME, c.COLUMN_TYPE, c.IS_NULLABLE = 'YES'
+FROM information_schema.COLUMNS c
+JOIN information_schema.TABLES t
+  ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME
+WHERE c.TABLE_SCHEMA = COALESCE(:schema, DATABASE())
+  AND t.TABLE_TYPE = 'BASE TABLE'
+ORDER BY c.TABLE_NAME, c.ORDINAL_POSITION
+"""
+
+
+# Statement timeouts applied per connection by the async engines.
+_STATEMENT_TIMEOUT_SQL = {
+    "postgresql": "SET LOCAL statement_timeout = {ms}",
+    "mysql": "SET SESSION MAX_EXECUTION_TIME = {ms}",
+    "mariadb": "SET SESSION max_statement_time = {seconds}",
+}
+
+# Customer queries run in read-only transactions (defense in depth behind the SQL guard);
+# must be the first statement of the transaction.
+_READ_ONLY_TRANSACTION_SQL = {
+    "postgresql": "SET TRANSACTION READ ONLY",
+    "mysql": "SET TRANSACTION READ ONLY",
+    "mariadb": "SET TRANSACTION READ ONLY",
+}
+
+def _transaction_setup_sql(dialect: str, timeout: Optional[float] = None) -> List[str]:
+    """Statements that open a customer query transaction: read-only, then the statement timeout."""
+    statements = [_READ_ONLY_TRANSACTION_SQL[dialect]] if dialect in _READ_ONLY_TRANSACTION_SQL else []
+    timeout_sql = _STATEMENT_TIMEOUT_SQL.get(dialect)
+    if timeout and timeout_sql:
+        statements.append(timeout_sql.format(ms=int(timeout * 1000), seconds=timeout))
+    return statements
+
+def _as_statement(sql: Union[str, TextClause]) -> TextClause:
+    """Wrap raw SQL in `text()`; prebuilt statements (e.g. cached plans) are used as-is."""
+    return text(sql) if isinstance(sql, str) else sql
+
+_sql_pool: Optional[ThreadPoolExecutor] = None
+
+def _get_sql_pool() -> ThreadPoolExecutor:
+    """Bounded pool running queries for dialects without an async engine (created on first use)."""
+    global _sql_pool
+    if _sql_pool is None:
+        _sql_pool = ThreadPoolExecutor(max_workers=settings.sql_thread_workers, thread_name_prefix="sql")
+    return _sql_pool
+
+def shutdown_sql_pool():
+    """Shut down the SQL worker thread pool. Called from the application lifespan."""
+    global _sql_pool
+    if _sql_pool is not None:
+        _sql_pool.shutdown(wait=False, cancel_futures=True)
+        _sql_pool = None
+
+def _interrupt_statement(dbapi_connection: Any) -> bool:
+    """Abort the statement running on a DBAPI connection from another thread, where the driver
+    supports it (sqlite3 `interrupt()`, psycopg2 `cancel()`). Returns whether it could."""
+    for method_name in ("interrupt", "cancel"):
+        method = getattr(dbapi_connection, method_name, None)
+        if callable(method):
+            try:
+                method()
+                return True
+            except Exception as e:
+                logger.warning(f"Could not interrupt the running statement: {e}")
+                return False
+    return False
+
 
 """
 Toolkit for SQL database operations, including listing tables, describing tables, and running queries.
@@ -38,15 +128,15 @@ class SQLTools(Toolkit):
         run_sql_query: bool = True,
         **kwargs,
     ):
-        # Get the database engine
+        # Get the database engine (pooled engines are shared through the registry)
         _engine: Optional[Engine] = db_engine
         if _engine is None and db_url is not None:
-            _engine = create_engine(db_url)
+            _engine = engine_registry.get_engine(db_url)
         elif user and password and host and port and dialect:
             if schema is not None:
-                _engine = create_engine(f"{dialect}://{user}:{password}@{host}:{port}/{schema}")
+                _engine = engine_registry.get_engine(f"{dialect}://{user}:{password}@{host}:{port}/{schema}")
             else:
-                _engine = create_engine(f"{dialect}://{user}:{password}@{host}:{port}")
+                _engine = engine_registry.get_engine(f"{dialect}://{user}:{password}@{host}:{port}")
 
         if _engine is None:
             raise ValueError("Could not build the database connection")
@@ -54,6 +144,7 @@ class SQLTools(Toolkit):
         # Database connection
         self.db_engine: Engine = _engine
         self.Session: sessionmaker[Session] = sessionmaker(bind=self.db_engine)
+        self._async_engine: Optional[AsyncEngine] = None
 
         self.schema = schema
 
@@ -116,6 +207,45 @@ class SQLTools(Toolkit):
             logger.error(f"Error getting table schema: {e}")
             return f"Error getting table schema: {e}"
 
+    def describe_all_tables(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Describe every table with a single catalog round trip where the dialect allows it.
+
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: table name -> list of {name, type, nullable}, ordered by table name.
+        """
+        dialect = self.db_engine.dialect.name
+        if dialect == "postgresql":
+            catalog_sql = _POSTGRES_CATALOG_SQL
+            params = {"schema": self.schema or "public"}
+        elif dialect in ("mysql", "mariadb"):
+            catalog_sql = _MYSQL_CATALOG_SQL
+            params = {"schema": self.schema}
+        else:
+            catalog_sql = None
+
+        tables: Dict[str, List[Dict[str, Any]]] = {}
+        if catalog_sql is not None:
+            log_debug(f"Loading {dialect} catalog in one query")
+            with self.db_engine.connect() as conn:
+                for table_name, column_name, column_type, nullable in conn.execute(text(catalog_sql), params):
+                    tables.setdefault(table_name, []).append(
+                        {"name": column_name, "type": str(column_type).upper(), "nullable": bool(nullable)}
+                    )
+        else:
+            # Generic dialects: one inspector, one multi-table reflection call.
+            inspector = inspect(self.db_engine)
+            multi_columns = inspector.get_multi_columns(schema=self.schema)
+            for (_, table_name), columns in multi_columns.items():
+                tables[table_name] = [
+                    {"name": column["name"], "type": str(column["type"]), "nullable": column["nullable"]}
+                    for column in columns
+                ]
+
+        if self.tables is not None:
+            allowed = set(self.tables)
+            tables = {name: cols for name, cols in tables.items() if name in allowed}
+        return dict(sorted(tables.items()))
+
     def run_sql_query(self, query: str, limit: Optional[int] = 10) -> str:
         """Use this function to run a SQL query and return the result.
 
@@ -134,28 +264,234 @@ class SQLTools(Toolkit):
             logger.error(f"Error running query: {e}")
             return f"Error running query: {e}"
 
-    def run_sql(self, sql: str, limit: Optional[int] = None) -> List[dict]:
+    def run_sql(self, sql: Union[str, TextClause], limit: Optional[int] = None, params: Optional[Dict[str, Any]] = None) -> List[dict]:
         """Internal function to run a sql query.
 
         Args:
-            sql (str): The sql query to run.
+            sql (str | TextClause): The sql query to run, optionally a prebuilt statement with bind parameters.
             limit (int, optional): The number of rows to return. Defaults to None.
+            params (dict, optional): Bind parameter values. Defaults to None.
 
         Returns:
             List[dict]: The result of the query.
         """
+        return self._run_sql(sql, limit, params)
+
+    def _run_sql(
+        self,
+        sql: Union[str, TextClause],
+        limit: Optional[int] = None,
+        params: Optional[Dict[str, Any]] = None,
+        running: Optional[Dict[str, Any]] = None,
+    ) -> List[dict]:
+        # `running["connection"]` holds the DBAPI connection while the statement runs, so
+        # another thread can interrupt it
         log_debug(f"Running sql |\n{sql}")
 
         with self.Session() as sess, sess.begin():
-            result = sess.execute(text(sql))
+            if running is not None:
+                running["connection"] = sess.connection().connection.dbapi_connection
+            try:
+                for setup_sql in _transaction_setup_sql(self.db_engine.dialect.name):
+                    sess.execute(text(setup_sql))
+                result = sess.execute(_as_statement(sql), params or {})
+
+                # Check if the operation has returned rows.
+                try:
+                    if limit:
+                        rows = result.fetchmany(limit)
+                    else:
+                        rows = result.fetchall()
+                    return [row._asdict() for row in rows]
+                except Exception as e:
+                    logger.error(f"Error while executing SQL: {e}")
+                    return []
+            finally:
+                if running is not None:
+                    running.pop("connection", None)
+
+    async def arun_sql_query(
+        self,
+        query: Union[str, TextClause],
+        limit: Optional[int] = 10,
+        timeout: Optional[float] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Async counterpart of `run_sql_query` that never blocks the event loop.
+
+        Args:
+            query (str | TextClause): The query to run, optionally a prebuilt statement with bind parameters.
+            limit (int, optional): The number of rows to return. Defaults to 10. Use `None` to show all results.
+            timeout (float, optional): Statement timeout in seconds. Defaults to `settings.sql_statement_timeout`.
+            params (dict, optional): Bind parameter values. Defaults to None.
+        Returns:
+            str: Result of the SQL query.
+        """
+        result = await self.arun_sql_rows(query, limit=limit, timeout=timeout, params=params)
+        return result if isinstance(result, str) else orjson.dumps(result, default=str).decode("utf-8")
 
-            # Check if the operation has returned rows.
+    async def arun_sql_rows(
+        self,
+        query: Union[str, TextClause],
+        limit: Optional[int] = 10,
+        timeout: Optional[float] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> Union[List[dict], str]:
+        """Like `arun_sql_query`, but returns the rows themselves instead of a JSON string.
+
+        Args:
+            query (str | TextClause): The query to run, optionally a prebuilt statement with bind parameters.
+            limit (int, optional): The number of rows to return. Defaults to 10. Use `None` to show all results.
+            timeout (float, optional): Statement timeout in seconds. Defaults to `settings.sql_statement_timeout`.
+            params (dict, optional): Bind parameter values. Defaults to None.
+        Returns:
+            List[dict] | str: The rows, or an "Error running query: ..." message.
+        """
+        try:
+            return await self.arun_sql(sql=query, limit=limit, timeout=timeout, params=params)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            logger.error(f"Query timed out after {self._timeout(timeout)}s")
+            return f"Error running query: statement timed out after {self._timeout(timeout)}s"
+        except Exception as e:
+            logger.error(f"Error running query: {e}")
+            return f"Error running query: {e}"
+
+    async def arun_sql(
+        self,
+        sql: Union[str, TextClause],
+        limit: Optional[int] = None,
+        timeout: Optional[float] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> List[dict]:
+        """Run a sql query asynchronously.
+
+        PostgreSQL and MySQL use pooled asyncpg/asyncmy engines with a server-side statement
+        timeout, and cancelling the awaiting task cancels the statement. Other dialects run
+        `run_sql` on the bounded SQL thread pool (`sql_thread_workers`); on a timeout or
+        cancellation the statement is interrupted where the driver supports it (sqlite3
+        `interrupt()`, psycopg2 `cancel()`). With other drivers the worker thread keeps
+        running the statement to completion after the caller has given up.
+
+        Args:
+            sql (str | TextClause): The sql query to run, optionally a prebuilt statement with bind parameters.
+            limit (int, optional): The number of rows to return. Defaults to None.
+            timeout (float, optional): Statement timeout in seconds. Defaults to `settings.sql_statement_timeout`.
+            params (dict, optional): Bind parameter values. Defaults to None.
+
+        Returns:
+            List[dict]: The result of the query.
+        """
+        timeout = self._timeout(timeout)
+        async_engine = self._get_async_engine()
+        if async_engine is None:
+            running: Dict[str, Any] = {}
+            call = functools.partial(self._run_sql, sql, limit, params, running)
             try:
-                if limit:
-                    rows = result.fetchmany(limit)
-                else:
-                    rows = result.fetchall()
-                return [row._asdict() for row in rows]
-            except Exception as e:
-                logger.error(f"Error while executing SQL: {e}")
-                return []
\ No newline at end of file
+                return await asyncio.wait_for(asyncio.get_running_loop().run_in_executor(_get_sql_pool(), call), timeout or None)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                if "connection" in running:
+                    _interrupt_statement(running["connection"])
+                raise
+        return await asyncio.wait_for(self._arun_sql(async_engine, sql, limit, timeout, params), timeout or None)
+
+    async def _arun_sql(
+        self,
+        async_engine: AsyncEngine,
+        sql: Union[str, TextClause],
+        limit: Optional[int],
+        timeout: float,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> List[dict]:
+        log_debug(f"Running async sql |\n{sql}")
+        async with async_engine.connect() as conn, conn.begin():
+            for setup_sql in _transaction_setup_sql(async_engine.dialect.name, timeout):
+                await conn.execute(text(setup_sql))
+            result = await conn.execute(_as_statement(sql), params or {})
+            if not result.returns_rows:
+                return []
+            rows = result.fetchmany(limit) if limit else result.fetchall()
+            return [row._asdict() for row in rows]
+
+    async def astream_sql(
+        self,
+        sql: Union[str, TextClause],
+        params: Optional[Dict[str, Any]] = None,
+        batch_size: int = 1000,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[List[dict]]:
+        """Stream the rows of a query in batches through a server-side cursor.
+
+        PostgreSQL and MySQL stream from the async engine (asyncpg/asyncmy cursors) under the
+        statement timeout. Other dialects read `stream_results` partitions on a dedicated worker
+        thread (the connection never changes threads), each batch bounded by the timeout.
+        Only one batch is held in memory at a time.
+
+        Args:
+            sql (str | TextClause): The sql query to run, optionally a prebuilt statement with bind parameters.
+            params (dict, optional): Bind parameter values. Defaults to None.
+            batch_size (int): Rows per yielded batch.
+            timeout (float, optional): Statement timeout in seconds. Defaults to `settings.sql_statement_timeout`.
+
+        Yields:
+            List[dict]: The next batch of rows.
+        """
+        log_debug(f"Streaming sql |\n{sql}")
+        timeout = self._timeout(timeout)
+        async_engine = self._get_async_engine()
+        if async_engine is not None:
+            async with async_engine.connect() as conn, conn.begin():
+                for setup_sql in _transaction_setup_sql(async_engine.dialect.name, timeout):
+                    await conn.execute(text(setup_sql))
+                result = await conn.stream(_as_statement(sql), params or {})
+                async for partition in result.partitions(batch_size):
+                    yield [row._asdict() for row in partition]
+            return
+
+        loop = asyncio.get_running_loop()
+        worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sql-stream")
+        state: Dict[str, Any] = {}
+
+        def start():
+            state["conn"] = conn = self.db_engine.connect()
+            state["dbapi"] = conn.connection.dbapi_connection
+            conn.begin()
+            for setup_sql in _transaction_setup_sql(self.db_engine.dialect.name):
+                conn.execute(text(setup_sql))
+            result = conn.execution_options(stream_results=True).execute(_as_statement(sql), params or {})
+            state["partitions"] = result.partitions(batch_size) if result.returns_rows else iter(())
+
+        def next_batch() -> List[dict]:
+            return [row._asdict() for row in next(state["partitions"], [])]
+
+        def close():
+            if "conn" in state:
+                state["conn"].close()
+
+        finished = False
+        try:
+            await asyncio.wait_for(loop.run_in_executor(worker, start), timeout or None)
+            while True:
+                batch = await asyncio.wait_for(loop.run_in_executor(worker, next_batch), timeout or None)
+                if not batch:
+                    break
+                yield batch
+            finished = True
+        finally:
+            if not finished and "dbapi" in state:
+                # Timed out or abandoned: stop the statement so `close` doesn't wait for it
+                _interrupt_statement(state["dbapi"])
+            await loop.run_in_executor(worker, close)
+            worker.shutdown(wait=False)
+
+    def _get_async_engine(self) -> Optional[AsyncEngine]:
+        if self._async_engine is None:
+            self._async_engine = engine_registry.get_async_engine(
+                self.db_engine.url.render_as_string(hide_password=False)
+            )
+        return self._async_engine
+
+    @staticmethod
+    def _timeout(timeout: Optional[float]) -> float:
+        return settings.sql_statement_timeout if timeout is None else timeout
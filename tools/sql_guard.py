@@ -0,0 +1,268 @@
+import re
+from typing import Any, List, Optional, Tuple
+
+
+"""
+Post-processing and safety checks for LLM-generated SQL.
+`clean_sql` extracts the statement from a model reply (markdown fences, leading prose,
+comments, smart quotes). `inspect_sql` tokenizes it once (string literals, quoted
+identifiers and comments are never mistaken for keywords), enforces a single read-only
+statement and fixes identifier quoting for the dialect. `prepare_sql` combines both and
+adds a LIMIT when the query has none. All patterns are compiled once at import.
+"""
+
+
+_FENCED_BLOCK_RE = re.compile(r"```[ \t]*(?:sql)?[ \t]*\n?(.*?)```", re.IGNORECASE | re.DOTALL)
+_FENCE_RE = re.compile(r"```[ \t]*(?:sql)?", re.IGNORECASE)
+_STATEMENT_START_RE = re.compile(r"(?:\(\s*)*\b(SELECT|WITH|INSERT|UPDATE|DELETE|CREATE|ALTER|DROP)\b", re.IGNORECASE)
+_ERROR_REPLY_RE = re.compile(r"^\W*error\b", re.IGNORECASE)
+_SMART_QUOTE_RE = re.compile("[\u2018\u2019\u201c\u201d]")
+# Literal syntaxes: standard SQL doubles quotes; MySQL/MariaDB also escape with a backslash;
+# PostgreSQL-family dialects add dollar-quoted strings ($$...$$, $tag$...$tag$)
+_STRING = r"'(?:[^']|'')*'"
+_QUOTED = r'"(?:[^"]|"")*"'
+_BACKSLASH_STRING = r"'(?:[^'\\]|''|\\.)*'"
+_BACKSLASH_QUOTED = r'"(?:[^"\\]|""|\\.)*"'
+_DOLLAR_STRING = r"(?<![\w$])\$(?P<tag>(?:[A-Za-z_][A-Za-z0-9_]*)?)\$.*?\$(?P=tag)\$"
+# MySQL/MariaDB also start a line comment with `#`
+_HASH_COMMENT = r"|\#[^\n]*"
+
+
+def _compact_re(literal: str, comment: str = "") -> "re.Pattern":
+    # One pass: keep string literals and quoted identifiers, drop comments, collapse whitespace
+    return re.compile(r"(" + literal + r"|`[^`]*`)|(?:--[^\n]*|/\*.*?\*/" + comment + r"|\s)+", re.DOTALL)
+
+
+def _token_re(string: str, quoted: str, comment: str = "") -> "re.Pattern":
+    # Alternatives ordered by frequency; comments count as whitespace
+    return re.compile(
+        r"""
+          (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+        | (?P<space>(?:\s|--[^\n]*|/\*.*?\*/""" + comment + r""")+)
+        | (?P<other>[^A-Za-z_\s'"`();/\#$-]+|[/\#-])
+        | (?P<string>""" + string + r""")
+        | (?P<open>\()
+        | (?P<close>\))
+        | (?P<quoted>""" + quoted + r""")
+        | (?P<backtick>`[^`]*`)
+        | (?P<semicolon>;)
+        | (?P<stray>.)
+        """,
+        re.VERBOSE | re.DOTALL,
+    )
+
+
+_TOKEN_RE = _token_re(_STRING, _QUOTED)
+_DOLLAR_TOKEN_RE = _token_re(_STRING + "|" + _DOLLAR_STRING, _QUOTED)
+_BACKSLASH_TOKEN_RE = _token_re(_BACKSLASH_STRING, _BACKSLASH_QUOTED, _HASH_COMMENT)
+_COMPACT_RE = _compact_re(_STRING + "|" + _QUOTED)
+_DOLLAR_COMPACT_RE = _compact_re(_STRING + "|" + _DOLLAR_STRING + "|" + _QUOTED)
+_BACKSLASH_COMPACT_RE = _compact_re(_BACKSLASH_STRING + "|" + _BACKSLASH_QUOTED, _HASH_COMMENT)
+_SMART_QUOTES = str.maketrans({"‘": "'", "’": "'", "“": '"', "”": '"'})
+
+READ_ONLY_STARTS = frozenset({"SELECT", "WITH"})
+# Keywords that make a SELECT/WITH statement write data or schema (data-modifying CTEs,
+# SELECT ... INTO, FOR UPDATE). Statement-only commands can't follow a SELECT anyway.
+FORBIDDEN_KEYWORDS = frozenset({
+    "INSERT", "UPDATE", "DELETE", "MERGE", "UPSERT", "INTO", "DROP", "ALTER", "CREATE", "TRUNCATE",
+    "GRANT", "REVOKE", "EXEC", "EXECUTE",
+})
+STATEMENT_STARTS = READ_ONLY_STARTS | FORBIDDEN_KEYWORDS | {
+    "BEGIN", "COMMIT", "ROLLBACK", "SET", "RESET", "SHOW", "USE", "EXPLAIN", "CALL", "COPY", "LOCK",
+    "VACUUM", "ANALYZE", "ATTACH", "DETACH", "PRAGMA", "COMMENT", "REINDEX", "CLUSTER", "LISTEN", "NOTIFY",
+}
+LIMIT_KEYWORDS = frozenset({"LIMIT", "FETCH", "TOP"})
+# Row locking clauses (FOR SHARE, FOR KEY SHARE, FOR NO KEY UPDATE, LOCK IN SHARE MODE): a
+# read-only query has no business taking locks, and LIMIT can't be appended after them
+LOCKING_CLAUSES = frozenset({("FOR", "SHARE"), ("FOR", "KEY"), ("FOR", "NO"), ("FOR", "UPDATE"), ("LOCK", "IN", "SHARE")})
+# Dialects where `LIMIT n` can be appended; others (e.g. mssql, oracle) are left unchanged
+LIMIT_DIALECTS = frozenset({"postgresql", "mysql", "mariadb", "sqlite", "duckdb", "redshift", "snowflake", "bigquery", "clickhouse", "trino"})
+BACKTICK_DIALECTS = frozenset({"mysql", "mariadb", "bigquery", "sqlite", "clickhouse"})
+# Dialects where a backslash escapes the next character inside string literals (and `#` starts a comment)
+BACKSLASH_ESCAPE_DIALECTS = frozenset({"mysql", "mariadb"})
+# Dialects with dollar-quoted string literals; also assumed when the dialect is unknown
+DOLLAR_QUOTE_DIALECTS = frozenset({"postgresql", "redshift", "snowflake", "duckdb"})
+# What may follow a trailing OFFSET: its value (a number or bind parameter) and ROW/ROWS
+_OFFSET_TAIL_RE = re.compile(r"\s*(?:\d+|:\w+|\?|%s|\$\d+)(?:\s+ROWS?)?\s*", re.IGNORECASE)
+
+
+class UnsafeSQLError(ValueError):
+    """Raised when generated SQL is not a single read-only statement."""
+
+
+class SQLCheck:
+    """
+    Result of `inspect_sql`: the normalized statement, whether it is a single read-only
+    query (with the reason when it is not) and whether it already limits its rows.
+    `offset_at` is the position of a trailing top-level OFFSET clause, where a LIMIT has to go.
+    """
+    __slots__ = ("statement", "read_only", "reason", "has_limit", "offset_at")
+
+    def __init__(
+        self,
+        statement: str,
+        read_only: bool,
+        reason: Optional[str] = None,
+        has_limit: bool = False,
+        offset_at: Optional[int] = None,
+    ):
+        self.statement = statement
+        self.read_only = read_only
+        self.reason = reason
+        self.has_limit = has_limit
+        self.offset_at = offset_at
+
+
+def _dialect_res(dialect: Optional[str]) -> Tuple["re.Pattern", "re.Pattern"]:
+    """The (tokenizer, compactor) patterns matching the dialect's literal and comment syntax."""
+    if dialect in BACKSLASH_ESCAPE_DIALECTS:
+        return _BACKSLASH_TOKEN_RE, _BACKSLASH_COMPACT_RE
+    if dialect is None or dialect in DOLLAR_QUOTE_DIALECTS:
+        return _DOLLAR_TOKEN_RE, _DOLLAR_COMPACT_RE
+    return _TOKEN_RE, _COMPACT_RE
+
+
+def _extract_statement(sql: str) -> str:
+    if not sql:
+        return ""
+    block = _FENCED_BLOCK_RE.search(sql)
+    sql = block.group(1) if block else _FENCE_RE.sub("", sql)
+    if _SMART_QUOTE_RE.search(sql):
+        sql = sql.translate(_SMART_QUOTES)
+    if _ERROR_REPLY_RE.match(sql):
+        # The model declined ("ERROR: Cannot generate SELECT query")
+        return ""
+    # Skip explanatory text before the first statement keyword
+    match = _STATEMENT_START_RE.search(sql)
+    if match:
+        sql = sql[match.start():]
+    # Leftover markdown emphasis around the statement (**SELECT ...**)
+    return sql.strip().strip("*").strip()
+
+
+def clean_sql(sql: str, dialect: Optional[str] = None) -> str:
+    """Extract the SQL statement from an LLM reply.
+
+    Args:
+        sql (str): Raw model output, possibly with markdown fences, prose or comments.
+        dialect (str, optional): SQLAlchemy dialect name of the target database.
+
+    Returns:
+        str: The statement with comments removed and whitespace collapsed (literals untouched).
+    """
+    return _dialect_res(dialect)[1].sub(lambda m: m.group(1) or " ", _extract_statement(sql)).strip()
+
+
+def inspect_sql(sql: str, dialect: Optional[str] = None) -> SQLCheck:
+    """Classify a statement with a single tokenizer pass.
+
+    The statement must start with SELECT or WITH and contain no write/DDL/session keyword at
+    any depth (so writes hidden in CTEs are caught). Text after a first `;` is dropped when
+    it is prose and rejected when it is another statement. Backtick-quoted identifiers are
+    rewritten to double quotes for dialects that don't accept backticks. Literal and comment
+    syntax follows the dialect (MySQL backslash escapes and `#` comments, dollar quotes).
+
+    Args:
+        sql (str): A SQL statement; comments are dropped and whitespace collapsed.
+        dialect (str, optional): SQLAlchemy dialect name of the target database.
+
+    Returns:
+        SQLCheck: The normalized statement and its classification.
+    """
+    pieces: List[str] = []
+    first_word: Optional[str] = None
+    depth = 0
+    has_limit = False
+    offset_piece: Optional[int] = None
+    reason: Optional[str] = None
+    ended = False
+    recent_words: Tuple[str, ...] = ()
+    fix_backticks = dialect is not None and dialect not in BACKTICK_DIALECTS
+    token_re = _dialect_res(dialect)[0]
+    for match in token_re.finditer(sql):
+        kind = match.lastgroup
+        value = match.group()
+        if kind == "space":
+            if pieces and pieces[-1] != " ":
+                pieces.append(" ")
+            continue
+        if ended:
+            if kind == "word" and value.upper() in STATEMENT_STARTS:
+                reason = "Only a single SQL statement is allowed"
+            # Anything else after the statement is trailing prose
+            break
+        if kind == "semicolon":
+            ended = depth == 0
+            if not ended:
+                reason = reason or "Unexpected ';' inside the statement"
+            continue
+        if kind == "word":
+            word = value.upper()
+            if first_word is None:
+                first_word = word
+            recent_words = recent_words[-2:] + (word,)
+            if reason is None and (recent_words[-2:] in LOCKING_CLAUSES or recent_words in LOCKING_CLAUSES):
+                reason = "Row locking clauses (FOR SHARE / FOR UPDATE / LOCK IN SHARE MODE) are not allowed"
+            if word in FORBIDDEN_KEYWORDS and reason is None:
+                reason = f"{word} is not allowed; only read-only SELECT queries can be run"
+            if depth == 0 and word in LIMIT_KEYWORDS:
+                has_limit = True
+            elif depth == 0 and word == "OFFSET":
+                offset_piece = len(pieces)
+        elif kind == "open":
+            depth += 1
+        elif kind == "close":
+            depth -= 1
+        elif kind == "backtick" and fix_backticks:
+            value = '"' + value[1:-1].replace('"', '""') + '"'
+        pieces.append(value)
+
+    statement = "".join(pieces).strip()
+    if reason is None and first_word not in READ_ONLY_STARTS:
+        reason = "Only SELECT queries can be run" if first_word else "No SQL statement found"
+    if reason is None and depth != 0:
+        reason = "Unbalanced parentheses"
+    offset_at = None
+    if offset_piece is not None and _OFFSET_TAIL_RE.fullmatch("".join(pieces[offset_piece + 1:])):
+        offset_at = len("".join(pieces[:offset_piece]))
+    return SQLCheck(statement, reason is None, reason, has_limit, offset_at)
+
+
+def sql_literal(value: Any, dialect: Optional[str] = None) -> str:
+    """Render a value as a SQL literal: numbers as is, anything else as an escaped string."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return repr(value)
+    escaped = str(value).replace("'", "''")
+    if dialect in BACKSLASH_ESCAPE_DIALECTS:
+        escaped = escaped.replace("\\", "\\\\")
+    return f"'{escaped}'"
+
+
+def is_read_only(sql: str, dialect: Optional[str] = None) -> bool:
+    """Whether `sql` is a single read-only statement."""
+    return bool(sql) and inspect_sql(sql, dialect).read_only
+
+
+def prepare_sql(sql: str, dialect: Optional[str] = None, max_rows: Optional[int] = None) -> str:
+    """Clean, validate and bound a generated query before it reaches a customer database.
+
+    Args:
+        sql (str): Raw or cleaned SQL.
+        dialect (str, optional): SQLAlchemy dialect name of the target database.
+        max_rows (int, optional): LIMIT added when the query has none (dialects with LIMIT only);
+            it goes before a trailing OFFSET, which MySQL and SQLite only accept after a LIMIT.
+
+    Returns:
+        str: The statement to run.
+
+    Raises:
+        UnsafeSQLError: If the SQL is not a single read-only statement.
+    """
+    check = inspect_sql(_extract_statement(sql), dialect)
+    if not check.read_only:
+        raise UnsafeSQLError(check.reason)
+    if max_rows and not check.has_limit and (dialect is None or dialect in LIMIT_DIALECTS):
+        if check.offset_at is not None:
+            return f"{check.statement[:check.offset_at]}LIMIT {int(max_rows)} {check.statement[check.offset_at:]}"
+        return f"{check.statement} LIMIT {int(max_rows)}"
+    return check.statement
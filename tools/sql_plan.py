@@ -0,0 +1,276 @@
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.sql.expression import TextClause, text
+
+from config import settings
+from tools.sql_guard import sql_literal
+
+
+"""
+Plan cache for tool SQL templates.
+A tool's `sql_template` ("... WHERE region = '{region}' LIMIT {n}") is compiled once per
+database into a parameterized statement ("... WHERE region = :b0 LIMIT :b1"), so requests
+that map to the same tool only need parameter values and run through bind parameters,
+letting the driver and the customer database reuse one prepared statement.
+"""
+
+
+# '{name}' or '%{name}%' inside a single-quoted string literal
+_QUOTED_PLACEHOLDER_RE = re.compile(r"'([^'{}]*)\{([A-Za-z_][A-Za-z0-9_]*)\}([^'{}]*)'")
+# bare {name}
+_PLACEHOLDER_RE = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+# SQL positions where a bare placeholder can only be a scalar value, so it can become a bind
+# parameter: after a comparison, LIKE/ILIKE, BETWEEN (and its AND), LIMIT and OFFSET. Elsewhere
+# (select lists, function arguments, arithmetic) it may be an identifier or an expression.
+_VALUE_CONTEXT_RE = re.compile(
+    r"(?:<=|>=|<>|!=|=|<|>|\bLIKE|\bILIKE|\bBETWEEN|\bLIMIT|\bOFFSET"
+    r"|\bBETWEEN\s+(?:'(?:[^']|'')*'|[^\s'()]+)\s+AND)\s*$",
+    re.IGNORECASE,
+)
+_LIST_CONTEXT_RE = re.compile(r"\bIN\s*\(\s*$", re.IGNORECASE)
+# A colon that SQLAlchemy's text() would read as a bind marker
+_BIND_MARKER_RE = re.compile(r"(?<![:\w\\]):(?=\w)")
+# A bind marker of a compiled plan, or a colon escaped from text()
+_BOUND_RE = re.compile(r"(?<![:\w\\]):(b\d+)(?!\w)|\\:")
+_INT_RE = re.compile(r"^-?\d+$")
+_FLOAT_RE = re.compile(r"^-?\d+\.\d+$")
+# Literals in a user prompt: quoted strings and standalone numbers
+_PROMPT_LITERAL_RE = re.compile(r"'([^']*)'|\"([^\"]*)\"|(?<![\w.])(-?\d+(?:\.\d+)?)(?![\w.])")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def template_placeholders(template: str) -> List[str]:
+    """Return the `{placeholder}` names of a tool SQL template, in order of first use."""
+    return list(dict.fromkeys(_PLACEHOLDER_RE.findall(template or "")))
+
+
+def coerce_param(value: Any) -> Any:
+    """Convert numeric strings produced by the LLM to numbers, leaving everything else untouched."""
+    if isinstance(value, str):
+        stripped = value.strip()
+        if _INT_RE.match(stripped):
+            return int(stripped)
+        if _FLOAT_RE.match(stripped):
+            return float(stripped)
+    return value
+
+
+def prompt_shape(prompt: str) -> Tuple[str, List[str]]:
+    """Split a prompt into its shape (literals masked) and the literals themselves.
+
+    Args:
+        prompt (str): The user's natural language question.
+
+    Returns:
+        Tuple[str, List[str]]: Lowercased shape with `#` per literal, and the literals in order.
+    """
+    literals: List[str] = []
+
+    def mask(match: "re.Match") -> str:
+        literals.append(next(group for group in match.groups() if group is not None))
+        return "#"
+
+    shape = _PROMPT_LITERAL_RE.sub(mask, prompt.strip())
+    return _WHITESPACE_RE.sub(" ", shape).lower(), literals
+
+
+class SQLPlan:
+    """
+    A tool template compiled to a parameterized statement.
+    Each bind is (bind name, template parameter, prefix, suffix); quoted placeholders keep
+    their surrounding literal text as prefix/suffix (e.g. LIKE '%{name}%').
+    """
+    __slots__ = ("tool_name", "template", "sql", "statement", "binds", "param_names", "quoted", "bindable", "uses")
+
+    def __init__(self, tool_name: str, template: str, sql: str, binds: List[Tuple[str, str, str, str]], quoted: set):
+        self.tool_name = tool_name
+        self.template = template
+        self.sql = sql
+        self.statement: TextClause = text(sql)
+        self.binds = binds
+        self.param_names = list(dict.fromkeys(param for _, param, _, _ in binds))
+        self.quoted = quoted
+        self.bindable = True
+        self.uses = 0
+
+    @classmethod
+    def compile(cls, tool_name: str, template: str) -> Optional["SQLPlan"]:
+        """Compile a `{placeholder}` template, or return None if a placeholder is not in a
+        position that only takes a scalar value (e.g. a column or table name, a function argument
+        or an IN list), in which case the template can't use bind parameters."""
+        binds: List[Tuple[str, str, str, str]] = []
+        quoted = set()
+
+        def bind(param: str, prefix: str = "", suffix: str = "") -> str:
+            name = f"b{len(binds)}"
+            binds.append((name, param, prefix, suffix))
+            return f":{name}"
+
+        parts: List[str] = []
+        position = 0
+        for match in _QUOTED_PLACEHOLDER_RE.finditer(template):
+            parts.append(("raw", template[position:match.start()]))
+            parts.append(("quoted", match))
+            position = match.end()
+        parts.append(("raw", template[position:]))
+
+        sql = ""
+        for kind, part in parts:
+            if kind == "quoted":
+                prefix, param, suffix = part.groups()
+                quoted.add(param)
+                sql += bind(param, prefix, suffix)
+                continue
+            last = 0
+            for match in _PLACEHOLDER_RE.finditer(part):
+                before = sql + _BIND_MARKER_RE.sub(r"\\:", part[last:match.start()])
+                if _LIST_CONTEXT_RE.search(before) or not _VALUE_CONTEXT_RE.search(before):
+                    return None
+                sql = before + bind(match.group(1))
+                last = match.end()
+            sql += _BIND_MARKER_RE.sub(r"\\:", part[last:])
+
+        if not binds:
+            return None
+        return cls(tool_name, template, sql, binds, quoted)
+
+    def accepts(self, params: Any) -> bool:
+        """Whether `params` supplies a value for every template parameter."""
+        return isinstance(params, dict) and all(params.get(name) is not None for name in self.param_names)
+
+    def bind(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Bind parameter values for `statement`."""
+        values = {}
+        for name, param, prefix, suffix in self.binds:
+            value = params[param]
+            if prefix or suffix:
+                value = f"{prefix}{value}{suffix}"
+            elif param not in self.quoted:
+                value = coerce_param(value)
+            else:
+                value = str(value)
+            values[name] = value
+        return values
+
+    def render(self, params: Dict[str, Any], dialect: Optional[str] = None) -> str:
+        """The statement with its bind values inlined as escaped literals, i.e. the literal SQL
+        equivalent of running `statement` with `bind(params)` (safe to cache and to re-run)."""
+        values = self.bind(params)
+        return _BOUND_RE.sub(lambda match: sql_literal(values[match.group(1)], dialect) if match.group(1) else ":", self.sql)
+
+    def result_key(self, params: Dict[str, Any]) -> str:
+        """Stable key for the result of running this plan with `params`."""
+        return f"{self.sql}\n-- {json.dumps(self.bind(params), sort_keys=True, default=str)}"
+
+
+class SQLPlanCache:
+    """
+    LRU cache of compiled plans per (database, tool template), plus an index from prompt
+    shapes to the plan that answered them and how the prompt's literals map to parameters.
+    """
+    def __init__(self, max_entries: int = 512, max_shapes: int = 4096):
+        """
+        Args:
+            max_entries (int): Maximum number of compiled plans kept.
+            max_shapes (int): Maximum number of remembered prompt shapes.
+        """
+        self.max_entries = max_entries
+        self.max_shapes = max_shapes
+        self._plans: "OrderedDict[Tuple[str, str, str], Optional[SQLPlan]]" = OrderedDict()
+        self._shapes: "OrderedDict[Tuple[str, str, str], Tuple[Tuple[str, str, str], Dict[str, int]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.metrics = {"plan_hits": 0, "plan_compiles": 0, "shape_hits": 0, "deterministic_params": 0, "llm_params": 0, "bind_fallbacks": 0}
+
+    @staticmethod
+    def plan_key(fingerprint: str, tool) -> Tuple[str, str, str]:
+        template_hash = hashlib.sha256((tool.sql_template or "").encode("utf-8")).hexdigest()[:16]
+        return (fingerprint, tool.name, template_hash)
+
+    def get_plan(self, fingerprint: str, tool) -> Optional[SQLPlan]:
+        """Return the compiled plan for a tool on one database, compiling it on first use.
+
+        Args:
+            fingerprint (str): Database fingerprint (see `tools.schema_cache.db_fingerprint`).
+            tool (Tool): Tool row with `name` and `sql_template`.
+
+        Returns:
+            Optional[SQLPlan]: The plan, or None if the template can't be parameterized.
+        """
+        if tool is None or not tool.sql_template:
+            return None
+        key = self.plan_key(fingerprint, tool)
+        with self._lock:
+            if key in self._plans:
+                self._plans.move_to_end(key)
+                self.metrics["plan_hits"] += 1
+                return self._plans[key]
+        plan = SQLPlan.compile(tool.name, tool.sql_template)
+        with self._lock:
+            self.metrics["plan_compiles"] += 1
+            self._plans[key] = plan
+            while len(self._plans) > self.max_entries:
+                self._plans.popitem(last=False)
+        return plan
+
+    def match_prompt(self, fingerprint: str, schema_version: str, prompt: str) -> Optional[Tuple[SQLPlan, Dict[str, Any]]]:
+        """Find the plan that answered a prompt of the same shape.
+
+        Returns:
+            Optional[Tuple[SQLPlan, Dict[str, Any]]]: The plan and the parameters that could be read
+            deterministically from the prompt's literals (empty if the LLM must supply them).
+        """
+        shape, literals = prompt_shape(prompt)
+        with self._lock:
+            entry = self._shapes.get((fingerprint, schema_version, shape))
+            if entry is None:
+                return None
+            self._shapes.move_to_end((fingerprint, schema_version, shape))
+            plan_key, positions = entry
+            plan = self._plans.get(plan_key)
+            if plan is None or len(literals) <= max(positions.values(), default=-1):
+                return None
+            self.metrics["shape_hits"] += 1
+        return plan, {param: literals[index] for param, index in positions.items()}
+
+    def remember_prompt(self, fingerprint: str, schema_version: str, prompt: str, tool, params: Dict[str, Any]) -> None:
+        """Record that `prompt` was answered by `tool` with `params`.
+        Only prompts whose every literal became a parameter are recorded, so a later prompt
+        of the same shape can't silently get a value baked into the template."""
+        shape, literals = prompt_shape(prompt)
+        positions: Dict[str, int] = {}
+        for param, value in params.items():
+            matches = [i for i, literal in enumerate(literals) if literal == str(value)]
+            if len(matches) == 1:
+                positions[param] = matches[0]
+        if sorted(positions.values()) != list(range(len(literals))):
+            return
+        with self._lock:
+            self._shapes[(fingerprint, schema_version, shape)] = (self.plan_key(fingerprint, tool), positions)
+            self._shapes.move_to_end((fingerprint, schema_version, shape))
+            while len(self._shapes) > self.max_shapes:
+                self._shapes.popitem(last=False)
+
+    def record(self, metric: str) -> None:
+        with self._lock:
+            self.metrics[metric] += 1
+
+    def invalidate(self, fingerprint: str) -> None:
+        """Drop every plan and prompt shape for one database."""
+        with self._lock:
+            for cache in (self._plans, self._shapes):
+                for key in [key for key in cache if key[0] == fingerprint]:
+                    del cache[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.metrics, plans=len(self._plans), shapes=len(self._shapes))
+
+
+sql_plan_cache = SQLPlanCache(
+    max_entries=settings.sql_plan_cache_max_entries,
+    max_shapes=settings.sql_plan_cache_max_shapes,
+)
@@ -0,0 +1,116 @@
+import re
+import time
+from typing import Iterable, List, Tuple, Union
+
+import jwt
+import orjson
+from sqlalchemy.sql.expression import TextClause, text
+
+from config import settings
+from tools.schema_cache import db_fingerprint
+
+
+"""
+Result delivery for generated SQL.
+Rows stay Python objects from the driver to the response (serialized once, with orjson,
+where text is needed). Results beyond the first page are reached through opaque page
+tokens: signed JWTs holding the database fingerprint, the SQL and the row offset, so a
+client can fetch the next page or stream the rest without resending (or altering) the SQL.
+"""
+
+
+_TRAILING_SEMICOLON_RE = re.compile(r";\s*$")
+# Literal LIMIT (and OFFSET) closing a statement, as the SQL guard leaves it
+_TRAILING_LIMIT_RE = re.compile(r"\s+LIMIT\s+(\d+)(?:\s+OFFSET\s+(\d+))?\s*$", re.IGNORECASE)
+
+
+def result_text(result: Union[List[dict], str]) -> str:
+    """Serialize rows once for an LLM prompt (error strings are passed through)."""
+    if isinstance(result, str):
+        return result
+    return orjson.dumps(result, default=str).decode("utf-8")
+
+
+def ndjson_lines(rows: Iterable[dict]) -> bytes:
+    """Encode rows as newline-delimited JSON, one object per line."""
+    return b"".join(orjson.dumps(row, default=str, option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+
+
+def split_page(result: Union[List[dict], str], page_size: int) -> Tuple[Union[List[dict], str], bool]:
+    """Trim rows fetched with one extra row of lookahead to a page.
+
+    Args:
+        result (List[dict] | str): Up to `page_size + 1` rows, or a query error message.
+        page_size (int): Rows per page.
+
+    Returns:
+        Tuple[List[dict] | str, bool]: The page (or the error) and whether more rows follow it.
+    """
+    if not isinstance(result, list):
+        return result, False
+    return result[:page_size], len(result) > page_size
+
+
+def paged_sql(sql_query: str, offset: int, limit: int) -> Tuple[TextClause, dict]:
+    """Select a window of a query's rows with `page_limit` / `page_offset` binds.
+
+    A statement ending in a literal `LIMIT n [OFFSET m]` (every guarded query on a LIMIT
+    dialect) is paged in place, with the window narrowed to the rows that clause allows.
+    Anything else is wrapped in a subquery, which fails on MySQL when the select list
+    repeats a column name (e.g. two joined `id` columns).
+
+    Args:
+        sql_query (str): The guarded SQL.
+        offset (int): Index of the first row of the window.
+        limit (int): Rows in the window.
+
+    Returns:
+        Tuple[TextClause, dict]: The paged statement and its bind parameters.
+    """
+    sql_query = _TRAILING_SEMICOLON_RE.sub("", sql_query.strip())
+    offset = max(offset, 0)
+    match = _TRAILING_LIMIT_RE.search(sql_query)
+    if match is None:
+        statement = f"SELECT * FROM ({sql_query}) AS paged_result LIMIT :page_limit OFFSET :page_offset"
+        return text(statement), {"page_offset": offset, "page_limit": limit}
+    max_rows, skipped = int(match.group(1)), int(match.group(2) or 0)
+    statement = f"{sql_query[:match.start()]} LIMIT :page_limit OFFSET :page_offset"
+    return text(statement), {"page_offset": skipped + offset, "page_limit": max(min(limit, max_rows - offset), 0)}
+
+
+def create_page_token(db_url: str, sql_query: str, offset: int) -> str:
+    """Create a signed token for the rows of `sql_query` starting at `offset`.
+
+    Args:
+        db_url (str): Database the query runs on; the token is only valid for it.
+        sql_query (str): The literal SQL that produced the result.
+        offset (int): Index of the first row of the next page.
+
+    Returns:
+        str: The page token.
+    """
+    payload = {
+        "db": db_fingerprint(db_url),
+        "sql": sql_query,
+        "offset": offset,
+        "exp": int(time.time()) + settings.sql_page_token_ttl,
+    }
+    return jwt.encode(payload=payload, key=settings.jwt_secret, algorithm=settings.jwt_algorithm)
+
+
+def decode_page_token(token: str, db_url: str) -> Tuple[str, int]:
+    """Read a page token issued for `db_url`.
+
+    Returns:
+        Tuple[str, int]: The SQL and the row offset.
+
+    Raises:
+        ValueError: If the token is invalid, expired or was issued for another database.
+    """
+    try:
+        payload = jwt.decode(jwt=token, key=settings.jwt_secret, algorithms=[settings.jwt_algorithm])
+    except jwt.PyJWTError as e:
+        raise ValueError(f"Invalid page token: {e}")
+    if payload.get("db") != db_fingerprint(db_url) or not isinstance(payload.get("sql"), str):
+        raise ValueError("Invalid page token: issued for another database")
+    return payload["sql"], int(payload.get("offset", 0))
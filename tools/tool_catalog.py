@@ -0,0 +1,181 @@
+import asyncio
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
+
+from agno.utils.log import log_debug, logger
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models.tool import Tool
+from redis_store import publish_tool_catalog_changed, subscribe_tool_catalog_changes
+from tools.answer_cache import catalog_version
+from tools.sql_plan import template_placeholders
+
+
+"""
+Cached tool catalog.
+The `tools` table is loaded once per worker into an immutable catalog holding each tool's
+placeholder names and pre-rendered prompt block, plus the full rendered tool list. Tool
+writes invalidate it and publish a Redis notification so other workers drop theirs too;
+a TTL bounds staleness if a notification is missed.
+"""
+
+
+class CatalogTool:
+    """
+    Read-only copy of a Tool row (safe to share between requests and sessions) with its
+    template metadata precomputed.
+    """
+    __slots__ = ("tool_id", "name", "description", "tool_config", "sql_template", "placeholders", "prompt_block")
+
+    def __init__(self, tool: Any):
+        self.tool_id = tool.tool_id
+        self.name = tool.name
+        self.description = tool.description
+        self.tool_config = tool.tool_config
+        self.sql_template = tool.sql_template
+        self.placeholders = template_placeholders(tool.sql_template)
+        self.prompt_block = f"Name: {tool.name}\nDescription: {tool.description}\nSQL Template: {tool.sql_template}"
+
+
+def tool_prompt_block(tool: Any) -> str:
+    """The prompt block of one tool (pre-rendered for catalog tools)."""
+    block = getattr(tool, "prompt_block", None)
+    if block is None:
+        block = f"Name: {tool.name}\nDescription: {tool.description}\nSQL Template: {tool.sql_template}"
+    return block
+
+
+def render_tool_list(tools: Sequence[Any]) -> str:
+    """Render the numbered tool list injected into LLM prompts."""
+    return "\n\n".join([f"Tool {i+1}:\n{tool_prompt_block(t)}" for i, t in enumerate(tools)])
+
+
+class ToolCatalog:
+    """
+    Immutable view of the tools table at a point in time.
+    """
+    __slots__ = ("tools", "by_name", "tool_list_str", "version", "loaded_at")
+
+    def __init__(self, tools: List[CatalogTool]):
+        self.tools = tools
+        self.by_name: Dict[str, CatalogTool] = {tool.name: tool for tool in tools}
+        self.tool_list_str = render_tool_list(tools)
+        self.version = catalog_version(self.tool_list_str)
+        self.loaded_at = time.monotonic()
+
+    def render(self, tools: Sequence[CatalogTool]) -> str:
+        """Render a subset of the catalog (the full list is pre-rendered)."""
+        if len(tools) == len(self.tools):
+            return self.tool_list_str
+        return render_tool_list(tools)
+
+
+class ToolCatalogCache:
+    """
+    Per-worker tool catalog with TTL, single-flight reloads and cross-worker invalidation.
+    """
+    def __init__(self, ttl: int = 300, pubsub: bool = True):
+        """
+        Args:
+            ttl (int): Seconds a loaded catalog is trusted without a change notification.
+            pubsub (bool): Whether changes are published to / received from other workers via Redis.
+        """
+        self.ttl = ttl
+        self.pubsub = pubsub
+        self.worker_id = uuid.uuid4().hex
+        self._catalog: Optional[ToolCatalog] = None
+        self._generation = 0
+        self._lock: Optional[asyncio.Lock] = None
+        self.metrics = {"hits": 0, "loads": 0, "invalidations": 0}
+
+    async def get_catalog(self, db: AsyncSession) -> ToolCatalog:
+        """Return the current catalog, loading it with `db` on a miss.
+
+        Args:
+            db (AsyncSession): Session used only when the catalog has to be (re)loaded.
+
+        Returns:
+            ToolCatalog: The tool catalog.
+        """
+        catalog = self._fresh()
+        if catalog is not None:
+            self.metrics["hits"] += 1
+            return catalog
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            catalog = self._fresh()
+            if catalog is not None:
+                self.metrics["hits"] += 1
+                return catalog
+            generation = self._generation
+            result = await db.execute(select(Tool))
+            catalog = ToolCatalog([CatalogTool(tool) for tool in result.scalars().all()])
+            self.metrics["loads"] += 1
+            # A change notified during the load makes this copy stale: use it, don't keep it
+            if generation == self._generation:
+                self._catalog = catalog
+            log_debug(f"Loaded tool catalog {catalog.version} ({len(catalog.tools)} tools)")
+            return catalog
+
+    def invalidate(self) -> None:
+        """Drop this worker's catalog."""
+        self._catalog = None
+        self._generation += 1
+        self.metrics["invalidations"] += 1
+
+    async def notify_changed(self) -> None:
+        """Invalidate after a tool write and tell the other workers. Call after the commit."""
+        self.invalidate()
+        if not self.pubsub:
+            return
+        try:
+            await publish_tool_catalog_changed(self.worker_id)
+        except Exception as e:
+            # Other workers fall back to the TTL
+            logger.warning(f"Tool catalog change notification failed: {e}")
+
+    async def listen(self, retry_delay: float = 5.0) -> None:
+        """Invalidate on change notifications from other workers. Runs for the application
+        lifetime (started from the lifespan) and resubscribes after Redis errors."""
+        while True:
+            pubsub = None
+            try:
+                pubsub = await subscribe_tool_catalog_changes()
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None:
+                        continue
+                    origin = message.get("data")
+                    origin = origin.decode("utf-8") if isinstance(origin, bytes) else origin
+                    if origin != self.worker_id:
+                        self.invalidate()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Tool catalog subscription lost: {e}")
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+            # Notifications may have been missed while disconnected
+            self.invalidate()
+            await asyncio.sleep(retry_delay)
+
+    def stats(self) -> Dict[str, Any]:
+        catalog = self._catalog
+        return dict(self.metrics, version=catalog.version if catalog else None, tools=len(catalog.tools) if catalog else 0)
+
+    def _fresh(self) -> Optional[ToolCatalog]:
+        catalog = self._catalog
+        if catalog is not None and time.monotonic() - catalog.loaded_at < self.ttl:
+            return catalog
+        return None
+
+
+tool_catalog = ToolCatalogCache(ttl=settings.tool_catalog_ttl, pubsub=settings.tool_catalog_pubsub)
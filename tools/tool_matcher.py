@@ -0,0 +1,230 @@
+import re
+import threading
+from typing import Any, Dict, List, Optional, Pattern, Sequence, Tuple
+
+import numpy as np
+from agno.utils.log import logger
+
+from config import settings
+from tools.schema_retrieval import tokenize
+from tools.sql_plan import coerce_param, prompt_shape
+
+
+"""
+Deterministic tool selection.
+Prompts that clearly map to one tool are answered without the generation call: explicit
+rules from `Tool.tool_config["match"]` (regex patterns whose named groups fill
+placeholders, keyword phrases, per-parameter patterns / allowed values / defaults) plus
+TF-IDF cosine similarity between the prompt and each tool's name, description and keywords.
+A tool is chosen only when its confidence clears the threshold and beats the runner-up by
+the margin; everything else falls back to the LLM.
+
+tool_config example:
+    {"match": {"patterns": ["top (?P<n>\\d+) products in (?P<region>\\w+)"],
+               "keywords": ["best sellers"],
+               "params": {"region": {"values": ["EU", "US"]}, "n": {"default": 10}}}}
+"""
+
+
+_KEYWORD_BONUS = 0.3
+
+
+class ToolRules:
+    """
+    Compiled `tool_config["match"]` rules of one tool.
+    """
+    __slots__ = ("patterns", "keywords", "keyword_text", "param_patterns", "param_values", "defaults")
+
+    def __init__(self, tool: Any):
+        config = tool.tool_config if isinstance(tool.tool_config, dict) else {}
+        match = config.get("match") if isinstance(config.get("match"), dict) else {}
+        self.patterns: List[Pattern] = [p for p in (_compile(tool.name, source) for source in match.get("patterns", [])) if p is not None]
+        phrases = [phrase for phrase in match.get("keywords", []) if isinstance(phrase, str) and phrase.strip()]
+        self.keywords: List[Pattern] = [
+            re.compile(r"\b" + r"\s+".join(map(re.escape, phrase.split())) + r"\b", re.IGNORECASE) for phrase in phrases
+        ]
+        self.keyword_text = " ".join(phrases)
+        self.param_patterns: Dict[str, Pattern] = {}
+        self.param_values: Dict[str, List[Tuple[Pattern, Any]]] = {}
+        self.defaults: Dict[str, Any] = {}
+        for name, spec in (match.get("params") or {}).items():
+            if not isinstance(spec, dict):
+                continue
+            if "pattern" in spec:
+                pattern = _compile(tool.name, spec["pattern"])
+                if pattern is not None:
+                    self.param_patterns[name] = pattern
+            if spec.get("values"):
+                self.param_values[name] = [
+                    (re.compile(r"(?<!\w)" + re.escape(str(value)) + r"(?!\w)", re.IGNORECASE), value) for value in spec["values"]
+                ]
+            if "default" in spec:
+                self.defaults[name] = spec["default"]
+
+
+def _compile(tool_name: str, source: Any) -> Optional[Pattern]:
+    try:
+        return re.compile(source, re.IGNORECASE)
+    except (re.error, TypeError) as e:
+        logger.warning(f"Ignoring invalid match pattern {source!r} of tool {tool_name}: {e}")
+        return None
+
+
+class ToolMatch:
+    """
+    A confident tool choice for a prompt. `params` may be incomplete (see `complete`).
+    """
+    __slots__ = ("tool", "params", "confidence", "complete")
+
+    def __init__(self, tool: Any, params: Dict[str, Any], confidence: float, complete: bool):
+        self.tool = tool
+        self.params = params
+        self.confidence = confidence
+        self.complete = complete
+
+
+class ToolMatcherIndex:
+    """
+    Rules and L2-normalized TF-IDF vectors for one catalog version.
+    """
+    def __init__(self, tools: Sequence[Any]):
+        self.tools = list(tools)
+        self.rules = [ToolRules(tool) for tool in self.tools]
+        documents = [
+            tokenize(tool.name) * 2 + tokenize(tool.description or "") + tokenize(rules.keyword_text)
+            for tool, rules in zip(self.tools, self.rules)
+        ]
+        self.vocabulary: Dict[str, int] = {}
+        for terms in documents:
+            for term in terms:
+                self.vocabulary.setdefault(term, len(self.vocabulary))
+        tf = np.zeros((len(documents), max(len(self.vocabulary), 1)), dtype=np.float32)
+        for i, terms in enumerate(documents):
+            for term in terms:
+                tf[i, self.vocabulary[term]] += 1
+        df = (tf > 0).sum(axis=0)
+        self.idf = (np.log((1 + len(documents)) / (1 + df)) + 1).astype(np.float32)
+        vectors = tf * self.idf[None, :]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        self.vectors = vectors / np.where(norms > 0, norms, 1)
+
+    def similarities(self, prompt: str) -> np.ndarray:
+        """Cosine similarity between the prompt and every tool document."""
+        query = np.zeros(self.vectors.shape[1], dtype=np.float32)
+        for term in tokenize(prompt):
+            column = self.vocabulary.get(term)
+            if column is not None:
+                query[column] += self.idf[column]
+        norm = np.linalg.norm(query)
+        if not norm:
+            return np.zeros(len(self.tools), dtype=np.float32)
+        return self.vectors @ (query / norm)
+
+
+class ToolMatcher:
+    """
+    Picks a tool and its parameters for a prompt without an LLM call when the choice is
+    unambiguous, and counts how often that happens.
+    """
+    def __init__(self, threshold: float = 0.6, margin: float = 0.15):
+        """
+        Args:
+            threshold (float): Minimum confidence (0-1) for choosing a tool.
+            margin (float): Minimum confidence lead over the second best tool.
+        """
+        self.threshold = threshold
+        self.margin = margin
+        self._index: Optional[Tuple[Any, ToolMatcherIndex]] = None
+        self._lock = threading.Lock()
+        self.metrics = {"requests": 0, "bypassed": 0, "params_llm": 0, "fallbacks": 0, "rule_matches": 0}
+
+    def match(self, catalog, prompt: str) -> Optional[ToolMatch]:
+        """Find the tool a prompt unambiguously asks for.
+
+        A matching pattern gives confidence 1; otherwise the TF-IDF similarity, plus a bonus
+        when a keyword phrase occurs. Parameters come from the pattern's named groups, then
+        per-parameter patterns and allowed values, then defaults; a single remaining
+        placeholder takes the prompt's only unused literal.
+
+        Args:
+            catalog (ToolCatalog): The tool catalog.
+            prompt (str): The user's question.
+
+        Returns:
+            Optional[ToolMatch]: The match, or None if no tool is a confident choice.
+        """
+        index = self._get_index(catalog)
+        scores = index.similarities(prompt)
+        groups: Dict[int, Dict[str, str]] = {}
+        for i, rules in enumerate(index.rules):
+            found = next((m for m in (pattern.search(prompt) for pattern in rules.patterns) if m), None)
+            if found:
+                groups[i] = {key: value for key, value in found.groupdict().items() if value is not None}
+                scores[i] = 1.0
+            elif any(keyword.search(prompt) for keyword in rules.keywords):
+                scores[i] = min(scores[i] + _KEYWORD_BONUS, 1.0)
+        order = np.argsort(-scores, kind="stable")
+        best = int(order[0]) if len(order) else None
+        runner_up = float(scores[order[1]]) if len(order) > 1 else 0.0
+        if best is None or scores[best] < self.threshold or scores[best] - runner_up < self.margin:
+            return None
+        tool = index.tools[best]
+        params = self._extract_params(tool, index.rules[best], prompt, groups.get(best, {}))
+        placeholders = getattr(tool, "placeholders", None) or []
+        complete = all(params.get(name) is not None for name in placeholders)
+        if best in groups:
+            self._record("rule_matches")
+        return ToolMatch(tool, params, float(scores[best]), complete)
+
+    @staticmethod
+    def _extract_params(tool: Any, rules: ToolRules, prompt: str, groups: Dict[str, str]) -> Dict[str, Any]:
+        placeholders = getattr(tool, "placeholders", None) or []
+        params: Dict[str, Any] = {name: coerce_param(value) for name, value in groups.items() if name in placeholders}
+        for name in placeholders:
+            if name in params:
+                continue
+            pattern = rules.param_patterns.get(name)
+            found = pattern.search(prompt) if pattern is not None else None
+            if found:
+                params[name] = coerce_param(found.group(1) if found.groups() else found.group(0))
+                continue
+            value = next((value for regex, value in rules.param_values.get(name, []) if regex.search(prompt)), None)
+            if value is not None:
+                params[name] = value
+        missing = [name for name in placeholders if name not in params]
+        if len(missing) == 1:
+            used = {str(value) for value in params.values()}
+            literals = [literal for literal in prompt_shape(prompt)[1] if literal not in used]
+            if len(literals) == 1:
+                params[missing[0]] = coerce_param(literals[0])
+        for name, value in rules.defaults.items():
+            if name in placeholders:
+                params.setdefault(name, value)
+        return params
+
+    def record(self, outcome: str) -> None:
+        """Count a request's outcome: "bypassed", "params_llm" or "fallbacks"."""
+        with self._lock:
+            self.metrics["requests"] += 1
+            self.metrics[outcome] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.metrics["requests"]
+        return dict(self.metrics, bypass_rate=round(self.metrics["bypassed"] / requests, 4) if requests else 0.0)
+
+    def _record(self, metric: str) -> None:
+        with self._lock:
+            self.metrics[metric] += 1
+
+    def _get_index(self, catalog) -> ToolMatcherIndex:
+        # Catalogs are immutable and replaced on reload (the version hash ignores tool_config)
+        with self._lock:
+            if self._index is not None and self._index[0] is catalog:
+                return self._index[1]
+        index = ToolMatcherIndex(catalog.tools)
+        with self._lock:
+            self._index = (catalog, index)
+        return index
+
+
+tool_matcher = ToolMatcher(threshold=settings.tool_matcher_threshold, margin=settings.tool_matcher_margin)
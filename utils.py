@@ -4,6 +4,11 @@ import jwt
 from config import settings
 import uuid
 import logging
+import asyncio
+from typing import Awaitable, Optional, TypeVar
+from fastapi import HTTPException, Request
+
+T = TypeVar("T")
 
 passwd_context = CryptContext(schemes=["bcrypt"])
 ACCESS_TOKEN_EXPIRY = 3600
@@ -52,4 +57,25 @@ def decode_token(token: str) -> dict:
         return token_data
     except jwt.PyJWTError as e:
         logging.exception(e)
-        return None
\ No newline at end of file
+        return None
+
+async def cancel_on_disconnect(request: Optional[Request], awaitable: Awaitable[T], poll_interval: float = 0.5) -> T:
+    """
+    Await `awaitable`, cancelling it if the HTTP client disconnects first.
+    Raises HTTPException(499) when the work was cancelled because the client went away.
+    """
+    task = asyncio.ensure_future(awaitable)
+    if request is None:
+        return await task
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client closed request")
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+